@@ -0,0 +1,452 @@
+"""
+JSON API for Boostly
+A headless HTTP entry point to the same db_helper operations the Streamlit
+app uses, for integrations such as a mobile app or bulk scripts. Every
+operation is also available through POST /api/batch, which runs many of
+them in one request.
+
+The server is asynchronous (Starlette on uvicorn); db_helper calls are
+blocking, so each request runs them on the worker thread pool, and reads
+are served from the shared read cache and the in-process student directory
+and leaderboards. GET responses carry an ETag and answer a matching
+If-None-Match with 304, so polling clients only download changes.
+
+Endpoints:
+    GET  /api/health
+    GET  /api/students?offset=0&limit=100
+    GET  /api/students/{student_id}
+    GET  /api/students/{student_id}/transactions?direction=received&offset=0&limit=50
+    GET  /api/students/{student_id}/notifications?limit=50
+    GET  /api/students/{student_id}/vouchers?limit=10
+    GET  /api/leaderboard/{window}?limit=10          (window: week, month or term)
+    GET  /api/feed?viewer_id=...&limit=20&cursor=...
+    POST /api/transfers          {"sender_id", "receiver_id", "amount", "message"}
+    POST /api/transfers/team     {"sender_id", "recipients": {"<student_id>": amount, ...}, "message"}
+    POST /api/endorsements       {"endorser_id", "endorsee_id", "recognition_id"}
+    POST /api/redemptions        {"student_id", "num_vouchers", "credits_per_voucher"}
+    POST /api/notifications/{notification_id}/read
+    POST /api/batch              {"operations": [{"op": "send_credits", "args": {...}}, ...]}
+
+The token grants the right to act as any student: writes take the acting
+student (sender_id, student_id, ...) from the request. Without a token the
+server only answers loopback clients and refuses to listen on any other
+address.
+
+Usage:
+    python api_server.py                       # http://127.0.0.1:8600
+    BOOSTLY_API_TOKEN=secret python api_server.py --host 0.0.0.0 --port 8600
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+import db_helper
+from leaderboard import WINDOWS, get_leaderboards
+from models import CreditTransaction, StudentRef, VoucherPurchase
+from notification_templates import notification_text
+from student_directory import get_directory
+
+# When set, every request needs "Authorization: Bearer <token>"; when unset,
+# only loopback clients are served
+API_TOKEN = os.getenv("BOOSTLY_API_TOKEN", "")
+MAX_PAGE_SIZE = int(os.getenv("BOOSTLY_API_MAX_PAGE", "500"))
+MAX_BATCH_OPERATIONS = int(os.getenv("BOOSTLY_API_MAX_BATCH", "100"))
+
+
+class ApiError(Exception):
+    """An operation failed in a way the client should see, with its HTTP status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# =====================================================
+# ARGUMENTS AND RESULTS
+# =====================================================
+
+def _int(args: Dict[str, Any], name: str, default: Optional[int] = None,
+         minimum: int = 0, maximum: Optional[int] = None) -> int:
+    value = args.get(name, default)
+    if value is None:
+        raise ApiError(400, f"'{name}' is required")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"'{name}' must be an integer")
+    if value < minimum:
+        raise ApiError(400, f"'{name}' must be at least {minimum}")
+    if maximum is not None and value > maximum:
+        raise ApiError(400, f"'{name}' must be at most {maximum}")
+    return value
+
+
+def _student(args: Dict[str, Any], name: str) -> StudentRef:
+    student_id = args.get(name)
+    if not student_id:
+        raise ApiError(400, f"'{name}' is required")
+    student = get_directory().by_id(str(student_id))
+    if student is None:
+        raise ApiError(404, f"Student {student_id} not found")
+    return student
+
+
+def _page(args: Dict[str, Any], default_limit: int) -> Tuple[int, int]:
+    return _int(args, 'offset', 0), _int(args, 'limit', default_limit, 1, MAX_PAGE_SIZE)
+
+
+def _paged(page: List[Any], offset: int, limit: int, total: int) -> Dict[str, Any]:
+    """One page of a list of total items with the offset of the next page (None on the last)"""
+    return {
+        'items': page, 'offset': offset, 'limit': limit, 'total': total,
+        'next_offset': offset + limit if offset + limit < total else None,
+    }
+
+
+def _rejected(operation: str) -> ApiError:
+    """Why a write returned nothing: shed by admission control, or failed"""
+    rejection = db_helper.get_last_rejection()
+    if rejection is None:
+        return ApiError(502, f"{operation} failed")
+    return ApiError(429 if rejection.reason == 'rate_limited' else 503, str(rejection))
+
+
+def _jsonable(value: Any) -> Any:
+    if hasattr(value, '_asdict'):
+        return {k: _jsonable(v) for k, v in value._asdict().items()}
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+
+# =====================================================
+# OPERATIONS
+# =====================================================
+
+def list_students(args: Dict[str, Any]) -> Dict[str, Any]:
+    offset, limit = _page(args, 100)
+    students = get_directory().all()
+    return _paged(students[offset:offset + limit], offset, limit, len(students))
+
+
+def get_student(args: Dict[str, Any]) -> Dict[str, Any]:
+    student = _student(args, 'student_id')
+    return {**student._asdict(), 'stats': db_helper.get_student_stats(student.id)}
+
+
+def get_transactions(args: Dict[str, Any]) -> Dict[str, Any]:
+    student = _student(args, 'student_id')
+    direction = args.get('direction', 'received')
+    if direction not in ('sent', 'received'):
+        raise ApiError(400, "'direction' must be 'sent' or 'received'")
+    offset, limit = _page(args, 50)
+    transactions, total = db_helper.get_credit_transactions_page(
+        student.id, direction == 'sent', offset, limit, CreditTransaction)
+    return _paged(transactions, offset, limit, total)
+
+
+def get_notifications(args: Dict[str, Any]) -> Dict[str, Any]:
+    student = _student(args, 'student_id')
+    limit = _int(args, 'limit', 50, 1, MAX_PAGE_SIZE)
+    name_of = get_directory().name_of
+    return {
+        'items': [row._replace(**notification_text(row, name_of))
+                  for row in db_helper.get_notifications(student.id, limit)],
+        'unread': db_helper.count_unread_notifications(student.id),
+    }
+
+
+def get_vouchers(args: Dict[str, Any]) -> Dict[str, Any]:
+    student = _student(args, 'student_id')
+    limit = _int(args, 'limit', 10, 1, MAX_PAGE_SIZE)
+    return {
+        'items': db_helper.get_voucher_purchases(student.id, limit, VoucherPurchase),
+        'totals': db_helper.get_redemption_totals(student.id),
+    }
+
+
+def get_leaderboard(args: Dict[str, Any]) -> Dict[str, Any]:
+    window = args.get('window', 'week')
+    if window not in WINDOWS:
+        raise ApiError(400, f"'window' must be one of {', '.join(WINDOWS)}")
+    limit = _int(args, 'limit', 10, 1, MAX_PAGE_SIZE)
+    names = get_directory().names()
+    top = get_leaderboards().top(window, limit)
+    return {
+        'window': window,
+        'items': [{'rank': rank, 'student_id': student_id, 'name': names.get(student_id, 'Unknown'),
+                   'credits_received': credits}
+                  for rank, (student_id, credits) in enumerate(top, start=1)],
+    }
+
+
+def get_feed(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Recognition feed, keyset paged: pass the previous page's next_cursor as cursor"""
+    viewer = _student(args, 'viewer_id')
+    limit = _int(args, 'limit', 20, 1, 100)
+    before = None
+    if args.get('cursor'):
+        try:
+            created_at, last_id = base64.urlsafe_b64decode(str(args['cursor'])).decode().split('|')
+        except ValueError:
+            raise ApiError(400, "Invalid 'cursor'")
+        before = (created_at, last_id)
+    entries = db_helper.get_recognition_feed(viewer.id, limit, before)
+    next_cursor = None
+    if len(entries) == limit:
+        last = entries[-1]
+        next_cursor = base64.urlsafe_b64encode(f"{last.created_at}|{last.id}".encode()).decode()
+    return {'items': entries, 'next_cursor': next_cursor}
+
+
+def _check_balance(sender: StudentRef, total: int):
+    """Validated like the send page: within the monthly limit and the balance"""
+    stats = db_helper.get_student_stats(sender.id)
+    remaining = stats.get('monthly_limit', 100) - stats.get('credits_sent_this_month', 0)
+    if total > remaining:
+        raise ApiError(409, f"Monthly sending limit reached: {remaining} credits left this month")
+    if total > stats.get('total_credits', 0):
+        raise ApiError(409, f"Insufficient credits: {stats.get('total_credits', 0)} available")
+
+
+def send_credits(args: Dict[str, Any]) -> Dict[str, Any]:
+    sender = _student(args, 'sender_id')
+    receiver = _student(args, 'receiver_id')
+    if sender.id == receiver.id:
+        raise ApiError(400, "Cannot send credits to yourself")
+    amount = _int(args, 'amount', minimum=1)
+    _check_balance(sender, amount)
+
+    transaction = db_helper.send_credits(sender.id, receiver.id, amount, args.get('message'))
+    if not transaction:
+        raise _rejected('Transfer')
+    return transaction
+
+
+def send_credits_multi(args: Dict[str, Any]) -> Dict[str, Any]:
+    """One atomic transfer to every recipient; the database re-checks the total under lock"""
+    sender = _student(args, 'sender_id')
+    recipients = args.get('recipients')
+    if not isinstance(recipients, dict) or not recipients:
+        raise ApiError(400, "'recipients' must be an object of student id to amount")
+    amounts = {_student({'id': student_id}, 'id').id: _int(recipients, student_id, minimum=1)
+               for student_id in recipients}
+    if sender.id in amounts:
+        raise ApiError(400, "Cannot send credits to yourself")
+    _check_balance(sender, sum(amounts.values()))
+
+    transactions = db_helper.send_credits_multi(sender.id, amounts, args.get('message'))
+    if not transactions:
+        raise _rejected('Team transfer')
+    return {'items': transactions, 'total': sum(amounts.values())}
+
+
+def endorse(args: Dict[str, Any]) -> Dict[str, Any]:
+    endorser = _student(args, 'endorser_id')
+    endorsee = _student(args, 'endorsee_id')
+    if endorser.id == endorsee.id:
+        raise ApiError(400, "Cannot endorse yourself")
+    if db_helper.check_endorsement_exists(endorser.id, endorsee.id):
+        raise ApiError(409, "Already endorsed")
+    endorsement = db_helper.create_endorsement(endorser.id, endorsee.id, args.get('recognition_id'))
+    if not endorsement:
+        raise _rejected('Endorsement')
+    return endorsement
+
+
+def redeem(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Balance checks happen atomically in redeem_vouchers"""
+    student = _student(args, 'student_id')
+    num_vouchers = _int(args, 'num_vouchers', minimum=1)
+    credits_per_voucher = _int(args, 'credits_per_voucher', minimum=1)
+    purchase = db_helper.purchase_vouchers(student.id, num_vouchers, credits_per_voucher)
+    if not purchase:
+        raise _rejected('Redemption')
+    return purchase
+
+
+def mark_read(args: Dict[str, Any]) -> Dict[str, Any]:
+    notification_id = args.get('notification_id')
+    if not notification_id:
+        raise ApiError(400, "'notification_id' is required")
+    if not db_helper.mark_notification_read(str(notification_id)):
+        raise ApiError(502, "Could not mark the notification as read")
+    return {'notification_id': notification_id, 'is_read': True}
+
+
+def health(args: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'connected': db_helper.is_connected(),
+        'breaker': db_helper.get_breaker_state(),
+        'cache': db_helper.get_cache_metrics(),
+        'writes': db_helper.get_write_metrics(),
+    }
+
+
+# Operation name -> function; all are available through /api/batch
+OPERATIONS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    'list_students': list_students,
+    'get_student': get_student,
+    'get_transactions': get_transactions,
+    'get_notifications': get_notifications,
+    'get_vouchers': get_vouchers,
+    'get_leaderboard': get_leaderboard,
+    'get_feed': get_feed,
+    'send_credits': send_credits,
+    'send_credits_multi': send_credits_multi,
+    'endorse': endorse,
+    'redeem': redeem,
+    'mark_read': mark_read,
+    'health': health,
+}
+
+
+def run_operation(name: str, args: Dict[str, Any]) -> Tuple[int, Any]:
+    """Run one operation, returning (HTTP status, JSON-able result or error)"""
+    operation = OPERATIONS.get(name)
+    if operation is None:
+        return 404, {'error': f"Unknown operation: {name}"}
+    if not isinstance(args, dict):
+        return 400, {'error': "'args' must be an object"}
+    try:
+        return 200, _jsonable(operation(args))
+    except ApiError as e:
+        return e.status, {'error': e.message}
+    except Exception as e:
+        print(f"Error in API operation {name}: {e}")
+        return 500, {'error': "Internal error"}
+
+
+def run_batch(operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Run operations in order; each one succeeds or fails on its own"""
+    results = []
+    for item in operations:
+        if not isinstance(item, dict):
+            status, body = 400, {'error': "Each operation must be an object"}
+        else:
+            status, body = run_operation(str(item.get('op', '')), item.get('args') or {})
+        results.append({'id': item.get('id') if isinstance(item, dict) else None,
+                        'status': status,
+                        **({'data': body} if status == 200 else body)})
+    return results
+
+
+# =====================================================
+# HTTP
+# =====================================================
+
+def _response(request: Request, status: int, body: Any) -> Response:
+    """JSON response; a GET gets an ETag and a 304 if the client already has it"""
+    content = json.dumps(body, separators=(',', ':'), default=str).encode()
+    headers = {}
+    if request.method == 'GET' and status == 200:
+        etag = '"' + hashlib.blake2b(content, digest_size=12).hexdigest() + '"'
+        headers['ETag'] = etag
+        headers['Cache-Control'] = 'no-cache'  # revalidate every time, cheaply
+        if etag in request.headers.get('if-none-match', ''):
+            return Response(status_code=304, headers=headers)
+    return Response(content, status_code=status, media_type='application/json', headers=headers)
+
+
+def _is_loopback(host: Optional[str]) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host or '').is_loopback
+    except ValueError:
+        return False
+
+
+def _authorized(request: Request) -> bool:
+    if not API_TOKEN:
+        return request.client is not None and _is_loopback(request.client.host)
+    supplied = request.headers.get('authorization', '')
+    return hmac.compare_digest(supplied, f"Bearer {API_TOKEN}")
+
+
+def endpoint(name: str, from_path: Tuple[str, ...] = ()):
+    """Route handler running an operation with query (GET) or JSON body (POST) arguments"""
+    async def handle(request: Request) -> Response:
+        if not _authorized(request):
+            return _response(request, 401, {'error': "Missing or invalid API token"})
+        args: Dict[str, Any] = dict(request.query_params)
+        if request.method == 'POST':
+            try:
+                body = await request.json() if await request.body() else {}
+            except ValueError:
+                return _response(request, 400, {'error': "Body must be JSON"})
+            if not isinstance(body, dict):
+                return _response(request, 400, {'error': "Body must be a JSON object"})
+            args.update(body)
+        args.update({key: request.path_params[key] for key in from_path})
+        status, result = await run_in_threadpool(run_operation, name, args)
+        return _response(request, status, result)
+    return handle
+
+
+async def batch(request: Request) -> Response:
+    if not _authorized(request):
+        return _response(request, 401, {'error': "Missing or invalid API token"})
+    try:
+        body = await request.json()
+    except ValueError:
+        return _response(request, 400, {'error': "Body must be JSON"})
+    operations = body.get('operations') if isinstance(body, dict) else None
+    if not isinstance(operations, list):
+        return _response(request, 400, {'error': "'operations' must be a list"})
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return _response(request, 413, {'error': f"At most {MAX_BATCH_OPERATIONS} operations per batch"})
+    return _response(request, 200, {'results': await run_in_threadpool(run_batch, operations)})
+
+
+routes = [
+    Route('/api/health', endpoint('health')),
+    Route('/api/students', endpoint('list_students')),
+    Route('/api/students/{student_id}', endpoint('get_student', ('student_id',))),
+    Route('/api/students/{student_id}/transactions', endpoint('get_transactions', ('student_id',))),
+    Route('/api/students/{student_id}/notifications', endpoint('get_notifications', ('student_id',))),
+    Route('/api/students/{student_id}/vouchers', endpoint('get_vouchers', ('student_id',))),
+    Route('/api/leaderboard/{window}', endpoint('get_leaderboard', ('window',))),
+    Route('/api/feed', endpoint('get_feed')),
+    Route('/api/transfers', endpoint('send_credits'), methods=['POST']),
+    Route('/api/transfers/team', endpoint('send_credits_multi'), methods=['POST']),
+    Route('/api/endorsements', endpoint('endorse'), methods=['POST']),
+    Route('/api/redemptions', endpoint('redeem'), methods=['POST']),
+    Route('/api/notifications/{notification_id}/read', endpoint('mark_read', ('notification_id',)),
+          methods=['POST']),
+    Route('/api/batch', batch, methods=['POST']),
+]
+
+app = Starlette(routes=routes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Boostly JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+    if not API_TOKEN and not _is_loopback(args.host):
+        raise SystemExit(f"Refusing to serve on {args.host} without BOOSTLY_API_TOKEN: "
+                         "anyone who can reach the port could act as any student")
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,16 +10,21 @@ st.set_page_config(
 
 # Now import other modules
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence, Tuple
 from dotenv import load_dotenv
 import os
 
+from models import StudentRef, NotificationItem, NotificationParams, MonthlyRollup, RedemptionTotals, VoucherPurchase
+from notification_templates import render_notifications
+
 # Load environment variables
 load_dotenv()
 
 # Import database helper (after page config)
 try:
     from db_helper import *
+    from leaderboard import WINDOWS, get_leaderboards
+    from student_directory import get_directory
     DB_AVAILABLE = True
 except ImportError:
     DB_AVAILABLE = False
@@ -176,7 +181,7 @@ if 'last_credits_input' not in st.session_state:
 if 'last_message_input' not in st.session_state:
     st.session_state.last_message_input = ""
 if 'endorsed_students' not in st.session_state:
-    st.session_state.endorsed_students = []  # Track which students have been endorsed (list of student IDs)
+    st.session_state.endorsed_students = set()  # Students endorsed without a database ("name_roll" keys)
 if 'endorsements_received' not in st.session_state:
     st.session_state.endorsements_received = 0  # Initial endorsements received
 if 'credits_received' not in st.session_state:
@@ -189,40 +194,50 @@ if 'current_student_id' not in st.session_state:
     st.session_state.current_student_id = None  # Current logged-in student ID
 if 'current_student_roll' not in st.session_state:
     st.session_state.current_student_roll = "2K22/EC/63"  # Default current user
+if 'feed_cursors' not in st.session_state:
+    st.session_state.feed_cursors = []  # Keyset cursors of the feed pages before the current one
+if 'vouchers_purchased' not in st.session_state:
+    st.session_state.vouchers_purchased = []  # VoucherPurchase rows bought without a database
+if 'voucher_codes' not in st.session_state:
+    st.session_state.voucher_codes = {}  # Purchase ID -> codes, for purchases whose codes were shown
+if 'profile_reruns' not in st.session_state:
+    st.session_state.profile_reruns = False  # Profile every rerun of this session (admin toggle or ?profile=1)
+
+# Hardcoded students when the database is unavailable (without IDs - session state only)
+FALLBACK_STUDENTS = (
+    StudentRef(None, "Sarah Johnson", "2K22/EC/45"),
+    StudentRef(None, "Michael Chen", "2K22/EC/52"),
+    StudentRef(None, "Emma Wilson", "2K22/EC/38"),
+    StudentRef(None, "David Martinez", "2K22/EC/67"),
+    StudentRef(None, "Lisa Anderson", "2K22/EC/29"),
+    StudentRef(None, "Alex Thompson", "2K22/EC/71"),
+    StudentRef(None, "James Brown", "2K22/EC/56"),
+    StudentRef(None, "Olivia Davis", "2K22/EC/42"),
+)
 
-# Load students from database or use hardcoded fallback
-@st.cache_data(ttl=60)  # Cache for 60 seconds
-def get_students() -> List[Dict]:
-    """Get students from database or fallback to hardcoded"""
+# Load students from the shared directory or use hardcoded fallback
+def get_students(current_roll: str) -> Tuple[StudentRef, ...]:
+    """Get students other than current_roll from the student directory or fallback to hardcoded
+    
+    The rows are the directory's own immutable StudentRefs, shared by every
+    session; only the tuple of references is per rerun.
+    """
     if DB_AVAILABLE and is_connected():
         try:
-            students_data = get_all_students()
-            if students_data and len(students_data) > 0:
-                # Filter out current user
-                current_roll = st.session_state.current_student_roll
-                students = [
-                    {"id": str(s['id']), "name": s['name'], "roll": s['roll_number']}
-                    for s in students_data if s['roll_number'] != current_roll
-                ]
-                if students:
-                    return students
+            # Filter out current user
+            students = tuple(s for s in get_directory().all() if s.roll_number != current_roll)
+            if students:
+                return students
         except Exception as e:
             st.error(f"Error loading students: {e}")
     
-    # Fallback to hardcoded (without IDs - will use session state only)
-    return [
-        {"id": None, "name": "Sarah Johnson", "roll": "2K22/EC/45"},
-        {"id": None, "name": "Michael Chen", "roll": "2K22/EC/52"},
-        {"id": None, "name": "Emma Wilson", "roll": "2K22/EC/38"},
-        {"id": None, "name": "David Martinez", "roll": "2K22/EC/67"},
-        {"id": None, "name": "Lisa Anderson", "roll": "2K22/EC/29"},
-        {"id": None, "name": "Alex Thompson", "roll": "2K22/EC/71"},
-        {"id": None, "name": "James Brown", "roll": "2K22/EC/56"},
-        {"id": None, "name": "Olivia Davis", "roll": "2K22/EC/42"},
-    ]
-
-# Load students (will be cached)
-STUDENTS = get_students()
+    return FALLBACK_STUDENTS
+
+def get_student_names() -> Dict[str, str]:
+    """Map of student ID to name (including the current user)"""
+    if DB_AVAILABLE and is_connected():
+        return get_directory().names()
+    return {}
 
 # Get or create current student in database
 def get_current_student_id() -> Optional[str]:
@@ -235,23 +250,15 @@ def get_current_student_id() -> Optional[str]:
     
     try:
         current_roll = st.session_state.current_student_roll
-        student = get_student_by_roll(current_roll)
+        student = get_directory().by_roll(current_roll)
         if student:
-            student_id = str(student['id'])  # Ensure string format
+            student_id = str(student.id)  # Ensure string format
             st.session_state.current_student_id = student_id
             return student_id
         else:
             # Create student if doesn't exist
             try:
-                from supabase import create_client
-                # Try to get from config first, then env
-                try:
-                    from config import SUPABASE_URL, SUPABASE_KEY
-                except ImportError:
-                    SUPABASE_URL = os.getenv("SUPABASE_URL")
-                    SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-                
-                supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+                supabase = get_client()
                 result = supabase.table('students').insert({
                     'name': 'Student Name',
                     'roll_number': current_roll
@@ -259,6 +266,8 @@ def get_current_student_id() -> Optional[str]:
                 if result.data:
                     student_id = str(result.data[0]['id'])  # Ensure string format
                     st.session_state.current_student_id = student_id
+                    get_directory().add(StudentRef(student_id, 'Student Name', current_roll))
+                    invalidate_students_list()  # other replicas' directories pick it up
                     # Initialize credits
                     month_year = datetime.now().strftime('%Y-%m')
                     supabase.table('student_credits').insert({
@@ -277,101 +286,47 @@ def get_current_student_id() -> Optional[str]:
     
     return None
 
+# Hardcoded notifications when the database is unavailable
+FALLBACK_NOTIFICATIONS = (
+    NotificationItem("credits_sent", "Credits Sent", "You sent 25 credits to Sarah Johnson",
+                     "Recognition for helping with the group project", "2024-01-15 14:30:00"),
+    NotificationItem("credits_received", "Credits Received", "You received 30 credits from Michael Chen",
+                     "For your excellent presentation skills", "2024-01-15 13:15:00"),
+    NotificationItem("endorsement_received", "Endorsement Received", "Your recognition received 5 endorsements",
+                     "Emma, David, Lisa, James, and Alex endorsed your recognition of Sarah", "2024-01-15 12:00:00"),
+    NotificationItem("endorsement_given", "Endorsement Given", "You endorsed Michael's recognition of Lisa",
+                     "Supporting recognition for teamwork", "2024-01-15 11:45:00"),
+    NotificationItem("credits_received", "Credits Received", "You received 15 credits from Emma Wilson",
+                     "For organizing the study group", "2024-01-15 10:20:00"),
+    NotificationItem("credits_sent", "Credits Sent", "You sent 20 credits to David Martinez",
+                     "Recognition for coding assistance", "2024-01-14 16:45:00"),
+    NotificationItem("endorsement_received", "Endorsement Received", "Your recognition received 3 endorsements",
+                     "Sarah, Michael, and Emma endorsed your recognition of David", "2024-01-14 15:30:00"),
+    NotificationItem("endorsement_given", "Endorsement Given", "You endorsed Sarah's recognition of James",
+                     "Supporting recognition for leadership", "2024-01-14 14:10:00"),
+    NotificationItem("credits_sent", "Credits Sent", "You sent 10 credits to Lisa Anderson",
+                     "Recognition for peer review feedback", "2024-01-14 13:00:00"),
+    NotificationItem("credits_received", "Credits Received", "You received 40 credits from Alex Thompson",
+                     "For mentoring in data structures", "2024-01-14 11:30:00"),
+)
+
 # Load notifications from database or use hardcoded fallback
-def get_notifications_data() -> List[Dict]:
-    """Get notifications from database or fallback to hardcoded"""
+def get_notifications_data() -> Sequence[NotificationItem]:
+    """Get notifications from database or fallback to hardcoded
+    
+    Rows are rendered from their templates with current student names.
+    """
     current_student_id = get_current_student_id()
     
     if DB_AVAILABLE and is_connected() and current_student_id:
         try:
-            notifications_data = get_notifications(current_student_id, limit=50)
+            notifications_data = get_notifications(current_student_id, limit=50, row_type=NotificationParams)
             if notifications_data:
-                return [
-                    {
-                        "type": n['notification_type'],
-                        "title": n['title'],
-                        "message": n['message'],
-                        "timestamp": n['created_at'],
-                        "details": n.get('details', '')
-                    }
-                    for n in notifications_data
-                ]
+                return render_notifications(notifications_data)
         except Exception as e:
             st.error(f"Error loading notifications: {e}")
     
-    # Fallback to hardcoded
-    return [
-    {
-        "type": "credits_sent",
-        "title": "Credits Sent",
-        "message": "You sent 25 credits to Sarah Johnson",
-        "timestamp": "2024-01-15 14:30:00",
-        "details": "Recognition for helping with the group project"
-    },
-    {
-        "type": "credits_received",
-        "title": "Credits Received",
-        "message": "You received 30 credits from Michael Chen",
-        "timestamp": "2024-01-15 13:15:00",
-        "details": "For your excellent presentation skills"
-    },
-    {
-        "type": "endorsement_received",
-        "title": "Endorsement Received",
-        "message": "Your recognition received 5 endorsements",
-        "timestamp": "2024-01-15 12:00:00",
-        "details": "Emma, David, Lisa, James, and Alex endorsed your recognition of Sarah"
-    },
-    {
-        "type": "endorsement_given",
-        "title": "Endorsement Given",
-        "message": "You endorsed Michael's recognition of Lisa",
-        "timestamp": "2024-01-15 11:45:00",
-        "details": "Supporting recognition for teamwork"
-    },
-    {
-        "type": "credits_received",
-        "title": "Credits Received",
-        "message": "You received 15 credits from Emma Wilson",
-        "timestamp": "2024-01-15 10:20:00",
-        "details": "For organizing the study group"
-    },
-    {
-        "type": "credits_sent",
-        "title": "Credits Sent",
-        "message": "You sent 20 credits to David Martinez",
-        "timestamp": "2024-01-14 16:45:00",
-        "details": "Recognition for coding assistance"
-    },
-    {
-        "type": "endorsement_received",
-        "title": "Endorsement Received",
-        "message": "Your recognition received 3 endorsements",
-        "timestamp": "2024-01-14 15:30:00",
-        "details": "Sarah, Michael, and Emma endorsed your recognition of David"
-    },
-    {
-        "type": "endorsement_given",
-        "title": "Endorsement Given",
-        "message": "You endorsed Sarah's recognition of James",
-        "timestamp": "2024-01-14 14:10:00",
-        "details": "Supporting recognition for leadership"
-    },
-    {
-        "type": "credits_sent",
-        "title": "Credits Sent",
-        "message": "You sent 10 credits to Lisa Anderson",
-        "timestamp": "2024-01-14 13:00:00",
-        "details": "Recognition for peer review feedback"
-    },
-    {
-        "type": "credits_received",
-        "title": "Credits Received",
-        "message": "You received 40 credits from Alex Thompson",
-        "timestamp": "2024-01-14 11:30:00",
-        "details": "For mentoring in data structures"
-    }
-]
+    return FALLBACK_NOTIFICATIONS
 
 def get_notification_class(notification_type: str) -> str:
     """Get CSS class based on notification type"""
@@ -419,22 +374,44 @@ def get_days_until_reset() -> int:
     days_until = (next_month - now).days
     return days_until
 
-def display_notification(notification: Dict):
+def display_notification(notification: NotificationItem):
     """Display a single notification card"""
-    css_class = get_notification_class(notification["type"])
+    css_class = get_notification_class(notification.notification_type)
     
     st.markdown(f"""
         <div class="notification-card {css_class}">
-            <div class="notification-title">{notification["title"]}</div>
-            <div class="notification-message">{notification["message"]}</div>
+            <div class="notification-title">{notification.title}</div>
+            <div class="notification-message">{notification.message}</div>
             <div class="notification-message" style="font-style: italic; margin-top: 0.5rem;">
-                {notification["details"]}
+                {notification.details or ''}
             </div>
-            <div class="notification-time">{format_timestamp(notification["timestamp"])}</div>
+            <div class="notification-time">{format_timestamp(notification.created_at)}</div>
+        </div>
+    """, unsafe_allow_html=True)
+
+def digest_message(digest) -> str:
+    """One-line summary of a month of compacted notifications"""
+    month = datetime.strptime(digest.month_year, '%Y-%m').strftime('%B %Y')
+    people = f"{digest.people_count} {'person' if digest.people_count == 1 else 'people'}"
+    if digest.notification_type == 'credits_received':
+        return f"You received {digest.credits} credits from {people} in {month}"
+    if digest.notification_type == 'credits_sent':
+        return f"You sent {digest.credits} credits to {people} in {month}"
+    if digest.notification_type == 'endorsement_received':
+        return f"You were endorsed {digest.notifications} times by {people} in {month}"
+    return f"You endorsed {people} in {month}"
+
+def display_digest(digest):
+    """Display a monthly digest card"""
+    css_class = get_notification_class(digest.notification_type)
+    st.markdown(f"""
+        <div class="notification-card {css_class}">
+            <div class="notification-message">{digest_message(digest)}</div>
+            <div class="notification-time">{digest.notifications} notifications</div>
         </div>
     """, unsafe_allow_html=True)
 
-def display_student_card(student: Dict, is_selected: bool = False, is_endorsed: bool = False):
+def display_student_card(student: StudentRef, is_selected: bool = False, is_endorsed: bool = False):
     """Display a student card"""
     classes = []
     if is_selected:
@@ -444,11 +421,65 @@ def display_student_card(student: Dict, is_selected: bool = False, is_endorsed:
     class_str = " ".join(classes) if classes else ""
     st.markdown(f"""
         <div class="student-card {class_str}">
-            <div class="student-name">{student["name"]}</div>
-            <div class="student-roll">{student["roll"]}</div>
+            <div class="student-name">{student.name}</div>
+            <div class="student-roll">{student.roll_number}</div>
         </div>
     """, unsafe_allow_html=True)
 
+def split_credits(total: int, count: int) -> List[int]:
+    """Split total as evenly as possible over count people (the first ones get the remainder)"""
+    share, remainder = divmod(total, count)
+    return [share + 1 if i < remainder else share for i in range(count)]
+
+def team_transfer_form(students: Sequence[StudentRef], available_credits: int, remaining_limit: int):
+    """Send credits to several students at once, validated and written as one transfer"""
+    st.markdown("### Recognize a Team")
+    if st.session_state.get('team_transfer_result'):
+        st.success(st.session_state.pop('team_transfer_result'))
+    with st.form("team_transfer_form"):
+        team = st.multiselect(
+            "Teammates:",
+            options=range(len(students)),
+            format_func=lambda idx: f"{students[idx].name} ({students[idx].roll_number})",
+            placeholder="Choose the students to recognize"
+        )
+        split_mode = st.radio("Amount", ["Credits each", "Split a total evenly"], horizontal=True)
+        credits = st.number_input("Credits:", min_value=0, max_value=max(remaining_limit, 1), value=1, step=1)
+        message = st.text_area("Message (optional):", placeholder="What did the team do well?", height=100)
+        submit_button = st.form_submit_button("Send to Team", use_container_width=True)
+    
+    if not submit_button:
+        return
+    if not team:
+        st.error("❌ Error: Choose at least one teammate.")
+        return
+    amounts = [credits] * len(team) if split_mode == "Credits each" else split_credits(credits, len(team))
+    total = sum(amounts)
+    if min(amounts) <= 0:
+        st.error(f"❌ Error: Every teammate must get at least 1 credit ({credits} credits can't be split {len(team)} ways).")
+    elif total > remaining_limit:
+        st.error(f"❌ Error: Monthly sending limit reached! You can only send {remaining_limit} more credits this month, and this team transfer needs {total}.")
+    elif total > available_credits:
+        st.error(f"❌ Error: Insufficient credits! You only have {available_credits} credits available, and this team transfer needs {total}.")
+    else:
+        current_student_id = get_current_student_id()
+        recipients = {students[idx].id: amount for idx, amount in zip(team, amounts)}
+        if DB_AVAILABLE and is_connected() and current_student_id and all(recipients):
+            # One atomic database call for the whole team
+            result = send_credits_multi(current_student_id, recipients, message or None)
+            if not result:
+                rejection = get_last_rejection()
+                st.error(f"⏳ {rejection}" if rejection else "❌ Failed to send credits. Check console for details.")
+                return
+        else:
+            # Fallback to session state
+            st.session_state.total_credits -= total
+            st.session_state.credits_sent += total
+        names = ", ".join(students[idx].name for idx in team)
+        # Shown after the rerun, so the balances above are already updated
+        st.session_state.team_transfer_result = f"✅ Successfully sent {total} credits to {names}!"
+        st.rerun()
+
 def send_credits_page():
     """Page for sending credits to students"""
     st.title("📤 Send Credits")
@@ -471,20 +502,28 @@ def send_credits_page():
     
     st.markdown("---")
     
+    students = get_students(st.session_state.current_student_roll)
+    if st.radio("Send to", ["One student", "A team"], horizontal=True, key="send_mode") == "A team":
+        team_transfer_form(students, available_credits, remaining_limit)
+        if st.button("← Back to Notifications", use_container_width=True):
+            st.session_state.page = 'notifications'
+            st.rerun()
+        return
+    
     # Display students in a grid
     st.markdown("### Select a Student")
     
     # Create columns for student cards
     cols = st.columns(2)
     
-    for idx, student in enumerate(STUDENTS):
+    for idx, student in enumerate(students):
         col_idx = idx % 2
         with cols[col_idx]:
             is_selected = (st.session_state.selected_student == idx)
             display_student_card(student, is_selected)
             
             # Button to select student
-            if st.button(f"Select {student['name']}", key=f"select_{idx}", use_container_width=True):
+            if st.button(f"Select {student.name}", key=f"select_{idx}", use_container_width=True):
                 st.session_state.selected_student = idx
                 st.rerun()
     
@@ -492,8 +531,8 @@ def send_credits_page():
     
     # Credit input form
     if st.session_state.selected_student is not None:
-        selected_student_data = STUDENTS[st.session_state.selected_student]
-        st.markdown(f"### Send Credits to {selected_student_data['name']}")
+        selected_student_data = students[st.session_state.selected_student]
+        st.markdown(f"### Send Credits to {selected_student_data.name}")
         
         # Display error message if there was a validation error
         if st.session_state.form_error:
@@ -558,20 +597,22 @@ def send_credits_page():
                 else:
                     # Send credits using database or session state
                     current_student_id = get_current_student_id()
-                    receiver_id = selected_student_data.get('id')
+                    receiver_id = selected_student_data.id
                     
                     if DB_AVAILABLE and is_connected() and current_student_id and receiver_id:
                         # Use database
                         try:
                             result = send_credits(current_student_id, receiver_id, credits_to_send, message)
                             if result:
-                                st.success(f"✅ Successfully sent {credits_to_send} credits to {selected_student_data['name']}!")
+                                st.success(f"✅ Successfully sent {credits_to_send} credits to {selected_student_data.name}!")
                                 if message and message.strip():
                                     st.info(f"Message: {message.strip()}")
-                                # Clear cache to refresh data
-                                get_students.clear()
                                 # Refresh stats after sending
                                 st.rerun()
+                            elif get_last_rejection():
+                                # Shed by admission control: keep the form and explain
+                                st.session_state.form_error = f"⏳ {get_last_rejection()}"
+                                st.rerun()
                             else:
                                 st.error("❌ Failed to send credits. Check console for details.")
                                 st.info("💡 Tip: Make sure students exist in database and RLS policies allow inserts.")
@@ -582,7 +623,7 @@ def send_credits_page():
                         # Fallback to session state
                         st.session_state.total_credits -= credits_to_send
                         st.session_state.credits_sent += credits_to_send
-                        st.success(f"✅ Successfully sent {credits_to_send} credits to {selected_student_data['name']}!")
+                        st.success(f"✅ Successfully sent {credits_to_send} credits to {selected_student_data.name}!")
                         if message and message.strip():
                             st.info(f"Message: {message.strip()}")
                     
@@ -610,22 +651,22 @@ def endorse_page():
     
     # Display students in a grid
     st.markdown("### Select a Student to Endorse")
+    students = get_students(st.session_state.current_student_roll)
+    
+    # Everyone this student has endorsed, as one set (database or session state)
+    current_student_id = get_current_student_id()
+    use_database = DB_AVAILABLE and is_connected() and current_student_id
+    endorsed = get_endorsed_students(current_student_id) if use_database else st.session_state.endorsed_students
     
     # Create columns for student cards
     cols = st.columns(2)
     
-    for idx, student in enumerate(STUDENTS):
+    for idx, student in enumerate(students):
         col_idx = idx % 2
         with cols[col_idx]:
-            student_id = f"{student['name']}_{student['roll']}"
-            # Check if endorsed (database or session state)
-            current_student_id = get_current_student_id()
-            endorsee_id = student.get('id')
-            
-            if DB_AVAILABLE and is_connected() and current_student_id and endorsee_id:
-                is_endorsed = check_endorsement_exists(current_student_id, endorsee_id)
-            else:
-                is_endorsed = student_id in st.session_state.endorsed_students
+            # Students without an ID (fallback) are tracked by name and roll
+            student_key = student.id if use_database and student.id else f"{student.name}_{student.roll_number}"
+            is_endorsed = student_key in endorsed
             
             display_student_card(student, is_selected=False, is_endorsed=is_endorsed)
             
@@ -638,33 +679,26 @@ def endorse_page():
                     disabled=True
                 )
             else:
-                if st.button(f"👍 Endorse {student['name']}", key=f"endorse_{idx}", use_container_width=True):
+                if st.button(f"👍 Endorse {student.name}", key=f"endorse_{idx}", use_container_width=True):
                     # Endorse using database or session state
-                    current_student_id = get_current_student_id()
-                    endorsee_id = student.get('id')
-                    
-                    if DB_AVAILABLE and is_connected() and current_student_id and endorsee_id:
+                    if use_database and student.id:
                         # Check if already endorsed in database
-                        if not check_endorsement_exists(current_student_id, endorsee_id):
-                            result = create_endorsement(current_student_id, endorsee_id)
+                        if not check_endorsement_exists(current_student_id, student.id):
+                            result = create_endorsement(current_student_id, student.id)
                             if result:
-                                st.success(f"✅ Successfully endorsed {student['name']}!")
-                                # Also add to session state for UI
-                                if student_id not in st.session_state.endorsed_students:
-                                    st.session_state.endorsed_students.append(student_id)
+                                st.success(f"✅ Successfully endorsed {student.name}!")
                                 st.rerun()
+                            elif get_last_rejection():
+                                st.warning(f"⏳ {get_last_rejection()}")
                             else:
                                 st.error("❌ Failed to create endorsement. Please try again.")
                         else:
                             st.warning("Already endorsed!")
-                            if student_id not in st.session_state.endorsed_students:
-                                st.session_state.endorsed_students.append(student_id)
                             st.rerun()
                     else:
                         # Fallback to session state
-                        if student_id not in st.session_state.endorsed_students:
-                            st.session_state.endorsed_students.append(student_id)
-                        st.success(f"✅ Successfully endorsed {student['name']}!")
+                        st.session_state.endorsed_students.add(student_key)
+                        st.success(f"✅ Successfully endorsed {student.name}!")
                         st.rerun()
     
     st.markdown("---")
@@ -673,7 +707,7 @@ def endorse_page():
     st.markdown("### Your Endorsements")
     col1, col2 = st.columns(2)
     with col1:
-        st.metric("Students Endorsed", f"{len(st.session_state.endorsed_students)}")
+        st.metric("Students Endorsed", f"{len(endorsed)}")
     with col2:
         # Get endorsements from database or session state
         current_student_id = get_current_student_id()
@@ -704,6 +738,19 @@ def redeem_page():
     available_for_redemption = stats.get('credits_received', st.session_state.credits_received)
     total_credits = stats.get('total_credits', st.session_state.total_credits)
     
+    # Lifetime totals: one running-sum row in the database, however many purchases there are
+    current_student_id = get_current_student_id()
+    use_database = DB_AVAILABLE and is_connected() and current_student_id
+    if use_database:
+        totals = get_redemption_totals(current_student_id)
+    else:
+        purchased = st.session_state.vouchers_purchased
+        totals = RedemptionTotals(
+            None, sum(p.total_credits for p in purchased), sum(p.total_value for p in purchased),
+            sum(p.num_vouchers for p in purchased), len(purchased),
+            purchased[-1].created_at if purchased else None
+        )
+    
     # Info section
     st.info(f"💡 **Redeem your received credits into vouchers!** Each credit is worth ₹{VOUCHER_RATE}. You can only redeem credits you have received.")
     
@@ -719,6 +766,14 @@ def redeem_page():
         max_voucher_value = available_for_redemption * VOUCHER_RATE
         st.metric("Max Voucher Value", f"₹{max_voucher_value}")
     
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Lifetime Credits Redeemed", f"{totals.credits_redeemed}")
+    with col2:
+        st.metric("Lifetime Voucher Value", f"₹{totals.value_redeemed:,.0f}")
+    with col3:
+        st.metric("Vouchers Purchased", f"{totals.vouchers_purchased}")
+    
     st.markdown("---")
     
     # Redemption form
@@ -785,19 +840,26 @@ def redeem_page():
                 st.error(f"❌ Error: Insufficient total credits! You only have {total_credits} credits available.")
             else:
                 # Process redemption
-                # Deduct from both total credits and received credits
-                st.session_state.total_credits -= total_credits_needed
-                st.session_state.credits_received -= total_credits_needed
-                
-                # Record voucher purchase
-                voucher_info = {
-                    "num_vouchers": num_vouchers,
-                    "credits_per_voucher": credits_per_voucher,
-                    "total_credits": total_credits_needed,
-                    "total_value": total_voucher_value,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                st.session_state.vouchers_purchased.append(voucher_info)
+                if use_database:
+                    # Atomic purchase in the database, claims one code per voucher
+                    purchase = purchase_vouchers(current_student_id, num_vouchers, credits_per_voucher)
+                    if not purchase:
+                        rejection = get_last_rejection()
+                        if rejection:
+                            st.warning(f"⏳ {rejection}")
+                        else:
+                            st.error("❌ Failed to purchase vouchers. Check console for details.")
+                        st.stop()
+                    # The purchase itself is in the database; keep its codes to show in the history
+                    st.session_state.voucher_codes[purchase['id']] = purchase.get('codes') or []
+                else:
+                    # Deduct from both total credits and received credits
+                    st.session_state.total_credits -= total_credits_needed
+                    st.session_state.credits_received -= total_credits_needed
+                    st.session_state.vouchers_purchased.append(VoucherPurchase(
+                        None, None, num_vouchers, credits_per_voucher, total_credits_needed,
+                        total_voucher_value, VOUCHER_RATE, datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    ))
                 
                 # Success message
                 if num_vouchers == 1:
@@ -810,29 +872,124 @@ def redeem_page():
     
     st.markdown("---")
     
-    # Display purchase history
-    if st.session_state.vouchers_purchased:
+    # Display purchase history (the latest purchases, numbered from the lifetime count)
+    if totals.purchases:
         st.markdown("### Recent Voucher Purchases")
-        for idx, voucher in enumerate(reversed(st.session_state.vouchers_purchased[-5:])):  # Show last 5
-            with st.expander(f"Voucher Purchase #{len(st.session_state.vouchers_purchased) - idx} - {voucher['timestamp']}"):
+        if use_database:
+            recent = get_voucher_purchases(current_student_id, limit=5)
+        else:
+            recent = st.session_state.vouchers_purchased[:-6:-1]
+        for idx, voucher in enumerate(recent):
+            with st.expander(f"Voucher Purchase #{totals.purchases - idx} - {voucher.created_at[:19].replace('T', ' ')}"):
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Vouchers", f"{voucher['num_vouchers']}")
+                    st.metric("Vouchers", f"{voucher.num_vouchers}")
                 with col2:
-                    st.metric("Credits Used", f"{voucher['total_credits']}")
+                    st.metric("Credits Used", f"{voucher.total_credits}")
                 with col3:
-                    st.metric("Total Value", f"₹{voucher['total_value']}")
+                    st.metric("Total Value", f"₹{voucher.total_value:,.0f}")
+                codes = st.session_state.voucher_codes.get(voucher.id)
+                if codes is None and voucher.id and st.button("Show voucher codes", key=f"codes_{voucher.id}"):
+                    codes = st.session_state.voucher_codes[voucher.id] = get_voucher_codes(voucher.id)
+                if codes:
+                    st.code("\n".join(codes), language=None)
     
     # Back button
     if st.button("← Back to Notifications", use_container_width=True):
         st.session_state.page = 'notifications'
         st.rerun()
 
+def recognition_feed_page():
+    """Feed of recent recognitions that can be endorsed individually"""
+    st.title("🌟 Recognition Feed")
+    st.markdown("---")
+    
+    current_student_id = get_current_student_id()
+    if not (DB_AVAILABLE and is_connected() and current_student_id):
+        st.info("The recognition feed is available when the database is connected.")
+    else:
+        PAGE_SIZE = 20
+        cursors = st.session_state.feed_cursors
+        before = cursors[-1] if cursors else None
+        feed = get_recognition_feed(current_student_id, limit=PAGE_SIZE, before=before)
+        names = get_student_names()
+        
+        if not feed:
+            st.info("No recognitions to display.")
+        
+        for entry in feed:
+            sender = names.get(entry.sender_id, "Someone")
+            receiver = names.get(entry.receiver_id, "someone")
+            st.markdown(f"""
+                <div class="notification-card notification-credits-received">
+                    <div class="notification-title">{sender} recognized {receiver} with {entry.amount} credits</div>
+                    <div class="notification-message" style="font-style: italic;">{entry.message or ''}</div>
+                    <div class="notification-time">{format_timestamp(entry.created_at)} · 👍 {entry.endorsements}</div>
+                </div>
+            """, unsafe_allow_html=True)
+            
+            if entry.endorsed_by_me:
+                st.button(f"✓ Endorsed ({entry.endorsements})", key=f"feed_{entry.id}",
+                          use_container_width=True, disabled=True)
+            elif entry.receiver_id == current_student_id:
+                st.button(f"👍 {entry.endorsements} endorsements of your recognition", key=f"feed_{entry.id}",
+                          use_container_width=True, disabled=True)
+            elif st.button(f"👍 Endorse ({entry.endorsements})", key=f"feed_{entry.id}", use_container_width=True):
+                result = create_endorsement(current_student_id, entry.receiver_id, entry.id)
+                if result:
+                    st.rerun()
+                elif get_last_rejection():
+                    st.warning(f"⏳ {get_last_rejection()}")
+                else:
+                    st.error("❌ Failed to create endorsement. Please try again.")
+        
+        # Keyset pagination: remember the cursor of each page we moved past
+        col1, col2 = st.columns(2)
+        with col1:
+            if cursors and st.button("← Newer", use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            if len(feed) == PAGE_SIZE and st.button("Older →", use_container_width=True):
+                cursors.append((feed[-1].created_at, feed[-1].id))
+                st.rerun()
+    
+    # Back button
+    if st.button("← Back to Notifications", use_container_width=True):
+        st.session_state.page = 'notifications'
+        st.rerun()
+
+def search_results_data(student_id: str, query: str) -> List[NotificationItem]:
+    """Transfers matching a search, rendered as notification cards (best match first)"""
+    results = []
+    for match in search_messages(student_id, query):
+        sent = match.sender_id == student_id
+        results.append(NotificationParams(
+            'credits_sent' if sent else 'credits_received', match.amount,
+            [match.receiver_id if sent else match.sender_id], match.message, match.created_at
+        ))
+    return render_notifications(results)
+
 def notifications_page():
     """Main notifications page"""
     st.title("🎉 Recent Notifications")
     st.markdown("---")
     
+    # Full-text search over the messages of the student's transfers
+    current_student_id = get_current_student_id()
+    if DB_AVAILABLE and is_connected() and current_student_id:
+        query = st.text_input("🔍 Search your recognitions",
+                              placeholder="e.g. hackathon, lab notes, \"thanks for the demo\"")
+        if query.strip():
+            results = search_results_data(current_student_id, query)
+            if results:
+                st.caption(f"{len(results)} {'match' if len(results) == 1 else 'matches'} for \"{query}\", best first")
+                for result in results:
+                    display_notification(result)
+            else:
+                st.info(f"No recognitions match \"{query}\".")
+            return
+    
     # Load notifications (from database or fallback)
     notifications = get_notifications_data()
     
@@ -842,6 +999,179 @@ def notifications_page():
             display_notification(notification)
     else:
         st.info("No notifications to display.")
+    
+    # Older notifications live on as monthly digests (see notification_retention.py)
+    if DB_AVAILABLE and is_connected() and current_student_id:
+        digests = get_notification_digests(current_student_id)
+        if digests:
+            st.markdown("### 📚 Earlier")
+            for digest in digests:
+                display_digest(digest)
+
+def months_ago(months: int) -> str:
+    """Return the 'YYYY-MM' month that is the given number of months before this one"""
+    now = datetime.now()
+    index = now.year * 12 + now.month - 1 - months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+@st.cache_data(ttl=300)  # Cache for 5 minutes
+def load_analytics(since_month: str) -> Dict:
+    """Aggregate monthly rollups into the admin analytics tables"""
+    # Imported here so pandas never slows down app start-up
+    import numpy as np
+    import pandas as pd
+    
+    rollups = get_monthly_rollups(since_month)
+    if not rollups:
+        return {}
+    
+    df = pd.DataFrame(rollups, columns=MonthlyRollup._fields)
+    df['value_redeemed'] = df['value_redeemed'].astype(float)
+    names = get_directory().names()
+    df['name'] = df['student_id'].map(names).fillna('Unknown')
+    
+    monthly = df.groupby('month_year')[[
+        'credits_sent', 'transfers_sent', 'credits_redeemed', 'value_redeemed',
+        'vouchers_purchased', 'endorsements_given'
+    ]].sum().sort_index()
+    monthly['active_senders'] = df[df['transfers_sent'] > 0].groupby('month_year')['student_id'].nunique()
+    monthly['active_senders'] = monthly['active_senders'].fillna(0).astype(int)
+    
+    current_month = datetime.now().strftime('%Y-%m')
+    current = df[df['month_year'] == current_month]
+    
+    def top(frame, column: str, k: int = 10):
+        values = frame[column].to_numpy()
+        order = np.argsort(-values, kind='stable')[:k]
+        return frame.iloc[order][['name', column]][values[order] > 0].reset_index(drop=True)
+    
+    return {
+        'monthly': monthly,
+        'top_senders': top(current, 'credits_sent'),
+        'top_receivers': top(current, 'credits_received'),
+        'current_month': current_month,
+    }
+
+def analytics_page():
+    """Admin analytics page built from the monthly rollups"""
+    st.title("📈 Analytics")
+    st.markdown("---")
+    
+    if not (DB_AVAILABLE and is_connected()):
+        st.info("Analytics are available when the database is connected.")
+    else:
+        window = st.selectbox("Show last", [3, 6, 12, 24], index=2, format_func=lambda m: f"{m} months")
+        analytics = load_analytics(months_ago(window - 1))
+        
+        if not analytics:
+            st.info("No activity recorded yet. Run migrations/001_monthly_rollups.sql to create the rollups.")
+        else:
+            monthly = analytics['monthly']
+            this_month = monthly.loc[analytics['current_month']] if analytics['current_month'] in monthly.index else None
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Credits Sent This Month", f"{int(this_month['credits_sent']) if this_month is not None else 0}")
+            with col2:
+                st.metric("Active Senders", f"{int(this_month['active_senders']) if this_month is not None else 0}")
+            with col3:
+                st.metric("Redeemed This Month", f"₹{this_month['value_redeemed'] if this_month is not None else 0:,.0f}")
+            with col4:
+                st.metric("Endorsements This Month", f"{int(this_month['endorsements_given']) if this_month is not None else 0}")
+            
+            st.markdown("---")
+            st.markdown("### Credits Sent by Month")
+            st.bar_chart(monthly[['credits_sent']])
+            st.markdown("### Redemption Value by Month (₹)")
+            st.bar_chart(monthly[['value_redeemed']])
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("### Top Senders This Month")
+                st.dataframe(analytics['top_senders'], use_container_width=True, hide_index=True)
+            with col2:
+                st.markdown("### Top Receivers This Month")
+                st.dataframe(analytics['top_receivers'], use_container_width=True, hide_index=True)
+            
+            if st.button("🔄 Refresh Analytics", use_container_width=True):
+                load_analytics.clear()
+                st.rerun()
+        
+        with st.expander("⚙️ Write Admission Control"):
+            metrics = get_write_metrics()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Admitted", f"{metrics['admitted']}")
+            with col2:
+                st.metric("Queued", f"{metrics['queued']}", delta=f"{metrics['avg_queue_wait_ms']:.0f} ms avg wait", delta_color="off")
+            with col3:
+                st.metric("Shed (Rate Limited)", f"{metrics['shed_rate_limited']}")
+            with col4:
+                st.metric("Shed (Overloaded)", f"{metrics['shed_overloaded'] + metrics['shed_timeout']}")
+        
+        with st.expander("🎟️ Voucher Code Pool"):
+            pool = get_voucher_pool_stats()
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Codes Available", f"{pool.get('available', 0)}")
+            with col2:
+                st.metric("Claimed (Last Hour)", f"{pool.get('claimed_last_hour', 0)}")
+            with col3:
+                st.metric("Minted (Last Hour)", f"{pool.get('minted_last_hour', 0)}")
+    
+    with st.expander("🔬 Rerun Profiling"):
+        st.caption("Profiles every rerun of your session only. Add ?profile=1 to the URL to profile from the first load.")
+        if st.session_state.profile_reruns:
+            if st.button("Stop Profiling", use_container_width=True):
+                st.session_state.profile_reruns = False
+                st.rerun()
+        elif st.button("Start Profiling", use_container_width=True):
+            st.session_state.profile_reruns = True
+            st.rerun()
+    
+    # Back button
+    if st.button("← Back to Notifications", use_container_width=True):
+        st.session_state.page = 'notifications'
+        st.rerun()
+
+WINDOW_LABELS = {'week': 'this week', 'month': 'this month', 'term': 'this term'}
+
+def leaderboard_page():
+    """Top receivers this week, month and term"""
+    st.title("🏆 Leaderboard")
+    st.markdown("---")
+    
+    if not (DB_AVAILABLE and is_connected()):
+        st.info("Leaderboards are available when the database is connected.")
+    else:
+        window = st.radio("Credits received", WINDOWS, horizontal=True,
+                          format_func=lambda w: WINDOW_LABELS[w].capitalize())
+        leaderboards = get_leaderboards()
+        current_student_id = get_current_student_id()
+        names = get_student_names()
+        
+        top = leaderboards.top(window, 10)
+        if not top:
+            st.info(f"No credits received {WINDOW_LABELS[window]} yet.")
+        for position, (student_id, credits) in enumerate(top, start=1):
+            rank = leaderboards.rank(window, student_id)
+            name = names.get(student_id, 'Unknown')
+            if student_id == current_student_id:
+                name = f"**{name} (you)**"
+            st.markdown(f"#{rank} &nbsp; {name} — {credits} credits")
+        
+        if current_student_id:
+            rank = leaderboards.rank(window, current_student_id)
+            st.markdown("---")
+            if rank:
+                st.metric("Your Rank", f"#{rank} of {leaderboards.size(window)}")
+            else:
+                st.info(f"You haven't received credits {WINDOW_LABELS[window]} yet.")
+    
+    # Back button
+    if st.button("← Back to Notifications", use_container_width=True):
+        st.session_state.page = 'notifications'
+        st.rerun()
 
 def get_student_stats_from_db():
     """Get student stats from database or return defaults"""
@@ -871,7 +1201,14 @@ def get_student_stats_from_db():
 def main():
     # Check database connection status
     if DB_AVAILABLE and is_connected():
-        st.sidebar.success("✅ Connected to database")
+        breaker = get_breaker_state()
+        if breaker['state'] == 'closed':
+            st.sidebar.success("✅ Connected to database")
+        else:
+            st.sidebar.error(
+                f"🔌 Database unavailable ({breaker['reason']}) for {breaker['open_for_s']:.0f}s. "
+                "Showing cached data; reconnecting in the background."
+            )
     elif DB_AVAILABLE:
         st.sidebar.warning("⚠️ Database not connected - check config.py")
     
@@ -903,6 +1240,19 @@ def main():
             st.session_state.page = 'endorse'
             st.rerun()
         
+        if st.button("🌟 Recognition Feed", use_container_width=True):
+            st.session_state.page = 'feed'
+            st.session_state.feed_cursors = []
+            st.rerun()
+        
+        if st.button("🏆 Leaderboard", use_container_width=True):
+            st.session_state.page = 'leaderboard'
+            st.rerun()
+        
+        if st.button("📈 Analytics", use_container_width=True):
+            st.session_state.page = 'analytics'
+            st.rerun()
+        
         st.markdown("---")
         st.markdown("### 📊 Stats")
         
@@ -913,6 +1263,13 @@ def main():
         st.metric("Credits Received", f"{stats['credits_received']}")
         st.metric("Endorsements Received", f"{stats['endorsements_received']}")
         
+        # Rank from the in-process leaderboard index (no transaction scan)
+        current_student_id = get_current_student_id()
+        if current_student_id:
+            rank = get_leaderboards().rank('month', current_student_id)
+            if rank:
+                st.markdown(f"🏆 You are **#{rank}** this month")
+        
         # Days until reset
         days_until_reset = get_days_until_reset()
         st.metric("Days Until Reset", f"{days_until_reset}", 
@@ -928,11 +1285,63 @@ def main():
         send_credits_page()
     elif st.session_state.page == 'endorse':
         endorse_page()
+    elif st.session_state.page == 'feed':
+        recognition_feed_page()
     elif st.session_state.page == 'redeem':
         redeem_page()
+    elif st.session_state.page == 'leaderboard':
+        leaderboard_page()
+    elif st.session_state.page == 'analytics':
+        analytics_page()
     else:
         notifications_page()
 
+PROFILE_DIR = os.getenv("BOOSTLY_PROFILE_DIR", "profiles")
+
+def render_profile(profile, path: Optional[str]):
+    """Show where the rerun spent its time"""
+    with st.expander(f"🔬 Rerun profile: {profile.wall_ms:.0f} ms ({st.session_state.page})"):
+        cols = st.columns(max(len(profile.breakdown), 1))
+        for col, (category, ms) in zip(cols, profile.breakdown.items()):
+            with col:
+                st.metric(category.capitalize(), f"{ms:.0f} ms")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**App functions**")
+            st.dataframe([{"function": name, "ms": ms} for name, ms in profile.pages[:10]],
+                         use_container_width=True, hide_index=True)
+        with col2:
+            st.markdown("**db_helper calls**")
+            st.dataframe([{"call": name, "ms": ms} for name, ms in profile.db_calls[:10]],
+                         use_container_width=True, hide_index=True)
+        
+        st.markdown("**Flame summary**")
+        st.code(profile.flame or "Rerun too short to sample.", language=None)
+        st.caption(f"{profile.samples} samples saved to {path}" if path else f"{profile.samples} samples (could not be saved)")
+
+def run_profiled():
+    """Run main() under the sampling profiler and show the result below the page"""
+    from rerun_profiler import RerunProfiler
+    
+    page = st.session_state.page
+    profiler = RerunProfiler(main)
+    try:
+        with profiler:
+            main()
+    finally:
+        # Saved even when the rerun ends early through st.rerun() or st.stop()
+        try:
+            path = profiler.dump(PROFILE_DIR, page)
+        except Exception as e:
+            print(f"Error saving rerun profile: {e}")
+            path = None
+    render_profile(profiler.summary(), path)
+
 if __name__ == "__main__":
-    main()
+    # Sessions that don't opt in pay only these two lookups
+    if st.session_state.profile_reruns or st.query_params.get("profile") == "1":
+        run_profiled()
+    else:
+        main()
 
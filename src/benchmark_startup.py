@@ -0,0 +1,130 @@
+"""
+Startup benchmark for Boostly
+Reports import time and time-to-first-render of app.py with the database
+healthy (real config), slow or down.
+
+Usage:
+    python benchmark_startup.py                 # all scenarios
+    python benchmark_startup.py --scenario slow --delay 3
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ["configured", "slow", "down"]
+
+
+class SlowPostgrestHandler(BaseHTTPRequestHandler):
+    """Answers every PostgREST request with an empty result after a delay"""
+    delay = 2.0
+
+    def _reply(self):
+        time.sleep(self.delay)
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PATCH = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_slow_server(delay: float) -> str:
+    """Start a local slow PostgREST stand-in and return its URL"""
+    SlowPostgrestHandler.delay = delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowPostgrestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def closed_port_url() -> str:
+    """Return a local URL nothing is listening on (connection refused)"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f"http://127.0.0.1:{port}"
+
+
+def measure_in_child(timeout: float) -> dict:
+    """Run inside the child process: time the import and the first render"""
+    sys.path.insert(0, HERE)
+    start = time.perf_counter()
+    import db_helper  # noqa: F401
+    import_seconds = time.perf_counter() - start
+
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(os.path.join(HERE, "app.py"), default_timeout=timeout)
+    start = time.perf_counter()
+    app.run()
+    first_render_seconds = time.perf_counter() - start
+
+    return {
+        "import_db_helper_s": round(import_seconds, 4),
+        "first_render_s": round(first_render_seconds, 4),
+        "exceptions": len(app.exception),
+    }
+
+
+def run_scenario(scenario: str, delay: float, timeout: float) -> dict:
+    """Run one scenario in a fresh interpreter so nothing is pre-imported"""
+    env = dict(os.environ)
+    if scenario == "slow":
+        env["SUPABASE_URL"] = start_slow_server(delay)
+        env["SUPABASE_KEY"] = "benchmark"
+        env["SUPABASE_TIMEOUT"] = str(delay * 2)
+    elif scenario == "down":
+        env["SUPABASE_URL"] = closed_port_url()
+        env["SUPABASE_KEY"] = "benchmark"
+
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, __file__, "--child", "--timeout", str(timeout)],
+        env=env, cwd=HERE, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+
+    result = {"scenario": scenario, "process_wall_s": round(wall, 4)}
+    try:
+        result.update(json.loads(completed.stdout.strip().splitlines()[-1]))
+    except (IndexError, ValueError):
+        result["error"] = completed.stderr.strip().splitlines()[-1:] or ["no output"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Boostly cold start")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append")
+    parser.add_argument("--delay", type=float, default=2.0, help="Response delay of the slow DB (seconds)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Max seconds for the first render")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_in_child(args.timeout)))
+        return
+
+    print(f"{'scenario':<12}{'import (s)':>12}{'first render (s)':>18}{'process (s)':>14}")
+    for scenario in args.scenario or SCENARIOS:
+        result = run_scenario(scenario, args.delay, args.timeout)
+        if "error" in result:
+            print(f"{scenario:<12}  failed: {result['error']}")
+            continue
+        print(f"{scenario:<12}{result['import_db_helper_s']:>12.3f}"
+              f"{result['first_render_s']:>18.3f}{result['process_wall_s']:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Circuit breaker for the Boostly database backend
+Trips after consecutive failures or consecutive calls slower than the latency
+SLO, then fails fast instead of letting every call wait for its own timeout.
+While open, a background thread probes the backend and closes the breaker
+as soon as a probe succeeds within the SLO.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"  # a recovery probe is in flight
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the backend while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure / latency-SLO breaker with background recovery probes"""
+
+    def __init__(self, probe: Callable[[], object], failure_threshold: int = 3,
+                 latency_slo: float = 2.0, slow_call_threshold: int = 3,
+                 probe_interval: float = 5.0,
+                 is_failure: Callable[[Exception], bool] = lambda error: True):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.latency_slo = latency_slo
+        self.slow_call_threshold = slow_call_threshold
+        self.probe_interval = probe_interval
+        self.is_failure = is_failure
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._consecutive_slow = 0
+        self._reason: Optional[str] = None
+        self._opened_at: Optional[float] = None
+        self._trips = 0
+        self._rejected = 0
+        self._prober: Optional[threading.Thread] = None
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def call(self, func: Callable[[], T]) -> T:
+        """Call func through the breaker, raising CircuitOpenError while open"""
+        if self._state != CLOSED:
+            with self._lock:
+                self._rejected += 1
+            raise CircuitOpenError(f"Database unavailable ({self._reason}), failing fast")
+
+        start = time.monotonic()
+        try:
+            result = func()
+        except Exception as e:
+            if self.is_failure(e):
+                self._record(failed=True, slow=False, reason=f"{type(e).__name__}")
+            raise
+        elapsed = time.monotonic() - start
+        self._record(failed=False, slow=elapsed > self.latency_slo,
+                     reason=f"{elapsed:.1f}s responses over {self.latency_slo:.1f}s SLO")
+        return result
+
+    def _record(self, failed: bool, slow: bool, reason: str):
+        with self._lock:
+            self._consecutive_failures = self._consecutive_failures + 1 if failed else 0
+            if slow:
+                self._consecutive_slow += 1
+            elif not failed:
+                self._consecutive_slow = 0
+
+            if self._state == CLOSED and (
+                self._consecutive_failures >= self.failure_threshold
+                or self._consecutive_slow >= self.slow_call_threshold
+            ):
+                self._state = OPEN
+                self._reason = reason
+                self._opened_at = time.time()
+                self._trips += 1
+                print(f"Circuit breaker opened: {self._reason}")
+                self._start_prober()
+
+    def _start_prober(self):
+        # Called with the lock held
+        if self._prober is None or not self._prober.is_alive():
+            self._prober = threading.Thread(target=self._probe_until_recovered, name="db-breaker-probe", daemon=True)
+            self._prober.start()
+
+    def _probe_until_recovered(self):
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                self._state = HALF_OPEN
+            start = time.monotonic()
+            try:
+                self.probe()
+                healthy = time.monotonic() - start <= self.latency_slo
+            except Exception:
+                healthy = False
+            with self._lock:
+                if healthy:
+                    self._state = CLOSED
+                    self._consecutive_failures = 0
+                    self._consecutive_slow = 0
+                    self._opened_at = None
+                    print("Circuit breaker closed: database recovered")
+                    return
+                self._state = OPEN
+
+    def snapshot(self) -> Dict[str, object]:
+        """Current state for display and monitoring"""
+        with self._lock:
+            return {
+                'state': self._state,
+                'reason': self._reason,
+                'open_for_s': round(time.time() - self._opened_at, 1) if self._opened_at else 0.0,
+                'trips': self._trips,
+                'rejected': self._rejected,
+                'consecutive_failures': self._consecutive_failures,
+            }
@@ -3,61 +3,371 @@ Database Helper Module for Boostly
 Provides functions to interact with Supabase database
 """
 
-from supabase import create_client, Client
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, FrozenSet, Iterator, Optional, Tuple, Type, TYPE_CHECKING
+from collections import OrderedDict
 from datetime import datetime
+import functools
+import inspect
 import os
+import threading
 
-# Initialize Supabase client
+from models import (
+    R, Student, StudentChange, StudentCredits, CreditBalance, CreditTransaction,
+    Notification, NotificationDigest, VoucherPurchase, RedemptionTotals, MonthlyRollup, ReceivedCredits, Recognition, FeedEntry,
+    MessageMatch, columns, to_row, to_rows
+)
+from rate_limit import AdmissionRejected, create_controller
+from circuit_breaker import CircuitBreaker
+from shared_cache import create_cache
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Supabase credentials
 # Try to get from environment variables first, then from config
 try:
-    from config import SUPABASE_URL, SUPABASE_KEY
+    from config import SUPABASE_URL as _CONFIG_URL, SUPABASE_KEY as _CONFIG_KEY
 except ImportError:
-    SUPABASE_URL = os.getenv("SUPABASE_URL", "")
-    SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
+    _CONFIG_URL, _CONFIG_KEY = "", ""
+
+SUPABASE_URL = os.getenv("SUPABASE_URL") or _CONFIG_URL
+SUPABASE_KEY = os.getenv("SUPABASE_KEY") or _CONFIG_KEY
+
+# Seconds to wait for a PostgREST response before giving up
+DB_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+
+# 'supabase' (default) or 'local' for the SQLite stand-in in local_backend.py
+BACKEND = os.getenv("BOOSTLY_BACKEND", "supabase")
+LOCAL_DB_PATH = os.getenv("BOOSTLY_LOCAL_DB", "boostly_local.db")
+
+# The client is created lazily on first use, so importing this module (and
+# app.py) never pays for importing supabase or building the client
+_supabase: Optional["Client"] = None
+_client_initialized = False
+_client_lock = threading.Lock()
+
+
+def get_client() -> Optional["Client"]:
+    """Get the shared Supabase client, creating it on first use (None if unavailable)"""
+    global _supabase, _client_initialized
+    if _client_initialized:
+        return _supabase
+    
+    with _client_lock:
+        if not _client_initialized:
+            if BACKEND == 'local':
+                from local_backend import create_local_client
+                _supabase = create_local_client(LOCAL_DB_PATH)
+            elif SUPABASE_URL and SUPABASE_KEY:
+                try:
+                    from supabase import create_client
+                    from supabase.lib.client_options import ClientOptions
+                    _supabase = create_client(
+                        SUPABASE_URL, SUPABASE_KEY,
+                        options=ClientOptions(postgrest_client_timeout=DB_TIMEOUT_SECONDS)
+                    )
+                except Exception as e:
+                    print(f"Warning: Could not connect to Supabase: {e}")
+                    _supabase = None
+            _client_initialized = True
+    return _supabase
+
+
+# =====================================================
+# CIRCUIT BREAKER
+# =====================================================
+
+# Postgres error classes that mean the database itself is in trouble
+# (connection, resources, operator intervention such as statement timeout)
+_BACKEND_ERROR_CLASSES = ('08', '53', '57', '58', 'XX')
+
+# PostgREST's own codes when it cannot reach Postgres (503) or times out
+# waiting for a pooled connection (504)
+_POSTGREST_BACKEND_CODES = frozenset({'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003'})
+
+
+def _is_backend_failure(error: Exception) -> bool:
+    """Whether an error means the backend is unhealthy (not e.g. 'no rows' or a constraint)"""
+    if type(error).__name__ == 'APIError':
+        code = str(getattr(error, 'code', '') or '')
+        # Gateway errors with non-JSON bodies carry the HTTP status as their code
+        is_server_status = len(code) == 3 and code.startswith('5') and code.isdigit()
+        return code.startswith(_BACKEND_ERROR_CLASSES) or code in _POSTGREST_BACKEND_CODES or is_server_status
+    return True
 
-# Create client (will be None if keys not set)
-supabase: Optional[Client] = None
-if SUPABASE_URL and SUPABASE_KEY:
+
+def _probe_database():
+    """Cheapest possible round trip, used to detect recovery"""
+    get_client().table('students').select('id').limit(1).execute()
+
+
+_breaker = CircuitBreaker(
+    probe=_probe_database,
+    failure_threshold=int(os.getenv("BOOSTLY_BREAKER_FAILURES", "3")),
+    latency_slo=float(os.getenv("BOOSTLY_LATENCY_SLO", "2.0")),
+    slow_call_threshold=int(os.getenv("BOOSTLY_BREAKER_SLOW_CALLS", "3")),
+    probe_interval=float(os.getenv("BOOSTLY_PROBE_INTERVAL", "5.0")),
+    is_failure=_is_backend_failure,
+)
+_call_state = threading.local()
+
+# Last good result of each read, served while the database is failing
+_STALE_CACHE_SIZE = 2048
+_stale_results: "OrderedDict[tuple, object]" = OrderedDict()
+_stale_lock = threading.Lock()
+
+
+def _execute(query):
+    """Execute a PostgREST query through the circuit breaker"""
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    except Exception as e:
-        print(f"Warning: Could not connect to Supabase: {e}")
-        supabase = None
+        return _breaker.call(query.execute)
+    except Exception:
+        _call_state.failed = True
+        raise
+
+
+def _serve_stale(func):
+    """Return the last good result of a read when its query failed or the breaker is open
+    
+    The undecorated function is kept as .fresh: a stale balance must never
+    be the base of a read-modify-write.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        outer_failed = getattr(_call_state, 'failed', False)
+        _call_state.failed = False
+        result = func(*args, **kwargs)
+        failed = _call_state.failed
+        _call_state.failed = outer_failed or failed
+        
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        with _stale_lock:
+            if failed:
+                return _stale_results.get(key, result)
+            _stale_results[key] = result
+            _stale_results.move_to_end(key)
+            if len(_stale_results) > _STALE_CACHE_SIZE:
+                _stale_results.popitem(last=False)
+        return result
+    wrapper.fresh = func
+    return wrapper
+
+
+def get_breaker_state() -> Dict[str, object]:
+    """Get circuit breaker state ('closed', 'open' or 'half_open') and counters"""
+    return _breaker.snapshot()
+
+
+# Per-student rate limits and a global concurrency cap for writes
+_admission = create_controller()
+_rejections = threading.local()
+
+
+def _admission_controlled(func):
+    """Run a write only if the acting student (first parameter) is admitted"""
+    signature = inspect.signature(func)
+    actor = next(iter(signature.parameters))
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _rejections.last = None
+        student_id = signature.bind(*args, **kwargs).arguments[actor]
+        try:
+            with _admission.admit(student_id, func.__name__):
+                return func(*args, **kwargs)
+        except AdmissionRejected as e:
+            _rejections.last = e
+            print(f"Rejected {func.__name__} for {student_id}: {e}")
+            return None
+    return wrapper
+
+
+def get_last_rejection() -> Optional[AdmissionRejected]:
+    """Get why the last write on this thread was rejected (None if it was admitted)"""
+    return getattr(_rejections, 'last', None)
+
+
+def get_write_metrics() -> Dict[str, float]:
+    """Get admission control counters (admitted, queued, shed) and current load"""
+    return _admission.metrics()
+
+
+# =====================================================
+# READ CACHE
+# =====================================================
+
+# Reads shared by every session (and every replica, with REDIS_URL), tagged
+# by student; writes invalidate the students they touched
+_cache = create_cache()
+STUDENTS_TAG = 'students'
+
+
+def _student_tags(student_ids) -> Tuple[str, ...]:
+    return tuple(f"student:{student_id}" for student_id in student_ids)
+
+
+def _cached(*student_params: str):
+    """Cache a read, tagged with the students passed as the named parameters
+    
+    Failed reads (including stale results served by _serve_stale) are not
+    cached. The query itself is available as .uncached, bypassing both this
+    cache and stale serving, for read-modify-write paths that must see the
+    database (a failed read returns the function's default, never an old
+    result).
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _cache.enabled:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            key = func.__name__ + repr(tuple(
+                value.__name__ if isinstance(value, type) else value for value in arguments.values()
+            ))
+            found, value, stamp = _cache.lookup(key, _student_tags(arguments[p] for p in student_params))
+            if found:
+                return value
+            
+            outer_failed = getattr(_call_state, 'failed', False)
+            _call_state.failed = False
+            result = func(*args, **kwargs)
+            failed = _call_state.failed
+            _call_state.failed = outer_failed or failed
+            if not failed:
+                _cache.store(stamp, result)
+            return result
+        wrapper.uncached = getattr(func, 'fresh', func)
+        return wrapper
+    return decorator
+
+
+def invalidate_students(*student_ids: str):
+    """Drop cached reads of these students, in this process and all replicas"""
+    _cache.invalidate(*_student_tags(student_ids))
+
+
+def invalidate_students_list():
+    """Tell every replica that students were added, renamed or removed"""
+    _cache.invalidate(STUDENTS_TAG)
+
+
+def on_cache_invalidation(callback: Callable[[Tuple[str, ...]], None]):
+    """Register a callback for the tags of every cache invalidation (local or remote)"""
+    _cache.on_invalidate(callback)
+
+
+def get_cache_metrics() -> Dict[str, object]:
+    """Get read cache counters (hits, misses, invalidations) and its backend"""
+    return _cache.metrics()
 
 
 # =====================================================
 # STUDENT OPERATIONS
 # =====================================================
 
-def get_all_students() -> List[Dict]:
-    """Get all students from database"""
+@_serve_stale
+def get_all_students(row_type: Type[R] = Student) -> List[R]:
+    """Get all students from database, selecting only the fields of row_type"""
+    supabase = get_client()
     if not supabase:
         return []
     
     try:
-        response = supabase.table('students').select('*').order('name').execute()
-        return response.data if response.data else []
+        response = _execute(supabase.table('students').select(columns(row_type)).order('name'))
+        return to_rows(row_type, response.data)
     except Exception as e:
         print(f"Error fetching students: {e}")
         return []
 
 
-def get_student_by_roll(roll_number: str) -> Optional[Dict]:
-    """Get student by roll number"""
+@_serve_stale
+def get_student_by_roll(roll_number: str, row_type: Type[R] = Student) -> Optional[R]:
+    """Get student by roll number, selecting only the fields of row_type"""
+    supabase = get_client()
     if not supabase:
         return None
     
     try:
-        response = supabase.table('students').select('*').eq('roll_number', roll_number).single().execute()
-        return response.data if response.data else None
+        response = _execute(supabase.table('students').select(columns(row_type)).eq('roll_number', roll_number).single())
+        return to_row(row_type, response.data) if response.data else None
     except Exception as e:
         print(f"Error fetching student: {e}")
         return None
 
 
-def get_student_credits(student_id: str, month_year: Optional[str] = None) -> Optional[Dict]:
-    """Get student's current credit balance"""
+@_serve_stale
+def get_students_version() -> Optional[Tuple[str, int]]:
+    """Get (newest updated_at, row count) of the students table, a cheap change check"""
+    supabase = get_client()
+    if not supabase:
+        return None
+    
+    try:
+        response = _execute(supabase.table('students')
+            .select('updated_at', count='exact')
+            .order('updated_at', desc=True)
+            .limit(1))
+        newest = response.data[0]['updated_at'] if response.data else ''
+        return (newest or '', response.count or 0)
+    except Exception as e:
+        print(f"Error checking students version: {e}")
+        return None
+
+
+def get_students_changed_since(since: str, page_size: int = 1000,
+                               row_type: Type[R] = StudentChange) -> Optional[List[R]]:
+    """Get students whose updated_at is after since, oldest change first (None on error)
+    
+    row_type must include updated_at. Used for incremental sync of the
+    student directory; errors return None so a failed sync is never taken
+    for "nothing changed".
+    """
+    supabase = get_client()
+    if not supabase:
+        return None
+    
+    try:
+        rows: List[R] = []
+        while True:
+            response = _execute(supabase.table('students').select(columns(row_type))
+                .gt('updated_at', since).order('updated_at').order('id')
+                .range(len(rows), len(rows) + page_size - 1))
+            page = to_rows(row_type, response.data)
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+    except Exception as e:
+        print(f"Error fetching changed students: {e}")
+        return None
+
+
+def get_student_tombstones(since: str) -> Optional[List[Tuple[str, str]]]:
+    """Get (student_id, deleted_at) of students deleted after since (None on error)"""
+    supabase = get_client()
+    if not supabase:
+        return None
+    
+    try:
+        response = _execute(supabase.table('student_tombstones')
+            .select('student_id,deleted_at')
+            .gt('deleted_at', since)
+            .order('deleted_at'))
+        return [(str(row['student_id']), row['deleted_at']) for row in response.data or []]
+    except Exception as e:
+        print(f"Error fetching student tombstones: {e}")
+        return None
+
+
+@_cached('student_id')
+@_serve_stale
+def get_student_credits(student_id: str, month_year: Optional[str] = None,
+                        row_type: Type[R] = StudentCredits) -> Optional[R]:
+    """Get student's current credit balance, selecting only the fields of row_type"""
+    supabase = get_client()
     if not supabase:
         return None
     
@@ -65,46 +375,76 @@ def get_student_credits(student_id: str, month_year: Optional[str] = None) -> Op
         month_year = datetime.now().strftime('%Y-%m')
     
     try:
-        response = supabase.table('student_credits')\
-            .select('*')\
-            .eq('student_id', student_id)\
-            .eq('month_year', month_year)\
-            .single().execute()
-        return response.data if response.data else None
+        response = _execute(supabase.table('student_credits')
+            .select(columns(row_type))
+            .eq('student_id', student_id)
+            .eq('month_year', month_year)
+            .single())
+        return to_row(row_type, response.data) if response.data else None
     except Exception as e:
         print(f"Error fetching student credits: {e}")
         return None
 
 
+def correct_student_credits(student_id: str, month_year: str, expected: Dict[str, int],
+                            seen: Optional[Dict[str, int]] = None) -> bool:
+    """Write audited balance fields to one student's month (ledger_reconciliation.py)
+
+    seen holds the fields as the audit read them: the update only applies
+    while the row still holds those values, so a transfer that landed after
+    the audit is never overwritten (rerun the audit instead). With seen None
+    the row was missing and is inserted. Returns whether a row was written.
+    """
+    supabase = get_client()
+    if not supabase:
+        return False
+
+    try:
+        if seen is None:
+            response = _execute(supabase.table('student_credits').insert({
+                'student_id': student_id,
+                'month_year': month_year,
+                'monthly_limit': 100,
+                **expected
+            }))
+        else:
+            query = (supabase.table('student_credits').update(expected)
+                .eq('student_id', student_id)
+                .eq('month_year', month_year))
+            for column, value in seen.items():
+                query = query.eq(column, value)
+            response = _execute(query)
+        return bool(response.data)
+    except Exception as e:
+        print(f"Error correcting credits of {student_id} for {month_year}: {e}")
+        return False
+    finally:
+        invalidate_students(student_id)
+
+
 # =====================================================
 # CREDIT TRANSACTIONS
 # =====================================================
 
+# Called with the transaction dict after each successful send_credits, so
+# in-process state (e.g. leaderboards) can follow writes without a reload
+_transfer_listeners: List[Callable[[Dict], None]] = []
+
+
+def on_transfer(callback: Callable[[Dict], None]):
+    """Register a callback for transfers made by this process"""
+    _transfer_listeners.append(callback)
+
+
+@_admission_controlled
 def send_credits(sender_id: str, receiver_id: str, amount: int, message: Optional[str] = None) -> Optional[Dict]:
     """Send credits from one student to another"""
+    supabase = get_client()
     if not supabase:
         print("Error: Supabase client not available")
         return None
     
     try:
-        # Get student names for notifications
-        sender_name = 'You'
-        receiver_name = 'Student'
-        
-        try:
-            sender_result = supabase.table('students').select('name').eq('id', sender_id).single().execute()
-            if sender_result.data:
-                sender_name = sender_result.data.get('name', 'You')
-        except:
-            pass
-        
-        try:
-            receiver_result = supabase.table('students').select('name').eq('id', receiver_id).single().execute()
-            if receiver_result.data:
-                receiver_name = receiver_result.data.get('name', 'Student')
-        except:
-            pass
-        
         # Create transaction
         transaction_data = {
             'sender_id': sender_id,
@@ -114,7 +454,7 @@ def send_credits(sender_id: str, receiver_id: str, amount: int, message: Optiona
             'transaction_type': 'transfer'
         }
         
-        response = supabase.table('credit_transactions').insert(transaction_data).execute()
+        response = _execute(supabase.table('credit_transactions').insert(transaction_data))
         transaction = response.data[0] if response.data else None
         
         if not transaction:
@@ -123,46 +463,45 @@ def send_credits(sender_id: str, receiver_id: str, amount: int, message: Optiona
         
         # Update sender credits
         month_year = datetime.now().strftime('%Y-%m')
-        sender_credits = get_student_credits(sender_id, month_year)
+        sender_credits = get_student_credits.uncached(sender_id, month_year, CreditBalance)
         
         if not sender_credits:
             print(f"Error: Sender credits not found for {sender_id}")
             return None
         
         # Update sender
-        supabase.table('student_credits').update({
-            'total_credits': sender_credits['total_credits'] - amount,
-            'credits_sent_this_month': sender_credits['credits_sent_this_month'] + amount
-        }).eq('id', sender_credits['id']).execute()
+        _execute(supabase.table('student_credits').update({
+            'total_credits': sender_credits.total_credits - amount,
+            'credits_sent_this_month': sender_credits.credits_sent_this_month + amount
+        }).eq('id', sender_credits.id))
         
         # Update receiver credits
-        receiver_credits = get_student_credits(receiver_id, month_year)
+        receiver_credits = get_student_credits.uncached(receiver_id, month_year, CreditBalance)
         if receiver_credits:
-            supabase.table('student_credits').update({
-                'total_credits': receiver_credits['total_credits'] + amount,
-                'credits_received': receiver_credits['credits_received'] + amount
-            }).eq('id', receiver_credits['id']).execute()
+            _execute(supabase.table('student_credits').update({
+                'total_credits': receiver_credits.total_credits + amount,
+                'credits_received': receiver_credits.credits_received + amount
+            }).eq('id', receiver_credits.id))
         else:
             # Create new credit record for receiver
-            supabase.table('student_credits').insert({
+            _execute(supabase.table('student_credits').insert({
                 'student_id': receiver_id,
                 'total_credits': 100 + amount,
                 'credits_received': amount,
                 'credits_sent_this_month': 0,
                 'monthly_limit': 100,
                 'month_year': month_year
-            }).execute()
+            }))
         
-        # Create notifications with proper names
-        create_notification(sender_id, 'credits_sent', 
-                          'Credits Sent', 
-                          f'You sent {amount} credits to {receiver_name}',
-                          message, receiver_id, transaction['id'])
+        # Notifications are stored as template parameters and rendered on read
+        create_notification(sender_id, 'credits_sent', amount, receiver_id, transaction['id'], message)
+        create_notification(receiver_id, 'credits_received', amount, sender_id, transaction['id'], message)
         
-        create_notification(receiver_id, 'credits_received',
-                          'Credits Received',
-                          f'You received {amount} credits from {sender_name}',
-                          message, sender_id, transaction['id'])
+        for listener in _transfer_listeners:
+            try:
+                listener(transaction)
+            except Exception as e:
+                print(f"Error in transfer listener: {e}")
         
         return transaction
     except Exception as e:
@@ -170,22 +509,136 @@ def send_credits(sender_id: str, receiver_id: str, amount: int, message: Optiona
         import traceback
         traceback.print_exc()
         return None
+    finally:
+        # Also after a partial failure: balances may have changed either way
+        invalidate_students(sender_id, receiver_id)
 
 
-def get_credit_transactions(student_id: str, as_sender: bool = True) -> List[Dict]:
-    """Get credit transactions for a student"""
+@_admission_controlled
+def send_credits_multi(sender_id: str, recipients: Dict[str, int],
+                       message: Optional[str] = None) -> Optional[List[Dict]]:
+    """Send credits to several students at once, all or nothing
+    
+    recipients maps receiver id to amount. The total is checked once against
+    the sender's monthly limit and balance, and every ledger row, balance
+    change and notification is written by one database call (migration 009),
+    so recognizing a team costs the same round trip as recognizing one
+    student. Returns the transactions in recipient order.
+    """
+    supabase = get_client()
+    if not supabase:
+        print("Error: Supabase client not available")
+        return None
+    
+    try:
+        response = _execute(supabase.rpc('send_credits_multi', {
+            'p_sender_id': sender_id,
+            'p_receiver_ids': list(recipients),
+            'p_amounts': list(recipients.values()),
+            'p_message': message,
+            'p_coalesce_seconds': NOTIFICATION_COALESCE_SECONDS
+        }))
+        transactions = response.data or []
+    except Exception as e:
+        print(f"Error sending credits to {len(recipients)} students: {e}")
+        return None
+    
+    invalidate_students(sender_id, *recipients)
+    for transaction in transactions:
+        for listener in _transfer_listeners:
+            try:
+                listener(transaction)
+            except Exception as e:
+                print(f"Error in transfer listener: {e}")
+    return transactions
+
+
+@_cached('student_id')
+@_serve_stale
+def get_credit_transactions(student_id: str, as_sender: bool = True,
+                            row_type: Type[R] = CreditTransaction) -> List[R]:
+    """Get credit transactions for a student, selecting only the fields of row_type"""
+    supabase = get_client()
     if not supabase:
         return []
     
     try:
         table = supabase.table('credit_transactions')
-        if as_sender:
-            response = table.select('*').eq('sender_id', student_id).order('created_at', desc=True).execute()
-        else:
-            response = table.select('*').eq('receiver_id', student_id).order('created_at', desc=True).execute()
-        return response.data if response.data else []
+        column = 'sender_id' if as_sender else 'receiver_id'
+        response = _execute(table.select(columns(row_type)).eq(column, student_id).order('created_at', desc=True))
+        return to_rows(row_type, response.data)
+    except Exception as e:
+        print(f"Error fetching transactions: {e}")
+        return []
+
+
+@_cached('student_id')
+@_serve_stale
+def get_credit_transactions_page(student_id: str, as_sender: bool, offset: int, limit: int,
+                                 row_type: Type[R] = CreditTransaction) -> Tuple[List[R], int]:
+    """One page of a student's credit transactions, newest first, and the total count
+
+    The page is cut by the database (not capped by PostgREST max-rows), so
+    only the requested rows are fetched and cached.
+    """
+    supabase = get_client()
+    if not supabase:
+        return [], 0
+    
+    try:
+        column = 'sender_id' if as_sender else 'receiver_id'
+        response = _execute(supabase.table('credit_transactions')
+            .select(columns(row_type), count='exact')
+            .eq(column, student_id)
+            .order('created_at', desc=True)
+            .order('id', desc=True)
+            .range(offset, offset + limit - 1))
+        return to_rows(row_type, response.data), response.count or 0
     except Exception as e:
         print(f"Error fetching transactions: {e}")
+        return [], 0
+
+
+@_cached('student_id')
+@_serve_stale
+def count_credit_transactions(student_id: str, as_sender: bool = True) -> int:
+    """Get count of credit transactions sent or received by a student"""
+    supabase = get_client()
+    if not supabase:
+        return 0
+    
+    try:
+        column = 'sender_id' if as_sender else 'receiver_id'
+        response = _execute(supabase.table('credit_transactions')
+            .select('id', count='exact')
+            .eq(column, student_id)
+            .limit(1))
+        return response.count if hasattr(response, 'count') else 0
+    except Exception as e:
+        print(f"Error counting transactions: {e}")
+        return 0
+
+
+@_cached('student_id')
+@_serve_stale
+def search_messages(student_id: str, query: str, limit: int = 20) -> List[MessageMatch]:
+    """Search the messages of a student's sent and received transfers, best match first
+    
+    Served by the full-text index of migration 012 (FTS5 on the local backend).
+    """
+    supabase = get_client()
+    if not supabase or not query.strip():
+        return []
+    
+    try:
+        response = _execute(supabase.rpc('search_messages', {
+            'p_student_id': student_id,
+            'p_query': query,
+            'p_limit': limit
+        }))
+        return to_rows(MessageMatch, response.data)
+    except Exception as e:
+        print(f"Error searching messages: {e}")
         return []
 
 
@@ -193,58 +646,156 @@ def get_credit_transactions(student_id: str, as_sender: bool = True) -> List[Dic
 # NOTIFICATIONS
 # =====================================================
 
-def create_notification(student_id: str, notification_type: str, title: str, 
-                       message: str, details: Optional[str] = None,
-                       related_student_id: Optional[str] = None,
-                       related_transaction_id: Optional[str] = None) -> Optional[Dict]:
-    """Create a notification for a student"""
+# Merge a notification into the recipient's newest unread one of the same type
+# when that is this recent (migration 007); 0 writes every notification as its own row
+NOTIFICATION_COALESCE_SECONDS = int(os.getenv("NOTIFICATION_COALESCE_SECONDS", "0"))
+
+
+def create_notification(student_id: str, notification_type: str, amount: Optional[int] = None,
+                        related_student_id: Optional[str] = None,
+                        related_transaction_id: Optional[str] = None,
+                        details: Optional[str] = None) -> Optional[Dict]:
+    """Create a notification for a student, coalescing bursts when enabled
+    
+    Only the template (notification_type) and its parameters are stored;
+    notification_templates renders the title and message on read.
+    """
+    supabase = get_client()
     if not supabase:
         return None
     
+    if NOTIFICATION_COALESCE_SECONDS > 0:
+        try:
+            response = _execute(supabase.rpc('record_notification', {
+                'p_student_id': student_id,
+                'p_notification_type': notification_type,
+                'p_title': None,
+                'p_message': None,
+                'p_details': details,
+                'p_related_student_id': related_student_id,
+                'p_related_transaction_id': related_transaction_id,
+                'p_amount': amount,
+                'p_window_seconds': NOTIFICATION_COALESCE_SECONDS
+            }))
+            invalidate_students(student_id)
+            return response.data[0] if response.data else None
+        except Exception as e:
+            # Never lose a notification: fall back to a plain insert
+            print(f"Error coalescing notification, inserting it instead: {e}")
+    
     try:
         notification_data = {
             'student_id': student_id,
             'notification_type': notification_type,
-            'title': title,
-            'message': message,
             'details': details,
             'related_student_id': related_student_id,
             'related_transaction_id': related_transaction_id,
+            'amount': amount,
+            'related_student_ids': [related_student_id] if related_student_id else [],
+            'related_transaction_ids': [related_transaction_id] if related_transaction_id else [],
             'is_read': False
         }
         
-        response = supabase.table('notifications').insert(notification_data).execute()
+        response = _execute(supabase.table('notifications').insert(notification_data))
+        invalidate_students(student_id)
         return response.data[0] if response.data else None
     except Exception as e:
         print(f"Error creating notification: {e}")
         return None
 
 
-def get_notifications(student_id: str, limit: int = 50) -> List[Dict]:
-    """Get notifications for a student"""
+@_cached('student_id')
+@_serve_stale
+def get_notifications(student_id: str, limit: int = 50,
+                      row_type: Type[R] = Notification) -> List[R]:
+    """Get notifications for a student, selecting only the fields of row_type"""
+    supabase = get_client()
     if not supabase:
         return []
     
     try:
-        response = supabase.table('notifications')\
-            .select('*')\
-            .eq('student_id', student_id)\
-            .order('created_at', desc=True)\
-            .limit(limit)\
-            .execute()
-        return response.data if response.data else []
+        response = _execute(supabase.table('notifications')
+            .select(columns(row_type))
+            .eq('student_id', student_id)
+            .order('created_at', desc=True)
+            .limit(limit))
+        return to_rows(row_type, response.data)
     except Exception as e:
         print(f"Error fetching notifications: {e}")
         return []
 
 
+@_cached('student_id')
+@_serve_stale
+def count_unread_notifications(student_id: str) -> int:
+    """Get count of a student's unread notifications"""
+    supabase = get_client()
+    if not supabase:
+        return 0
+
+    try:
+        response = _execute(supabase.table('notifications')
+            .select('id', count='exact')
+            .eq('student_id', student_id)
+            .eq('is_read', False)
+            .limit(1))
+        return response.count if hasattr(response, 'count') else 0
+    except Exception as e:
+        print(f"Error counting unread notifications: {e}")
+        return 0
+
+
+@_serve_stale
+def get_notification_digests(student_id: str, limit: int = 12,
+                             row_type: Type[R] = NotificationDigest) -> List[R]:
+    """Get a student's monthly digests of compacted notifications, newest month first"""
+    supabase = get_client()
+    if not supabase:
+        return []
+
+    try:
+        response = _execute(supabase.table('notification_digests')
+            .select(columns(row_type))
+            .eq('student_id', student_id)
+            .order('month_year', desc=True)
+            .order('notification_type')
+            .limit(limit))
+        return to_rows(row_type, response.data)
+    except Exception as e:
+        print(f"Error fetching notification digests: {e}")
+        return []
+
+
+def compact_notifications(older_than: str, batch_size: int = 1000) -> int:
+    """Fold one batch of notifications created before older_than into monthly digests
+
+    Returns how many notifications were compacted (and deleted), or -1 on
+    error. A result below batch_size means none older than the cutoff remain.
+    """
+    supabase = get_client()
+    if not supabase:
+        return -1
+
+    try:
+        response = _execute(supabase.rpc('compact_notifications', {
+            'p_older_than': older_than,
+            'p_batch_size': batch_size
+        }))
+        return int(response.data or 0)
+    except Exception as e:
+        print(f"Error compacting notifications: {e}")
+        return -1
+
+
 def mark_notification_read(notification_id: str) -> bool:
     """Mark a notification as read"""
+    supabase = get_client()
     if not supabase:
         return False
     
     try:
-        supabase.table('notifications').update({'is_read': True}).eq('id', notification_id).execute()
+        response = _execute(supabase.table('notifications').update({'is_read': True}).eq('id', notification_id))
+        invalidate_students(*{row['student_id'] for row in response.data or []})
         return True
     except Exception as e:
         print(f"Error marking notification as read: {e}")
@@ -255,8 +806,10 @@ def mark_notification_read(notification_id: str) -> bool:
 # ENDORSEMENTS
 # =====================================================
 
+@_admission_controlled
 def create_endorsement(endorser_id: str, endorsee_id: str, recognition_id: Optional[str] = None) -> Optional[Dict]:
     """Create an endorsement"""
+    supabase = get_client()
     if not supabase:
         return None
     
@@ -267,121 +820,235 @@ def create_endorsement(endorser_id: str, endorsee_id: str, recognition_id: Optio
             'recognition_id': recognition_id
         }
         
-        response = supabase.table('endorsements').insert(endorsement_data).execute()
+        response = _execute(supabase.table('endorsements').insert(endorsement_data))
+        invalidate_students(endorser_id, endorsee_id)
         return response.data[0] if response.data else None
     except Exception as e:
         print(f"Error creating endorsement: {e}")
         return None
 
 
+@_cached('endorser_id')
+@_serve_stale
 def check_endorsement_exists(endorser_id: str, endorsee_id: str) -> bool:
     """Check if an endorsement already exists"""
+    supabase = get_client()
     if not supabase:
         return False
     
     try:
-        response = supabase.table('endorsements')\
-            .select('id')\
-            .eq('endorser_id', endorser_id)\
-            .eq('endorsee_id', endorsee_id)\
-            .execute()
+        response = _execute(supabase.table('endorsements')
+            .select('id')
+            .eq('endorser_id', endorser_id)
+            .eq('endorsee_id', endorsee_id))
         return len(response.data) > 0 if response.data else False
     except Exception as e:
         print(f"Error checking endorsement: {e}")
         return False
 
 
+@_cached('endorser_id')
+@_serve_stale
+def get_endorsed_students(endorser_id: str) -> FrozenSet[str]:
+    """IDs of every student endorsed by endorser_id, in one query (membership checks are O(1))"""
+    supabase = get_client()
+    if not supabase:
+        return frozenset()
+    
+    try:
+        response = _execute(supabase.table('endorsements')
+            .select('endorsee_id')
+            .eq('endorser_id', endorser_id))
+        return frozenset(str(row['endorsee_id']) for row in response.data or [])
+    except Exception as e:
+        print(f"Error loading endorsements: {e}")
+        return frozenset()
+
+
+@_cached('student_id')
+@_serve_stale
 def get_endorsements_received(student_id: str) -> int:
     """Get count of endorsements received by a student"""
+    supabase = get_client()
     if not supabase:
         return 0
     
     try:
-        response = supabase.table('endorsements')\
-            .select('id', count='exact')\
-            .eq('endorsee_id', student_id)\
-            .execute()
+        response = _execute(supabase.table('endorsements')
+            .select('id', count='exact')
+            .eq('endorsee_id', student_id))
         return response.count if hasattr(response, 'count') else 0
     except Exception as e:
         print(f"Error counting endorsements: {e}")
         return 0
 
 
+@_serve_stale
+def get_recognition_feed(viewer_id: str, limit: int = 20,
+                         before: Optional[Tuple[str, str]] = None) -> List[FeedEntry]:
+    """Get recent recognitions with endorsement counts and the viewer's endorsement flags
+    
+    Two round trips per page regardless of its size: one keyset-paged read of
+    transfers (newest first, older than the (created_at, id) cursor `before`)
+    and one grouped aggregate for all of their endorsements.
+    """
+    supabase = get_client()
+    if not supabase:
+        return []
+    
+    try:
+        query = supabase.table('credit_transactions')\
+            .select(columns(Recognition))\
+            .eq('transaction_type', 'transfer')
+        if before:
+            created_at, last_id = before
+            query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{last_id})')
+        response = _execute(query.order('created_at', desc=True).order('id', desc=True).limit(limit))
+        recognitions = to_rows(Recognition, response.data)
+        if not recognitions:
+            return []
+        
+        summary = _execute(supabase.rpc('recognition_endorsement_summary', {
+            'p_recognition_ids': [r.id for r in recognitions],
+            'p_viewer_id': viewer_id
+        }))
+        counts = {row['recognition_id']: row for row in summary.data or []}
+        return [
+            FeedEntry(*r,
+                      endorsements=int(counts.get(r.id, {}).get('endorsements', 0)),
+                      endorsed_by_me=bool(counts.get(r.id, {}).get('endorsed_by_me', False)))
+            for r in recognitions
+        ]
+    except Exception as e:
+        print(f"Error fetching recognition feed: {e}")
+        return []
+
+
 # =====================================================
 # VOUCHER PURCHASES
 # =====================================================
 
+@_admission_controlled
 def purchase_vouchers(student_id: str, num_vouchers: int, credits_per_voucher: int) -> Optional[Dict]:
-    """Purchase vouchers by redeeming credits"""
+    """Purchase vouchers by redeeming credits
+    
+    Validation, the purchase row, the credit deduction and claiming one
+    pre-minted code per voucher happen in a single atomic database call, so
+    buying 100 vouchers costs the same round trip as buying one. The returned
+    purchase includes its 'codes'.
+    """
+    supabase = get_client()
     if not supabase:
         return None
     
     try:
         VOUCHER_RATE = 5.00
-        total_credits = num_vouchers * credits_per_voucher
-        total_value = total_credits * VOUCHER_RATE
-        
-        # Get student credits
-        month_year = datetime.now().strftime('%Y-%m')
-        student_credits = get_student_credits(student_id, month_year)
-        
-        if not student_credits:
-            return None
-        
-        # Validate
-        if total_credits > student_credits['credits_received']:
-            return None  # Insufficient received credits
-        
-        # Create voucher purchase
-        voucher_data = {
-            'student_id': student_id,
-            'num_vouchers': num_vouchers,
-            'credits_per_voucher': credits_per_voucher,
-            'total_credits': total_credits,
-            'total_value': float(total_value),
-            'voucher_rate': VOUCHER_RATE
-        }
-        
-        response = supabase.table('voucher_purchases').insert(voucher_data).execute()
-        voucher = response.data[0] if response.data else None
-        
-        if voucher:
-            # Deduct credits
-            supabase.table('student_credits').update({
-                'total_credits': student_credits['total_credits'] - total_credits,
-                'credits_received': student_credits['credits_received'] - total_credits
-            }).eq('id', student_credits['id']).execute()
-        
-        return voucher
+        response = _execute(supabase.rpc('redeem_vouchers', {
+            'p_student_id': student_id,
+            'p_num_vouchers': num_vouchers,
+            'p_credits_per_voucher': credits_per_voucher,
+            'p_voucher_rate': VOUCHER_RATE
+        }))
+        invalidate_students(student_id)
+        return response.data if response.data else None
     except Exception as e:
         print(f"Error purchasing vouchers: {e}")
         return None
 
 
-def get_voucher_purchases(student_id: str, limit: int = 10) -> List[Dict]:
-    """Get voucher purchase history for a student"""
+@_serve_stale
+def get_voucher_codes(voucher_purchase_id: str) -> List[str]:
+    """Get the codes issued for a voucher purchase"""
+    supabase = get_client()
     if not supabase:
         return []
     
     try:
-        response = supabase.table('voucher_purchases')\
-            .select('*')\
-            .eq('student_id', student_id)\
-            .order('created_at', desc=True)\
-            .limit(limit)\
-            .execute()
-        return response.data if response.data else []
+        response = _execute(supabase.table('voucher_codes')
+            .select('code')
+            .eq('voucher_purchase_id', voucher_purchase_id)
+            .order('id'))
+        return [row['code'] for row in response.data] if response.data else []
+    except Exception as e:
+        print(f"Error fetching voucher codes: {e}")
+        return []
+
+
+def get_voucher_pool_stats() -> Dict[str, int]:
+    """Get voucher code pool depth and recent claim/mint counts"""
+    supabase = get_client()
+    if not supabase:
+        return {}
+    
+    try:
+        response = _execute(supabase.rpc('voucher_pool_stats', {}))
+        return response.data if response.data else {}
+    except Exception as e:
+        print(f"Error fetching voucher pool stats: {e}")
+        return {}
+
+
+def mint_voucher_codes(count: int) -> int:
+    """Add a batch of count unique codes to the voucher pool, returning how many were minted"""
+    supabase = get_client()
+    if not supabase:
+        return 0
+    
+    try:
+        response = _execute(supabase.rpc('mint_voucher_codes', {'p_count': count}))
+        return int(response.data or 0)
+    except Exception as e:
+        print(f"Error minting voucher codes: {e}")
+        return 0
+
+
+@_cached('student_id')
+@_serve_stale
+def get_voucher_purchases(student_id: str, limit: int = 10,
+                          row_type: Type[R] = VoucherPurchase) -> List[R]:
+    """Get voucher purchase history for a student, selecting only the fields of row_type"""
+    supabase = get_client()
+    if not supabase:
+        return []
+    
+    try:
+        response = _execute(supabase.table('voucher_purchases')
+            .select(columns(row_type))
+            .eq('student_id', student_id)
+            .order('created_at', desc=True)
+            .limit(limit))
+        return to_rows(row_type, response.data)
     except Exception as e:
         print(f"Error fetching voucher purchases: {e}")
         return []
 
 
+@_cached('student_id')
+@_serve_stale
+def get_redemption_totals(student_id: str) -> RedemptionTotals:
+    """Get a student's lifetime redemption totals (one primary-key read, whatever the purchase count)"""
+    empty = RedemptionTotals(student_id, 0, 0.0, 0, 0, None)
+    supabase = get_client()
+    if not supabase:
+        return empty
+    
+    try:
+        response = _execute(supabase.table('student_redemption_totals')
+            .select(columns(RedemptionTotals))
+            .eq('student_id', student_id))
+        return to_row(RedemptionTotals, response.data[0]) if response.data else empty
+    except Exception as e:
+        print(f"Error fetching redemption totals: {e}")
+        return empty
+
+
 # =====================================================
 # REAL-TIME SUBSCRIPTIONS
 # =====================================================
 
 def subscribe_to_notifications(student_id: str, callback):
     """Subscribe to real-time notifications for a student"""
+    supabase = get_client()
     if not supabase:
         return None
     
@@ -402,6 +1069,7 @@ def subscribe_to_notifications(student_id: str, callback):
 
 def subscribe_to_credits(student_id: str, callback):
     """Subscribe to real-time credit balance changes"""
+    supabase = get_client()
     if not supabase:
         return None
     
@@ -420,31 +1088,141 @@ def subscribe_to_credits(student_id: str, callback):
         return None
 
 
+# =====================================================
+# ANALYTICS
+# =====================================================
+
+@_serve_stale
+def get_monthly_rollups(since_month: Optional[str] = None, page_size: int = 1000,
+                        row_type: Type[R] = MonthlyRollup) -> List[R]:
+    """Get per-student monthly rollups from since_month ('YYYY-MM') onwards"""
+    supabase = get_client()
+    if not supabase:
+        return []
+    
+    rows: List[R] = []
+    try:
+        while True:
+            query = supabase.table('student_monthly_rollups').select(columns(row_type))
+            if since_month:
+                query = query.gte('month_year', since_month)
+            response = _execute(query.order('month_year').order('student_id')
+                .range(len(rows), len(rows) + page_size - 1))
+            page = to_rows(row_type, response.data)
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+    except Exception as e:
+        print(f"Error fetching monthly rollups: {e}")
+        return []
+
+
+@_serve_stale
+def get_weekly_received(week_start: str, page_size: int = 1000,
+                        row_type: Type[R] = ReceivedCredits) -> List[R]:
+    """Get credits received per student in the ISO week starting week_start ('YYYY-MM-DD')"""
+    supabase = get_client()
+    if not supabase:
+        return []
+    
+    rows: List[R] = []
+    try:
+        while True:
+            response = _execute(supabase.table('weekly_received_credits').select(columns(row_type))
+                .eq('week_start', week_start).order('student_id')
+                .range(len(rows), len(rows) + page_size - 1))
+            page = to_rows(row_type, response.data)
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+    except Exception as e:
+        print(f"Error fetching weekly received credits: {e}")
+        return []
+
+
+# =====================================================
+# BULK READS
+# =====================================================
+
+def iter_table_pages(table: str, row_type: Type[R], page_size: int = 1000,
+                     created_from: Optional[str] = None, created_before: Optional[str] = None,
+                     **filters: str) -> Iterator[List[R]]:
+    """Stream a table in (created_at, id) order as pages of up to page_size rows
+    
+    Keyset pagination, so every page costs the same however deep the stream
+    is. row_type must include the created_at and id fields; keyword filters
+    are applied as column = value and created_from / created_before bound
+    created_at to a half-open range. Unlike the other helpers, errors are
+    raised so a partial stream is never mistaken for a complete one.
+    """
+    supabase = get_client()
+    if not supabase:
+        return
+    
+    last_created_at, last_id = None, None
+    while True:
+        query = supabase.table(table).select(columns(row_type))
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        if created_before is not None:
+            query = query.lt('created_at', created_before)
+        if last_created_at is not None:
+            # The redundant lower bound lets the planner seek instead of
+            # re-scanning the range from its start on every page
+            query = query.gte('created_at', last_created_at).or_(
+                f'created_at.gt."{last_created_at}",'
+                f'and(created_at.eq."{last_created_at}",id.gt.{last_id})'
+            )
+        elif created_from is not None:
+            query = query.gte('created_at', created_from)
+        response = _execute(query.order('created_at').order('id').limit(page_size))
+        rows = to_rows(row_type, response.data)
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last_created_at, last_id = rows[-1].created_at, rows[-1].id
+
+
+def iter_table_rows(table: str, row_type: Type[R], page_size: int = 1000,
+                    created_from: Optional[str] = None, created_before: Optional[str] = None,
+                    **filters: str) -> Iterator[R]:
+    """Stream every row of a table in (created_at, id) order, one page in memory at a time
+    
+    See iter_table_pages for the filters and error handling.
+    """
+    for page in iter_table_pages(table, row_type, page_size, created_from, created_before, **filters):
+        yield from page
+
+
 # =====================================================
 # UTILITY FUNCTIONS
 # =====================================================
 
+@_cached('student_id')
+@_serve_stale
 def get_student_stats(student_id: str) -> Dict:
     """Get comprehensive stats for a student"""
+    supabase = get_client()
     if not supabase:
         return {}
     
     try:
         month_year = datetime.now().strftime('%Y-%m')
-        credits = get_student_credits(student_id, month_year)
+        credits = get_student_credits(student_id, month_year, CreditBalance)
         
         # Get transaction counts
-        sent_count = len(get_credit_transactions(student_id, as_sender=True))
-        received_count = len(get_credit_transactions(student_id, as_sender=False))
+        sent_count = count_credit_transactions(student_id, as_sender=True)
+        received_count = count_credit_transactions(student_id, as_sender=False)
         
         # Get endorsements
         endorsements_received = get_endorsements_received(student_id)
         
         return {
-            'total_credits': credits['total_credits'] if credits else 100,
-            'credits_received': credits['credits_received'] if credits else 0,
-            'credits_sent_this_month': credits['credits_sent_this_month'] if credits else 0,
-            'monthly_limit': credits['monthly_limit'] if credits else 100,
+            'total_credits': credits.total_credits if credits else 100,
+            'credits_received': credits.credits_received if credits else 0,
+            'credits_sent_this_month': credits.credits_sent_this_month if credits else 0,
+            'monthly_limit': credits.monthly_limit if credits else 100,
             'endorsements_received': endorsements_received,
             'transactions_sent': sent_count,
             'transactions_received': received_count
@@ -456,5 +1234,5 @@ def get_student_stats(student_id: str) -> Dict:
 
 def is_connected() -> bool:
     """Check if database connection is available"""
-    return supabase is not None
+    return get_client() is not None
 
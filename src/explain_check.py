@@ -0,0 +1,333 @@
+"""
+Query-plan regression check for Boostly
+Builds the schema (database_schema.sql plus every migration) in a scratch
+schema of a local Postgres, seeds it with synthetic data, runs the SQL
+equivalent of each selective db_helper query under EXPLAIN and fails when a
+plan falls back to a sequential scan, or sorts rows an index should return
+in order. Everything runs in one transaction that is rolled back, so the
+database is left as it was.
+
+Needs psycopg (or psycopg2) and a Postgres you can create schemas in. Do not
+point it at production: seeding takes a while and holds locks.
+
+Usage:
+    python explain_check.py --dsn postgresql://postgres@localhost/postgres
+    BOOSTLY_EXPLAIN_DSN=... python explain_check.py --students 5000 --verbose
+    python explain_check.py --dsn ... --through 004   # plans before migration 005
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCHEMA = "boostly_explain"
+
+# Supabase provides auth.uid() for the RLS policies; plain Postgres needs a stand-in
+AUTH_STUB = """
+CREATE SCHEMA IF NOT EXISTS auth;
+DO $$
+BEGIN
+    IF to_regprocedure('auth.uid()') IS NULL THEN
+        CREATE FUNCTION auth.uid() RETURNS UUID AS 'SELECT NULL::UUID' LANGUAGE sql STABLE;
+    END IF;
+END $$;
+"""
+
+# Synthetic data sized by %(students)s; triggers are disabled while seeding so the
+# rollups don't dominate the run (their tables are not checked here)
+SEED = """
+INSERT INTO students (id, name, roll_number)
+SELECT MD5('student' || i)::UUID, 'Student ' || i, '2K22/EX/' || i
+FROM generate_series(1, %(students)s) i;
+
+INSERT INTO student_credits (student_id, month_year, credits_received)
+SELECT s.id, TO_CHAR(NOW() - (m || ' months')::INTERVAL, 'YYYY-MM'), 10
+FROM students s, generate_series(0, 5) m
+ON CONFLICT (student_id, month_year) DO NOTHING;
+
+CREATE TEMP TABLE seed_ids ON COMMIT DROP AS
+SELECT ROW_NUMBER() OVER (ORDER BY id) AS n, id FROM students;
+
+INSERT INTO credit_transactions (sender_id, receiver_id, amount, message, created_at)
+SELECT a.id, b.id, 1 + i %% 10,
+       (ARRAY['Thanks!', 'Thanks for the hackathon demo', 'Great lab notes', 'Thanks for debugging my project',
+              'Mentoring before the exam'])[1 + i %% 5],
+       NOW() - (i || ' minutes')::INTERVAL
+FROM generate_series(1, %(students)s * %(per_student)s) i
+JOIN seed_ids a ON a.n = 1 + i %% %(students)s
+JOIN seed_ids b ON b.n = 1 + (i * 7 + 1 + i / %(students)s) %% %(students)s
+WHERE a.id <> b.id;
+
+INSERT INTO notifications (student_id, notification_type, title, message, is_read,
+                           related_student_id, related_transaction_id, created_at)
+SELECT CASE WHEN k = 0 THEN sender_id ELSE receiver_id END,
+       CASE WHEN k = 0 THEN 'credits_sent' ELSE 'credits_received' END,
+       'Credits', 'You have a new transfer', created_at < NOW() - INTERVAL '2 days',
+       CASE WHEN k = 0 THEN receiver_id ELSE sender_id END, id, created_at
+FROM credit_transactions, generate_series(0, 1) k;
+
+INSERT INTO endorsements (endorser_id, endorsee_id, recognition_id, created_at)
+SELECT sender_id, receiver_id, id, created_at
+FROM credit_transactions
+WHERE amount %% 3 = 0;
+
+INSERT INTO voucher_purchases (student_id, num_vouchers, credits_per_voucher, total_credits, total_value, created_at)
+SELECT s.id, 1, 10, 10, 50.00, NOW() - (v || ' days')::INTERVAL
+FROM students s, generate_series(1, 30) v;
+"""
+
+SEEDED_TABLES = ("students", "student_credits", "credit_transactions", "notifications",
+                 "endorsements", "voucher_purchases", "student_redemption_totals")
+
+
+class PlanCheck(NamedTuple):
+    """The SQL a db_helper function sends, and what its plan must avoid"""
+    function: str
+    sql: str
+    ordered: bool = False  # a LIMIT query that must read rows in index order and stop, not sort every match
+
+
+# Parameters: %(student)s is a busy student, %(other)s someone they endorsed,
+# %(cursor_at)s / %(cursor_id)s the keyset cursor of the second feed page
+CHECKS: List[PlanCheck] = [
+    PlanCheck("get_student_by_roll",
+              "SELECT id, name, roll_number FROM students WHERE roll_number = %(roll)s"),
+    PlanCheck("get_students_changed_since",
+              "SELECT id, name, roll_number, updated_at FROM students WHERE updated_at > NOW() "
+              "ORDER BY updated_at, id LIMIT 1000",
+              ordered=True),
+    PlanCheck("get_student_credits",
+              "SELECT * FROM student_credits WHERE student_id = %(student)s AND month_year = TO_CHAR(NOW(), 'YYYY-MM')"),
+    PlanCheck("get_credit_transactions (sent)",
+              "SELECT * FROM credit_transactions WHERE sender_id = %(student)s ORDER BY created_at DESC"),
+    PlanCheck("get_credit_transactions (received)",
+              "SELECT * FROM credit_transactions WHERE receiver_id = %(student)s ORDER BY created_at DESC"),
+    PlanCheck("count_credit_transactions",
+              "SELECT COUNT(*) FROM credit_transactions WHERE receiver_id = %(student)s"),
+    PlanCheck("search_messages",
+              "SELECT t.id, t.sender_id, t.receiver_id, t.amount, t.message, t.created_at, "
+              "ts_rank(to_tsvector('english', COALESCE(t.message, '')), q) AS rank "
+              "FROM credit_transactions t, websearch_to_tsquery('english', 'who thanked me for the hackathon') q "
+              "WHERE to_tsvector('english', COALESCE(t.message, '')) @@ q "
+              "AND (t.sender_id = %(student)s OR t.receiver_id = %(student)s) AND t.transaction_type = 'transfer' "
+              "ORDER BY rank DESC, t.created_at DESC LIMIT 20"),  # the RPC's body; ranking sorts the student's matches
+    PlanCheck("get_notifications",
+              "SELECT * FROM notifications WHERE student_id = %(student)s ORDER BY created_at DESC LIMIT 50",
+              ordered=True),
+    PlanCheck("count_unread_notifications",
+              "SELECT COUNT(*) FROM notifications WHERE student_id = %(student)s AND is_read = FALSE"),
+    PlanCheck("record_notification (coalescing lookup)",
+              "SELECT * FROM notifications WHERE student_id = %(student)s AND notification_type = 'credits_received' "
+              "AND is_read = FALSE AND created_at > NOW() - INTERVAL '5 minutes' ORDER BY created_at DESC LIMIT 1",
+              ordered=True),
+    PlanCheck("mark_notification_read",
+              "UPDATE notifications SET is_read = TRUE WHERE id = %(notification)s"),
+    PlanCheck("check_endorsement_exists",
+              "SELECT id FROM endorsements WHERE endorser_id = %(student)s AND endorsee_id = %(other)s"),
+    PlanCheck("get_endorsed_students",
+              "SELECT endorsee_id FROM endorsements WHERE endorser_id = %(student)s"),
+    PlanCheck("get_endorsements_received",
+              "SELECT COUNT(*) FROM endorsements WHERE endorsee_id = %(student)s"),
+    PlanCheck("get_recognition_feed",
+              "SELECT id, sender_id, receiver_id, amount, message, created_at FROM credit_transactions "
+              "WHERE transaction_type = 'transfer' ORDER BY created_at DESC, id DESC LIMIT 20",
+              ordered=True),
+    PlanCheck("get_recognition_feed (next page)",
+              "SELECT id, sender_id, receiver_id, amount, message, created_at FROM credit_transactions "
+              "WHERE transaction_type = 'transfer' AND (created_at < %(cursor_at)s "
+              "OR (created_at = %(cursor_at)s AND id < %(cursor_id)s)) "
+              "ORDER BY created_at DESC, id DESC LIMIT 20",
+              ordered=True),
+    PlanCheck("recognition_endorsement_summary",
+              "SELECT recognition_id, COUNT(*), BOOL_OR(endorser_id = %(student)s) FROM endorsements "
+              "WHERE recognition_id = ANY(ARRAY(SELECT id FROM credit_transactions ORDER BY created_at DESC LIMIT 20)) "
+              "GROUP BY recognition_id"),  # the RPC's body: plans inside SQL functions are not shown
+    PlanCheck("get_voucher_purchases",
+              "SELECT * FROM voucher_purchases WHERE student_id = %(student)s ORDER BY created_at DESC LIMIT 10",
+              ordered=True),
+    PlanCheck("get_redemption_totals",
+              "SELECT student_id, credits_redeemed, value_redeemed, vouchers_purchased, purchases, last_purchase_at "
+              "FROM student_redemption_totals WHERE student_id = %(student)s"),
+    PlanCheck("get_weekly_received",
+              "SELECT student_id, credits_received FROM weekly_received_credits "
+              "WHERE week_start = DATE_TRUNC('week', NOW())::DATE ORDER BY student_id LIMIT 1000"),
+    PlanCheck("compact_notifications (batch)",
+              "SELECT id FROM notifications WHERE created_at < NOW() - INTERVAL '30 days' "
+              "ORDER BY created_at LIMIT 1000 FOR UPDATE SKIP LOCKED",
+              ordered=True),
+    PlanCheck("get_notification_digests",
+              "SELECT * FROM notification_digests WHERE student_id = %(student)s "
+              "ORDER BY month_year DESC LIMIT 12"),
+    PlanCheck("iter_table_rows (student export)",
+              "SELECT * FROM credit_transactions WHERE sender_id = %(student)s "
+              "ORDER BY created_at, id LIMIT 1000",
+              ordered=True),
+    PlanCheck("iter_table_pages (ledger audit month)",
+              "SELECT id, sender_id, receiver_id, amount, created_at FROM credit_transactions "
+              "WHERE transaction_type = 'transfer' AND created_at < NOW() "
+              "AND created_at >= NOW() - INTERVAL '30 days' AND (created_at > NOW() - INTERVAL '30 days' "
+              "OR (created_at = NOW() - INTERVAL '30 days' AND id > %(cursor_id)s)) "
+              "ORDER BY created_at, id LIMIT 1000",
+              ordered=True),  # pages are 20000 rows in production, scaled down with the seeded month
+]
+
+
+# =====================================================
+# DATABASE
+# =====================================================
+
+def connect(dsn: str):
+    """Connect with psycopg 3, falling back to psycopg2 (both bind parameters client-side here)"""
+    try:
+        import psycopg
+        conn = psycopg.connect(dsn, cursor_factory=psycopg.ClientCursor)
+    except ImportError:
+        import psycopg2
+        conn = psycopg2.connect(dsn)
+    conn.autocommit = False
+    return conn
+
+
+def schema_files(through: str = "") -> List[str]:
+    """database_schema.sql then the migrations in order, optionally stopping after one"""
+    files = [os.path.join(HERE, "database_schema.sql")]
+    for path in sorted(glob.glob(os.path.join(HERE, "migrations", "*.sql"))):
+        if through and os.path.basename(path)[:len(through)] > through:
+            break
+        files.append(path)
+    return files
+
+
+def build(cursor, students: int, per_student: int, through: str = ""):
+    """Create the schema in a scratch namespace and seed it"""
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    cursor.execute(f"SET LOCAL search_path TO {SCHEMA}, public, extensions")
+    cursor.execute(AUTH_STUB)
+    for path in schema_files(through):
+        with open(path) as f:
+            cursor.execute(f.read())
+        print(f"📄 Applied {os.path.relpath(path, HERE)}")
+
+    start = time.perf_counter()
+    for table in ("credit_transactions", "endorsements", "voucher_purchases"):
+        cursor.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+    cursor.execute(SEED, {"students": students, "per_student": per_student})
+    for table in ("credit_transactions", "endorsements", "voucher_purchases"):
+        cursor.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+    cursor.execute("SELECT to_regproc('refresh_redemption_totals') IS NOT NULL")
+    if cursor.fetchone()[0]:  # migration 010: totals of the purchases seeded without triggers
+        cursor.execute("SELECT refresh_redemption_totals()")
+    for table in SEEDED_TABLES:
+        cursor.execute(f"SELECT to_regclass('{table}') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            cursor.execute(f"ANALYZE {table}")
+    print(f"🌱 Seeded {students} students, ~{students * per_student} transfers "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+def sample_parameters(cursor) -> Dict[str, object]:
+    """Pick a busy student, one they endorsed, a notification and a feed cursor"""
+    cursor.execute("""
+        SELECT e.endorser_id, e.endorsee_id, s.roll_number
+        FROM endorsements e JOIN students s ON s.id = e.endorser_id
+        ORDER BY e.created_at DESC LIMIT 1
+    """)
+    student, other, roll = cursor.fetchone()
+    cursor.execute("SELECT id FROM notifications WHERE student_id = %s LIMIT 1", (student,))
+    notification = cursor.fetchone()[0]
+    cursor.execute("SELECT created_at, id FROM credit_transactions ORDER BY created_at DESC, id DESC OFFSET 20 LIMIT 1")
+    cursor_at, cursor_id = cursor.fetchone()
+    return {"student": student, "other": other, "roll": roll, "notification": notification,
+            "cursor_at": cursor_at, "cursor_id": cursor_id}
+
+
+# =====================================================
+# PLANS
+# =====================================================
+
+def plan_nodes(node: Dict) -> Iterator[Dict]:
+    """Every node of an EXPLAIN (FORMAT JSON) plan tree, depth first"""
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def describe(node: Dict) -> str:
+    relation = node.get("Relation Name")
+    index = node.get("Index Name")
+    return node["Node Type"] + (f" on {relation}" if relation else "") + (f" using {index}" if index else "")
+
+
+def problems(plan: Dict, check: PlanCheck) -> List[str]:
+    """Reasons a plan is a regression (empty when it is fine)"""
+    found = []
+    for node in plan_nodes(plan):
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in SEEDED_TABLES:
+            found.append(f"sequential scan on {node['Relation Name']}")
+        if check.ordered and node["Node Type"] in ("Sort", "Incremental Sort"):
+            found.append(f"{node['Node Type'].lower()} on {', '.join(node.get('Sort Key', []))}")
+    return found
+
+
+def explain(cursor, check: PlanCheck, params: Dict[str, object]) -> Tuple[Dict, float]:
+    """The plan of one check and its actual execution time in ms (writes are rolled back)"""
+    cursor.execute("SAVEPOINT explain_check")
+    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {check.sql}", params)
+    result = cursor.fetchone()[0]
+    cursor.execute("ROLLBACK TO SAVEPOINT explain_check")
+    result = result if isinstance(result, list) else json.loads(result)
+    return result[0]["Plan"], result[0]["Execution Time"]
+
+
+def run_checks(cursor, verbose: bool = False) -> int:
+    """Explain every check and print the results, returning the number of failures"""
+    params = sample_parameters(cursor)
+    failures = 0
+    for check in CHECKS:
+        plan, ms = explain(cursor, check, params)
+        found = problems(plan, check)
+        access = ", ".join(describe(n) for n in plan_nodes(plan) if "Scan" in n["Node Type"])
+        if found:
+            failures += 1
+            print(f"❌ {check.function}: {'; '.join(found)} ({ms:.2f} ms)")
+        else:
+            print(f"✅ {check.function}: {access} ({ms:.2f} ms)")
+        if verbose or found:
+            for node in plan_nodes(plan):
+                print(f"      {describe(node)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when a db_helper query plan regresses to a sequential scan")
+    parser.add_argument("--dsn", default=os.getenv("BOOSTLY_EXPLAIN_DSN"),
+                        help="Postgres connection string (default: $BOOSTLY_EXPLAIN_DSN)")
+    parser.add_argument("--students", type=int, default=2000, help="Synthetic students to seed")
+    parser.add_argument("--per-student", type=int, default=50, help="Transfers sent per student")
+    parser.add_argument("--through", default="", help="Apply migrations only up to this number (e.g. 004)")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error("pass --dsn or set BOOSTLY_EXPLAIN_DSN")
+
+    conn = connect(args.dsn)
+    try:
+        cursor = conn.cursor()
+        build(cursor, args.students, args.per_student, args.through)
+        failures = run_checks(cursor, args.verbose)
+    finally:
+        conn.rollback()
+        conn.close()
+
+    print(f"\n{len(CHECKS) - failures}/{len(CHECKS)} plans OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Streaming export of Boostly history
+Pages through credit_transactions, endorsements and voucher_purchases with
+keyset pagination and writes CSV, Parquet or Arrow files incrementally, so
+memory stays flat regardless of table size.
+
+Usage:
+    python export_history.py --out exports                          # whole institution, CSV
+    python export_history.py --out exports --roll 2K22/EC/63 --format parquet
+    python export_history.py --out /tmp/bench --synthetic 1000000   # memory benchmark on a generated local database
+"""
+
+import argparse
+import csv
+import heapq
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Type
+
+from models import CreditTransaction, Endorsement, VoucherPurchase
+
+
+class ExportSpec(NamedTuple):
+    """How to export one table"""
+    row_type: Type
+    student_columns: Tuple[str, ...]  # a student's rows match any of these columns
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    'credit_transactions': ExportSpec(CreditTransaction, ('sender_id', 'receiver_id')),
+    'endorsements': ExportSpec(Endorsement, ('endorser_id', 'endorsee_id')),
+    'voucher_purchases': ExportSpec(VoucherPurchase, ('student_id',)),
+}
+
+FORMATS = ('csv', 'parquet', 'arrow')
+BATCH_SIZE = 10000
+
+
+# =====================================================
+# SOURCES
+# =====================================================
+
+def stream_table(table: str, student_id: Optional[str] = None, page_size: int = 1000) -> Iterator[tuple]:
+    """Stream a table's rows in (created_at, id) order, optionally for one student
+
+    For a student, one keyset stream per student column is merged lazily, so
+    a transfer appears once per side the student is on.
+    """
+    from db_helper import iter_table_rows
+
+    spec = EXPORTS[table]
+    if not student_id:
+        return iter_table_rows(table, spec.row_type, page_size)
+
+    streams = [
+        iter_table_rows(table, spec.row_type, page_size, **{column: student_id})
+        for column in spec.student_columns
+    ]
+    return heapq.merge(*streams, key=lambda row: (row.created_at, row.id))
+
+
+def synthetic_rows(row_type: Type, count: int, students: List[str], seed: int = 42) -> Iterator[tuple]:
+    """Generate count plausible rows of row_type between students lazily (for benchmarks)"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for index in range(count):
+        amount = rng.randint(1, 50)
+        sender, receiver = rng.sample(students, 2)
+        values = {
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'sender_id': sender, 'receiver_id': receiver,
+            'endorser_id': sender, 'endorsee_id': receiver,
+            'student_id': sender, 'recognition_id': None,
+            'amount': amount, 'message': 'Thanks for the help', 'transaction_type': 'transfer',
+            'num_vouchers': 1, 'credits_per_voucher': amount, 'total_credits': amount,
+            'total_value': amount * 5.0, 'voucher_rate': 5.0,
+            'created_at': (start + timedelta(seconds=index)).isoformat() + '+00:00',
+        }
+        yield row_type._make([values[field] for field in row_type._fields])
+
+
+def build_synthetic(path: str, rows_per_table: int, students: int = 500) -> None:
+    """Write a local database with seeded students and rows_per_table rows in each exported table
+
+    Students come from local_backend.seed. History rows go in with plain
+    executemany while the triggers and secondary indexes are dropped;
+    reopening the database with LocalClient restores them, so the export
+    pages through the same indexes as a real one.
+    """
+    from local_backend import LocalClient, seed
+
+    client = LocalClient(path)
+    student_ids = [student['id'] for student in seed(client, students, voucher_codes=0, roll_prefix='SYN/')]
+    client.close()
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA synchronous = OFF")
+    for kind, name in conn.execute(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger') AND sql IS NOT NULL").fetchall():
+        conn.execute(f"DROP {kind.upper()} {name}")
+    conn.execute("BEGIN")
+    for table, spec in EXPORTS.items():
+        fields = spec.row_type._fields
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+            synthetic_rows(spec.row_type, rows_per_table, student_ids)
+        )
+    conn.execute("COMMIT")
+    conn.close()
+    LocalClient(path).close()
+
+
+def batched(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    """Group a row stream into lists of at most size rows"""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# =====================================================
+# SINKS
+# =====================================================
+
+def write_csv(rows: Iterable[tuple], row_type: Type, path: str) -> int:
+    """Write a row stream to CSV, returning the number of rows written"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(row_type._fields)
+        for batch in batched(rows, BATCH_SIZE):
+            writer.writerows(batch)
+            count += len(batch)
+    return count
+
+
+def arrow_schema(row_type: Type):
+    """Arrow schema for a row type, derived from its annotations"""
+    import pyarrow as pa
+
+    arrow_types = {str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_()}
+    fields = []
+    for name, annotation in row_type.__annotations__.items():
+        # Optional[X] is Union[X, None]
+        base = next((arg for arg in getattr(annotation, '__args__', (annotation,)) if arg is not type(None)), str)
+        fields.append(pa.field(name, arrow_types.get(base, pa.string())))
+    return pa.schema(fields)
+
+
+def write_arrow(rows: Iterable[tuple], row_type: Type, path: str, file_format: str) -> int:
+    """Write a row stream to Parquet or Arrow IPC one record batch at a time"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("pyarrow is required for Parquet/Arrow export: pip install pyarrow")
+
+    schema = arrow_schema(row_type)
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(path, schema)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+
+    count = 0
+    try:
+        for batch in batched(rows, BATCH_SIZE):
+            record_batch = pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(zip(*batch), schema)],
+                schema=schema
+            )
+            if file_format == 'parquet':
+                writer.write_batch(record_batch)
+            else:
+                writer.write(record_batch)
+            count += len(batch)
+    finally:
+        writer.close()
+    return count
+
+
+def write_rows(rows: Iterable[tuple], row_type: Type, path: str, file_format: str) -> int:
+    """Write a row stream in the requested format"""
+    if file_format == 'csv':
+        return write_csv(rows, row_type, path)
+    return write_arrow(rows, row_type, path, file_format)
+
+
+# =====================================================
+# EXPORT
+# =====================================================
+
+def export_history(out_dir: str, file_format: str = 'csv', student_id: Optional[str] = None,
+                   tables: Iterable[str] = tuple(EXPORTS)) -> Dict[str, int]:
+    """Export each table to out_dir, returning rows written per table"""
+    os.makedirs(out_dir, exist_ok=True)
+    suffix = f"_{student_id}" if student_id else ""
+    written = {}
+    for table in tables:
+        path = os.path.join(out_dir, f"{table}{suffix}.{file_format}")
+        written[table] = write_rows(stream_table(table, student_id), EXPORTS[table].row_type, path, file_format)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Boostly history tables")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--format", choices=FORMATS, default='csv')
+    parser.add_argument("--table", choices=list(EXPORTS), action='append', help="Table to export (default: all)")
+    parser.add_argument("--student-id", help="Export only this student's history")
+    parser.add_argument("--roll", help="Export only this student's history (by roll number)")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Export a generated local database of N rows per table instead of the database")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        path = os.path.join(tempfile.mkdtemp(prefix="boostly-export-"), "history.db")
+        start = time.perf_counter()
+        build_synthetic(path, args.synthetic)
+        print(f"Generated {args.synthetic:,} rows per table in {time.perf_counter() - start:.1f}s ({path})")
+        # Read by db_helper when it is first imported
+        os.environ["BOOSTLY_BACKEND"] = "local"
+        os.environ["BOOSTLY_LOCAL_DB"] = path
+
+    student_id = args.student_id
+    if args.roll:
+        from db_helper import get_student_by_roll
+        from models import StudentRef
+        student = get_student_by_roll(args.roll, StudentRef)
+        if not student:
+            raise SystemExit(f"Student {args.roll} not found")
+        student_id = student.id
+
+    # Memory is only traced in benchmark mode; tracemalloc slows the export down
+    if args.synthetic:
+        tracemalloc.start()
+    start = time.perf_counter()
+    written = export_history(args.out, args.format, student_id, args.table or tuple(EXPORTS))
+    elapsed = time.perf_counter() - start
+
+    for table, count in written.items():
+        print(f"{table:<22}{count:>12,} rows")
+    print(f"Finished in {elapsed:.1f}s")
+    if args.synthetic:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,45 +3,87 @@
 -- =====================================================
 -- Run this in Supabase SQL Editor to allow operations without authentication
 -- This is needed because we're using anon key, not authenticated users
+-- Run it again after applying migrations/: it also opens the tables they add
 
 -- Credit Transactions: Allow everyone to insert (for testing)
 DROP POLICY IF EXISTS "Students can create credit transactions" ON credit_transactions;
+DROP POLICY IF EXISTS "Anyone can create credit transactions" ON credit_transactions;
 CREATE POLICY "Anyone can create credit transactions"
     ON credit_transactions FOR INSERT
     WITH CHECK (true);
 
 -- Student Credits: Allow updates
 DROP POLICY IF EXISTS "Students can update their own credits" ON student_credits;
+DROP POLICY IF EXISTS "Anyone can update student credits" ON student_credits;
 CREATE POLICY "Anyone can update student credits"
     ON student_credits FOR UPDATE
     USING (true);
 
 -- Notifications: Allow inserts
 DROP POLICY IF EXISTS "Users can update their own notifications" ON notifications;
+DROP POLICY IF EXISTS "Anyone can create notifications" ON notifications;
 CREATE POLICY "Anyone can create notifications"
     ON notifications FOR INSERT
     WITH CHECK (true);
 
+DROP POLICY IF EXISTS "Anyone can view notifications" ON notifications;
 CREATE POLICY "Anyone can view notifications"
     ON notifications FOR SELECT
     USING (true);
 
 -- Endorsements: Already should work, but make sure
 DROP POLICY IF EXISTS "Students can create endorsements" ON endorsements;
+DROP POLICY IF EXISTS "Anyone can create endorsements" ON endorsements;
 CREATE POLICY "Anyone can create endorsements"
     ON endorsements FOR INSERT
     WITH CHECK (true);
 
 -- Voucher Purchases: Allow inserts
 DROP POLICY IF EXISTS "Students can create voucher purchases" ON voucher_purchases;
+DROP POLICY IF EXISTS "Anyone can create voucher purchases" ON voucher_purchases;
 CREATE POLICY "Anyone can create voucher purchases"
     ON voucher_purchases FOR INSERT
     WITH CHECK (true);
 
+DROP POLICY IF EXISTS "Anyone can view voucher purchases" ON voucher_purchases;
 CREATE POLICY "Anyone can view voucher purchases"
     ON voucher_purchases FOR SELECT
     USING (true);
 
+-- Notification digests (migration 006): viewable like notifications
+DO $$
+BEGIN
+    IF to_regclass('notification_digests') IS NOT NULL THEN
+        DROP POLICY IF EXISTS "Anyone can view notification digests" ON notification_digests;
+        CREATE POLICY "Anyone can view notification digests"
+            ON notification_digests FOR SELECT
+            USING (true);
+    END IF;
+END $$;
+
+-- Voucher codes (migration 002): claimed codes are viewable like voucher
+-- purchases; the unclaimed pool stays hidden
+DO $$
+BEGIN
+    IF to_regclass('voucher_codes') IS NOT NULL THEN
+        DROP POLICY IF EXISTS "Anyone can view claimed voucher codes" ON voucher_codes;
+        CREATE POLICY "Anyone can view claimed voucher codes"
+            ON voucher_codes FOR SELECT
+            USING (claimed_at IS NOT NULL);
+    END IF;
+END $$;
+
+-- Redemption totals (migration 010): viewable like voucher purchases
+DO $$
+BEGIN
+    IF to_regclass('student_redemption_totals') IS NOT NULL THEN
+        DROP POLICY IF EXISTS "Anyone can view redemption totals" ON student_redemption_totals;
+        CREATE POLICY "Anyone can view redemption totals"
+            ON student_redemption_totals FOR SELECT
+            USING (true);
+    END IF;
+END $$;
+
 -- Verify
 SELECT 'RLS policies updated successfully!' as status;
 
@@ -0,0 +1,219 @@
+"""
+Time-windowed leaderboards for Boostly
+Credits received this week, this month and this term, each kept in an
+order-statistic index so top-K and a student's rank are answered in
+logarithmic time instead of scanning credit_transactions on every rerun.
+
+Indexes are loaded from the bucketed rollups (migrations 001 and 004),
+updated in place as send_credits writes land in this process, and reloaded
+after max_age seconds to pick up writes made by other replicas.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+WINDOWS = ('week', 'month', 'term')
+
+# Months in which a term starts; the current term began at the latest of these
+TERM_START_MONTHS = sorted(int(m) for m in os.getenv("BOOSTLY_TERM_START_MONTHS", "1,7").split(","))
+
+
+# =====================================================
+# ORDER-STATISTIC INDEX
+# =====================================================
+
+class RankIndex:
+    """Students ordered by a non-negative integer score
+
+    A Fenwick tree counts students per score value, so "how many students
+    score higher" is a prefix sum and "the k-th lowest score" is a tree
+    descent: rank, update and each step of top-K are O(log S) for scores up
+    to S. Tied students share a rank (1, 2, 2, 4).
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._size = 1
+        while self._size < capacity:
+            self._size *= 2
+        self._tree = [0] * (self._size + 1)
+        self._scores: Dict[str, int] = {}
+        self._holders: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _bump(self, score: int, delta: int):
+        i = score + 1
+        while i <= self._size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_at_most(self, score: int) -> int:
+        i, total = min(score + 1, self._size), 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _kth_lowest(self, k: int) -> int:
+        """Smallest score s with at least k students scoring <= s"""
+        position, step = 0, self._size
+        while step:
+            if position + step <= self._size and self._tree[position + step] < k:
+                position += step
+                k -= self._tree[position]
+            step //= 2
+        return position  # tree slot position + 1 holds score position
+
+    def _grow(self, score: int):
+        while self._size <= score:
+            self._size *= 2
+        self._tree = [0] * (self._size + 1)
+        for value, holders in self._holders.items():
+            self._bump(value, len(holders))
+
+    def set(self, student_id: str, score: int):
+        """Set a student's score, adding the student if new"""
+        score = max(int(score), 0)
+        old = self._scores.get(student_id)
+        if old == score:
+            return
+        if old is not None:
+            self._holders[old].discard(student_id)
+            if not self._holders[old]:
+                del self._holders[old]
+            self._bump(old, -1)
+        if score >= self._size:
+            self._grow(score)
+        self._scores[student_id] = score
+        self._holders.setdefault(score, set()).add(student_id)
+        self._bump(score, 1)
+
+    def add(self, student_id: str, delta: int):
+        """Add delta to a student's score"""
+        self.set(student_id, self._scores.get(student_id, 0) + delta)
+
+    def score(self, student_id: str) -> Optional[int]:
+        return self._scores.get(student_id)
+
+    def rank(self, student_id: str) -> Optional[int]:
+        """1-based rank, or None if the student has no score in this window"""
+        score = self._scores.get(student_id)
+        if score is None:
+            return None
+        return len(self._scores) - self._count_at_most(score) + 1
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        """Top k (student_id, score) pairs, highest first, ties by student id"""
+        result: List[Tuple[str, int]] = []
+        remaining = len(self._scores)  # students not yet emitted, all scoring <= the next score
+        while remaining and len(result) < k:
+            score = self._kth_lowest(remaining)
+            holders = sorted(self._holders[score])
+            result.extend((student_id, score) for student_id in holders[:k - len(result)])
+            remaining -= len(holders)
+        return result
+
+
+# =====================================================
+# WINDOWS
+# =====================================================
+
+def window_key(window: str, now: Optional[datetime] = None) -> str:
+    """Bucket the window starts in: week 'YYYY-MM-DD' (Monday), month or term 'YYYY-MM'
+
+    Buckets are in UTC to match DATE_TRUNC / TO_CHAR in the rollup triggers.
+    """
+    now = now or datetime.now(timezone.utc)
+    if window == 'week':
+        return (now.date() - timedelta(days=now.weekday())).isoformat()
+    if window == 'month':
+        return now.strftime('%Y-%m')
+    if window == 'term':
+        started = [m for m in TERM_START_MONTHS if m <= now.month]
+        if started:
+            return f"{now.year}-{started[-1]:02d}"
+        return f"{now.year - 1}-{TERM_START_MONTHS[-1]:02d}"
+    raise ValueError(f"Unknown leaderboard window: {window}")
+
+
+def load_window(window: str, key: str) -> RankIndex:
+    """Build a window's index from the rollup tables"""
+    from db_helper import get_monthly_rollups, get_weekly_received
+    from models import ReceivedCredits
+
+    if window == 'week':
+        rows: Iterable[ReceivedCredits] = get_weekly_received(key)
+    else:
+        # Months from the window start onwards: just this month, or every month of the term
+        rows = get_monthly_rollups(key, row_type=ReceivedCredits)
+    index = RankIndex()
+    for row in rows:
+        if row.credits_received:
+            index.add(row.student_id, row.credits_received)
+    return index
+
+
+class Leaderboards:
+    """Weekly, monthly and term rank indexes shared by every session in the process"""
+
+    def __init__(self, max_age: float = 60.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, RankIndex] = {}
+        self._keys: Dict[str, str] = {}
+        self._loaded_at: Dict[str, float] = {}
+
+    def _index(self, window: str) -> RankIndex:
+        key = window_key(window)
+        with self._lock:
+            if (self._keys.get(window) == key
+                    and time.monotonic() - self._loaded_at[window] < self.max_age):
+                return self._indexes[window]
+        index = load_window(window, key)
+        with self._lock:
+            self._indexes[window] = index
+            self._keys[window] = key
+            self._loaded_at[window] = time.monotonic()
+        return index
+
+    def record_transfer(self, transaction: Dict):
+        """Apply a transfer committed by this process to every loaded, current window"""
+        with self._lock:
+            for window, index in self._indexes.items():
+                if self._keys[window] == window_key(window):
+                    index.add(str(transaction['receiver_id']), int(transaction['amount']))
+
+    def rank(self, window: str, student_id: str) -> Optional[int]:
+        index = self._index(window)
+        with self._lock:
+            return index.rank(student_id)
+
+    def top(self, window: str, k: int = 10) -> List[Tuple[str, int]]:
+        index = self._index(window)
+        with self._lock:
+            return index.top(k)
+
+    def size(self, window: str) -> int:
+        """Number of ranked students in the window"""
+        index = self._index(window)
+        with self._lock:
+            return len(index)
+
+
+_leaderboards: Optional[Leaderboards] = None
+_leaderboards_lock = threading.Lock()
+
+
+def get_leaderboards() -> Leaderboards:
+    """Process-wide leaderboards, subscribed to this process's transfers"""
+    global _leaderboards
+    with _leaderboards_lock:
+        if _leaderboards is None:
+            from db_helper import on_transfer
+            _leaderboards = Leaderboards(float(os.getenv("BOOSTLY_LEADERBOARD_MAX_AGE", "60")))
+            on_transfer(_leaderboards.record_transfer)
+        return _leaderboards
@@ -0,0 +1,431 @@
+"""
+Ledger reconciliation job for Boostly
+Checks every monthly student_credits balance against the ledger it
+summarises: the transfers in credit_transactions and the purchases in
+voucher_purchases. send_credits writes the transaction and then updates the
+sender and receiver balances in separate calls, so a failure in between
+leaves drift that nothing else notices.
+
+For one student and month with S credits sent, R received and V redeemed,
+the balance row should hold
+
+    credits_sent_this_month = S
+    credits_received        = R - V
+    total_credits           = ALLOWANCE + R - S - V
+
+where ALLOWANCE is the opening balance every ledger-backed path creates a
+month's row with (100). Credits granted outside the ledger (seed data,
+manual top-ups) show up as drift too.
+
+Each month is one partition, audited on a process pool. A worker streams
+the month's transfers, purchases and balances in keyset-paged chunks
+(db_helper.iter_table_pages), codes student ids as dense integers and sums
+each chunk with numpy.bincount, so memory grows with the number of
+students, not of transactions.
+
+With --fix the expected values are written back as compare-and-set updates
+that only apply while a row still holds what the audit read, and missing
+rows are inserted. The current month is live and only fixed with
+--fix-current. The exit status is 1 while mismatches remain (for cron).
+
+Usage:
+    python ledger_reconciliation.py                          # audit the last 12 months
+    python ledger_reconciliation.py --month 2026-03 --fix    # audit and correct one month
+    python ledger_reconciliation.py --synthetic 10000000     # benchmark on a generated ledger
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+ALLOWANCE = int(os.getenv("LEDGER_AUDIT_ALLOWANCE", "100"))
+MONTHS = int(os.getenv("LEDGER_AUDIT_MONTHS", "12"))
+PAGE_SIZE = int(os.getenv("LEDGER_AUDIT_PAGE_SIZE", "20000"))
+
+BALANCE_FIELDS = ('total_credits', 'credits_received', 'credits_sent_this_month')
+
+
+class Mismatch(NamedTuple):
+    """A balance row that disagrees with the ledger (stored values None when the row is missing)"""
+    student_id: str
+    month_year: str
+    credits_id: Optional[str]
+    stored: Optional[Tuple[int, int, int]]
+    expected: Tuple[int, int, int]
+
+    def drifted(self) -> List[str]:
+        """Names of the balance fields that differ"""
+        if self.stored is None:
+            return ['missing_row']
+        return [name for name, have, want in zip(BALANCE_FIELDS, self.stored, self.expected) if have != want]
+
+    def delta(self) -> int:
+        """Largest absolute difference over the balance fields"""
+        stored = self.stored or (0, 0, 0)
+        return max(abs(have - want) for have, want in zip(stored, self.expected))
+
+
+class MonthAudit(NamedTuple):
+    """Result of auditing one month partition"""
+    month_year: str
+    transfers: int
+    purchases: int
+    balances: int
+    mismatches: List[Mismatch]
+    seconds: float
+
+
+class ReconciliationMetrics:
+    """Counters reported after every run"""
+
+    def __init__(self):
+        self.months = 0
+        self.transfers = 0
+        self.purchases = 0
+        self.balances = 0
+        self.mismatches = 0
+        self.missing_rows = 0
+        self.fixed = 0
+        self.conflicts = 0
+        self.skipped_current = 0
+        self.seconds = 0.0
+        self.rows_per_second = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(vars(self))
+
+
+# =====================================================
+# PARTITION WORKER
+# =====================================================
+
+class StudentCodes:
+    """Dense integer codes for student ids
+
+    Seeded from the student directory; ids the directory does not know
+    (deleted students) get the next free code when first seen.
+    """
+
+    def __init__(self, ids: Sequence[str]):
+        self.ids = list(ids)
+        self.index = {student_id: code for code, student_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def encode(self, ids: Sequence[str]) -> np.ndarray:
+        try:
+            return np.fromiter(map(self.index.__getitem__, ids), np.int64, len(ids))
+        except KeyError:
+            for student_id in ids:
+                if student_id not in self.index:
+                    self.index[student_id] = len(self.ids)
+                    self.ids.append(student_id)
+            return self.encode(ids)
+
+
+_codes: Optional[StudentCodes] = None
+
+
+def _init_worker():
+    """Load the student directory once per worker process"""
+    global _codes
+    from db_helper import get_all_students
+    from models import StudentRef
+    _codes = StudentCodes([student.id for student in get_all_students(StudentRef)])
+
+
+def month_bounds(month_year: str) -> Tuple[str, str]:
+    """Half-open created_at range [first instant, first instant of the next month)"""
+    year, month = map(int, month_year.split('-'))
+    following = f"{year + 1}-01" if month == 12 else f"{year}-{month + 1:02d}"
+    return f"{month_year}-01T00:00:00+00:00", f"{following}-01T00:00:00+00:00"
+
+
+def _add(total: np.ndarray, codes: np.ndarray, weights: Sequence[int]) -> np.ndarray:
+    """Add weights per code into total, growing it when new codes appeared"""
+    sums = np.bincount(codes, weights=np.asarray(weights, dtype=np.float64), minlength=len(total))
+    if len(sums) > len(total):
+        total = np.pad(total, (0, len(sums) - len(total)))
+    total += sums
+    return total
+
+
+def audit_month(month_year: str, allowance: int = ALLOWANCE, page_size: int = PAGE_SIZE) -> MonthAudit:
+    """Compare one month's balance rows with the month's transfers and purchases"""
+    from db_helper import iter_table_pages
+    from models import LedgerBalance, LedgerPurchase, LedgerTransfer
+
+    if _codes is None:
+        _init_worker()
+    codes = _codes
+    start = time.perf_counter()
+    created_from, created_before = month_bounds(month_year)
+
+    # Float sums are exact far beyond any realistic credit total (2**53)
+    sent = np.zeros(len(codes))
+    received = np.zeros(len(codes))
+    redeemed = np.zeros(len(codes))
+    transfers = purchases = 0
+    for page in iter_table_pages('credit_transactions', LedgerTransfer, page_size,
+                                 created_from, created_before, transaction_type='transfer'):
+        _, senders, receivers, amounts, _ = zip(*page)
+        sent = _add(sent, codes.encode(senders), amounts)
+        received = _add(received, codes.encode(receivers), amounts)
+        transfers += len(page)
+    for page in iter_table_pages('voucher_purchases', LedgerPurchase, page_size, created_from, created_before):
+        _, students, credits, _ = zip(*page)
+        redeemed = _add(redeemed, codes.encode(students), credits)
+        purchases += len(page)
+
+    balances: List[LedgerBalance] = []
+    for page in iter_table_pages('student_credits', LedgerBalance, page_size, month_year=month_year):
+        balances.extend(page)
+
+    size = len(codes)
+    sent, received, redeemed = (np.pad(a, (0, size - len(a))).astype(np.int64) for a in (sent, received, redeemed))
+    expected = np.stack([allowance + received - sent - redeemed, received - redeemed, sent], axis=1)
+
+    mismatches = []
+    if balances:
+        ids, student_ids, totals, receipts, sends, _ = zip(*balances)
+        row_codes = codes.encode(student_ids)
+        stored = np.stack([np.asarray(totals, np.int64), np.asarray(receipts, np.int64),
+                           np.asarray(sends, np.int64)], axis=1)
+        for i in np.flatnonzero((stored != expected[row_codes]).any(axis=1)):
+            mismatches.append(Mismatch(student_ids[i], month_year, ids[i],
+                                       tuple(stored[i].tolist()), tuple(expected[row_codes[i]].tolist())))
+    else:
+        row_codes = np.zeros(0, np.int64)
+
+    # Students with ledger activity but no balance row for the month
+    active = np.flatnonzero(sent | received | redeemed)
+    for code in np.setdiff1d(active, row_codes).tolist():
+        mismatches.append(Mismatch(codes.ids[code], month_year, None, None, tuple(expected[code].tolist())))
+
+    return MonthAudit(month_year, transfers, purchases, len(balances), mismatches,
+                      round(time.perf_counter() - start, 3))
+
+
+# =====================================================
+# RUN
+# =====================================================
+
+def recent_months(count: int) -> List[str]:
+    """The current month and the count - 1 before it, oldest first"""
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1
+    return [f"{i // 12}-{i % 12 + 1:02d}" for i in range(index - count + 1, index + 1)]
+
+
+def reconcile(months: Sequence[str], metrics: ReconciliationMetrics, allowance: int = ALLOWANCE,
+              workers: int = os.cpu_count() or 1, page_size: int = PAGE_SIZE) -> List[Mismatch]:
+    """Audit the months on a pool of worker processes and return every mismatch"""
+    start = time.perf_counter()
+    workers = max(1, min(workers, len(months)))
+    with multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker) as pool:
+        audits = pool.starmap(audit_month, [(month, allowance, page_size) for month in months])
+    metrics.seconds = round(time.perf_counter() - start, 2)
+
+    mismatches = []
+    for audit in sorted(audits):
+        print(f"📅 {audit.month_year}: {audit.transfers:,} transfers, {audit.purchases:,} purchases, "
+              f"{audit.balances:,} balances, {len(audit.mismatches):,} mismatches ({audit.seconds}s)")
+        metrics.months += 1
+        metrics.transfers += audit.transfers
+        metrics.purchases += audit.purchases
+        metrics.balances += audit.balances
+        mismatches.extend(audit.mismatches)
+    metrics.mismatches = len(mismatches)
+    metrics.missing_rows = sum(1 for m in mismatches if m.stored is None)
+    rows = metrics.transfers + metrics.purchases + metrics.balances
+    metrics.rows_per_second = round(rows / metrics.seconds) if metrics.seconds else 0
+    return mismatches
+
+
+def apply_fixes(mismatches: Sequence[Mismatch], metrics: ReconciliationMetrics, fix_current: bool = False):
+    """Write the expected balances back, never overwriting a row that moved since the audit"""
+    from db_helper import correct_student_credits
+
+    current = datetime.now(timezone.utc).strftime('%Y-%m')
+    for mismatch in mismatches:
+        if mismatch.month_year >= current and not fix_current:
+            metrics.skipped_current += 1
+            continue
+        expected = dict(zip(BALANCE_FIELDS, mismatch.expected))
+        seen = dict(zip(BALANCE_FIELDS, mismatch.stored)) if mismatch.stored is not None else None
+        if correct_student_credits(mismatch.student_id, mismatch.month_year, expected, seen):
+            metrics.fixed += 1
+        else:
+            metrics.conflicts += 1
+    print(f"🔧 Fixed {metrics.fixed}, changed since audit {metrics.conflicts}, "
+          f"current month left alone {metrics.skipped_current}")
+
+
+def print_mismatches(mismatches: Sequence[Mismatch], limit: int):
+    """The largest mismatches, one per line"""
+    for mismatch in sorted(mismatches, key=Mismatch.delta, reverse=True)[:limit]:
+        print(f"   {mismatch.month_year} {mismatch.student_id}: {', '.join(mismatch.drifted())} "
+              f"stored {mismatch.stored} expected {mismatch.expected} (total, received, sent)")
+    if len(mismatches) > limit:
+        print(f"   ... and {len(mismatches) - limit:,} more")
+
+
+# =====================================================
+# SYNTHETIC LEDGER (benchmark)
+# =====================================================
+
+def build_synthetic(path: str, transfers: int, students: int, months: Sequence[str], drift: int,
+                    allowance: int = ALLOWANCE, seed: int = 42) -> Set[str]:
+    """Write a consistent ledger to a local database, then drift some balances
+
+    Rows go in with plain executemany while the triggers and secondary
+    indexes are dropped; reopening the database with LocalClient restores
+    them. Returns the ids of the balance rows that were drifted.
+    """
+    from local_backend import LocalClient
+
+    LocalClient(path).close()
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA synchronous = OFF")
+    for kind, name in conn.execute(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger') AND sql IS NOT NULL").fetchall():
+        conn.execute(f"DROP {kind.upper()} {name}")
+
+    created_at = f"{months[0]}-01T00:00:00.000000+00:00"
+    ids = [f"s{n:07d}" for n in range(students)]
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO students (id, name, roll_number, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                     ((sid, f"Student {sid}", f"SYN/{sid}", created_at, created_at) for sid in ids))
+
+    balances = []
+    per_month = -(-transfers // len(months))
+    for number, month in enumerate(months):
+        count = min(per_month, transfers - number * per_month)
+        start, end = (np.datetime64(bound[:19], 'us') for bound in month_bounds(month))
+        span = int((end - start) / np.timedelta64(1, 'us'))
+
+        senders = rng.integers(0, students, count)
+        receivers = (senders + rng.integers(1, students, count)) % students
+        amounts = rng.integers(1, 11, count)
+        stamps = np.datetime_as_string(start + np.sort(rng.integers(0, span, count)).astype('timedelta64[us]'),
+                                       unit='us')
+        base = number * per_month
+        conn.executemany(
+            "INSERT INTO credit_transactions (id, sender_id, receiver_id, amount, transaction_type, created_at)"
+            " VALUES (?, ?, ?, ?, 'transfer', ?)",
+            ((f"t{base + i:010d}", ids[s], ids[r], a, f"{t}+00:00")
+             for i, (s, r, a, t) in enumerate(zip(senders.tolist(), receivers.tolist(),
+                                                  amounts.tolist(), stamps.tolist())))
+        )
+
+        buyers = rng.integers(0, students, count // 20)
+        vouchers = rng.integers(1, 4, len(buyers))
+        stamps = np.datetime_as_string(start + np.sort(rng.integers(0, span, len(buyers))).astype('timedelta64[us]'),
+                                       unit='us')
+        conn.executemany(
+            "INSERT INTO voucher_purchases (id, student_id, num_vouchers, credits_per_voucher, total_credits,"
+            " total_value, voucher_rate, created_at) VALUES (?, ?, ?, 10, ?, ?, 5.0, ?)",
+            ((f"p{base + i:010d}", ids[b], v, v * 10, v * 50.0, f"{t}+00:00")
+             for i, (b, v, t) in enumerate(zip(buyers.tolist(), vouchers.tolist(), stamps.tolist())))
+        )
+
+        sent = np.bincount(senders, weights=amounts, minlength=students).astype(np.int64)
+        received = np.bincount(receivers, weights=amounts, minlength=students).astype(np.int64)
+        redeemed = np.bincount(buyers, weights=vouchers * 10, minlength=students).astype(np.int64)
+        month_start = f"{month}-01T00:00:00.000000+00:00"
+        for code in np.flatnonzero(sent | received | redeemed).tolist():
+            balances.append([f"c{number:03d}{code:07d}", ids[code],
+                             allowance + int(received[code] - sent[code] - redeemed[code]),
+                             int(received[code] - redeemed[code]), int(sent[code]), month, month_start])
+
+    drifted = set()
+    for row in (balances[i] for i in rng.choice(len(balances), min(drift, len(balances)), replace=False)):
+        row[2 + int(rng.integers(0, 3))] += int(rng.choice([-5, -1, 1, 5]))
+        drifted.add(row[0])
+    conn.executemany(
+        "INSERT INTO student_credits (id, student_id, total_credits, credits_received, credits_sent_this_month,"
+        " monthly_limit, month_year, created_at, updated_at) VALUES (?, ?, ?, ?, ?, 100, ?, ?, ?)",
+        (row + [row[-1]] for row in balances)
+    )
+    conn.execute("COMMIT")
+    conn.close()
+    LocalClient(path).close()
+    return drifted
+
+
+# =====================================================
+# CLI
+# =====================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Check student_credits balances against the ledger")
+    parser.add_argument("--month", action="append", help="Month to audit as YYYY-MM (repeatable)")
+    parser.add_argument("--months", type=int, default=MONTHS, help="Audit this many recent months")
+    parser.add_argument("--allowance", type=int, default=ALLOWANCE, help="Opening balance of a month's row")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="Rows per keyset page")
+    parser.add_argument("--fix", action="store_true", help="Write corrected balances")
+    parser.add_argument("--fix-current", action="store_true", help="With --fix, also correct the current month")
+    parser.add_argument("--show", type=int, default=20, help="Mismatches to print")
+    parser.add_argument("--json", help="Write the mismatches and counters to this file")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Audit a generated local ledger of N transfers instead of the database")
+    parser.add_argument("--students", type=int, default=0, help="Students in the synthetic ledger")
+    parser.add_argument("--drift", type=int, default=100, help="Balances to drift in the synthetic ledger")
+    args = parser.parse_args()
+
+    months = sorted(set(args.month)) if args.month else recent_months(args.months)
+    drifted: Set[str] = set()
+    if args.synthetic:
+        students = args.students or max(1000, args.synthetic // 200)
+        path = os.path.join(tempfile.mkdtemp(prefix="boostly-ledger-"), "ledger.db")
+        start = time.perf_counter()
+        months = recent_months(len(months) + 1)[:-1]
+        drifted = build_synthetic(path, args.synthetic, students, months, args.drift, args.allowance)
+        print(f"🧪 Generated {args.synthetic:,} transfers for {students:,} students over {len(months)} months "
+              f"in {time.perf_counter() - start:.1f}s ({path})")
+        # Inherited by the worker processes
+        os.environ["BOOSTLY_BACKEND"] = "local"
+        os.environ["BOOSTLY_LOCAL_DB"] = path
+
+    metrics = ReconciliationMetrics()
+    try:
+        mismatches = reconcile(months, metrics, args.allowance, args.workers, args.page_size)
+    except Exception as e:
+        print(f"❌ Audit failed, nothing was fixed: {e}")
+        sys.exit(2)
+    print_mismatches(mismatches, args.show)
+    if args.fix:
+        apply_fixes(mismatches, metrics, args.fix_current)
+
+    print(f"📊 {metrics.months} months, {metrics.transfers:,} transfers, {metrics.purchases:,} purchases, "
+          f"{metrics.balances:,} balances in {metrics.seconds}s ({metrics.rows_per_second:,} rows/s), "
+          f"{metrics.mismatches:,} mismatches ({metrics.missing_rows:,} missing rows)")
+    if args.synthetic:
+        found = {m.credits_id for m in mismatches}
+        verdict = "✅" if found == drifted else "❌"
+        print(f"{verdict} Found {len(found & drifted)} of {len(drifted)} drifted balances, "
+              f"{len(found - drifted)} false positives")
+        sys.exit(0 if found == drifted else 1)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'metrics': metrics.as_dict(),
+                       'mismatches': [dict(m._asdict(), drifted=m.drifted()) for m in mismatches]}, f, indent=2)
+        print(f"Report written to {args.json}")
+    sys.exit(1 if metrics.mismatches > metrics.fixed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+Headless load simulator for Boostly
+Drives the real pages of app.py with Streamlit's AppTest across many
+concurrent simulated sessions against the local SQLite backend
+(local_backend.py), one seeded student per session. Each session opens the
+notifications page, sends credits, endorses a student and redeems a voucher.
+Sessions are spread over worker processes that hit the database at once.
+
+Per rerun it records latency and database calls; per session it records
+session-state size, and for the process the RSS growth per session. With
+--tracemalloc it also traces Python allocations: the bytes each session
+keeps alive once its reruns are done, and the peak each rerun allocates on
+top of them. The report is printed and written as JSON so runs can be
+compared over time.
+
+Usage:
+    python load_simulator.py --sessions 200 --concurrency 8
+    python load_simulator.py --sessions 50 --iterations 3 --compare load_reports/<earlier>.json
+    python load_simulator.py --sessions 100 --tracemalloc
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(HERE, "app.py")
+ROLL_PREFIX = "2K22/LT/"
+
+
+class RerunSample(NamedTuple):
+    """One timed rerun of app.py"""
+    session: int
+    action: str
+    seconds: float
+    db_calls: int
+    exceptions: int
+    peak_bytes: int  # allocated during the rerun at its peak (0 unless tracing)
+
+
+# =====================================================
+# MEASUREMENT
+# =====================================================
+
+def current_rss_kib() -> int:
+    """Resident set size of this process in KiB (0 where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return 0
+
+
+def deep_size(obj, seen: Optional[set] = None) -> int:
+    """Approximate bytes held by a session-state value and everything it contains"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_size(vars(obj), seen)
+    return size
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# =====================================================
+# SIMULATED SESSION
+# =====================================================
+
+class SimulatedSession:
+    """One student clicking through the app in its own AppTest instance"""
+
+    def __init__(self, number: int, client, timeout: float, rng: random.Random):
+        from streamlit.testing.v1 import AppTest
+
+        self.number = number
+        self.roll = f"{ROLL_PREFIX}{number:04d}"
+        self.client = client
+        self.rng = rng
+        self.samples: List[RerunSample] = []
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.app.session_state['current_student_roll'] = self.roll
+
+    def _timed(self, action: str, step):
+        """Run one interaction (which reruns the script) and record it"""
+        calls_before = self.client.calls[self.roll]
+        errors_before = len(self.app.exception)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        step()
+        elapsed = time.perf_counter() - start
+        self.samples.append(RerunSample(
+            self.number, action, elapsed,
+            self.client.calls[self.roll] - calls_before,
+            max(len(self.app.exception) - errors_before, 0),
+            tracemalloc.get_traced_memory()[1] - traced_before if tracing else 0,
+        ))
+
+    def _open(self, page: str):
+        def step():
+            self.app.session_state['page'] = page
+            self.app.run()
+        self._timed(f"{page}:open", step)
+
+    def _button(self, label: str):
+        for button in self.app.button:
+            if button.label == label:
+                return button
+        return None
+
+    # Each action yields after every rerun so a worker can interleave its sessions
+
+    def notifications(self) -> Iterator[None]:
+        self._open('notifications')
+        yield
+
+    def send_credits(self) -> Iterator[None]:
+        self._open('send_credits')
+        yield
+        choices = [b for b in self.app.button if (b.key or '').startswith('select_')]
+        if not choices:
+            return
+        choice = self.rng.choice(choices)
+        self._timed('send_credits:select', lambda: choice.click().run())
+        yield
+        amount = self.app.number_input(key='credits_input')
+        amount.set_value(min(self.rng.randint(1, 5), amount.max or 1))
+        self.app.text_area(key='message_input').set_value(f"Load test thanks from {self.roll}")
+        submit = self._button("Send Credits")
+        if submit is not None:
+            self._timed('send_credits:submit', lambda: submit.click().run())
+            yield
+
+    def endorse(self) -> Iterator[None]:
+        self._open('endorse')
+        yield
+        choices = [b for b in self.app.button if (b.key or '').startswith('endorse_') and not b.disabled]
+        if choices:
+            choice = self.rng.choice(choices)
+            self._timed('endorse:click', lambda: choice.click().run())
+            yield
+
+    def redeem(self) -> Iterator[None]:
+        self._open('redeem')
+        yield
+        submit = self._button("Purchase Vouchers")
+        if submit is None:
+            return
+        self.app.number_input(key='num_vouchers_input').set_value(1)
+        self.app.number_input(key='credits_per_voucher_input').set_value(1)
+        self._timed('redeem:submit', lambda: submit.click().run())
+        yield
+
+    def script(self, iterations: int) -> Iterator[None]:
+        self._timed('first_load', self.app.run)
+        yield
+        for _ in range(iterations):
+            yield from self.send_credits()
+            yield from self.endorse()
+            yield from self.redeem()
+            yield from self.notifications()
+
+    def session_state_bytes(self) -> int:
+        return deep_size(self.app.session_state.to_dict())
+
+
+# =====================================================
+# RUN
+# =====================================================
+
+class WorkerResult(NamedTuple):
+    """Everything one worker process measured"""
+    samples: List[RerunSample]
+    session_state_bytes: List[int]
+    errors: List[str]
+    rss_growth_kib: int
+    rss_after_kib: int
+    traced_growth_bytes: int  # 0 unless tracing
+    write_metrics: Dict[str, float]
+    db_calls_outside_sessions: int
+
+
+def run_worker(numbers: List[int], iterations: int, timeout: float, seed: int,
+               trace: bool = False) -> WorkerResult:
+    """Run a share of the sessions in this process, interleaving them one rerun at a time
+
+    AppTest installs a process-wide runtime for the duration of each run, so
+    runs within a process cannot overlap; concurrency comes from the worker
+    processes, which share the SQLite database like replicas share Postgres.
+    All of a worker's sessions stay alive until the end, as on a server.
+    Tracing starts after the imports and the database client, so the traced
+    growth is what the sessions themselves keep alive (plus the process-wide
+    caches they fill, which a server pays once).
+    """
+    sys.path.insert(0, HERE)
+    import db_helper
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    client = db_helper.get_client()
+
+    def session_key() -> Optional[str]:
+        # Calls made from a session's script thread are counted under its roll number
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return None
+        try:
+            return ctx.session_state['current_student_roll']
+        except KeyError:
+            return None
+    client.context = session_key
+
+    if trace:
+        gc.collect()
+        tracemalloc.start()
+    rss_before = current_rss_kib()
+    sessions = [SimulatedSession(n, client, timeout, random.Random(seed + n)) for n in numbers]
+    scripts = {session.number: session.script(iterations) for session in sessions}
+    errors = []
+    while scripts:
+        for number in list(scripts):
+            try:
+                next(scripts[number])
+            except StopIteration:
+                del scripts[number]
+            except Exception as e:
+                errors.append(f"session {number}: {type(e).__name__}: {e}")
+                del scripts[number]
+    rss_after = current_rss_kib()
+    traced_growth = 0
+    if trace:
+        gc.collect()
+        traced_growth = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    return WorkerResult(
+        [sample for session in sessions for sample in session.samples],
+        [session.session_state_bytes() for session in sessions],
+        errors, rss_after - rss_before, rss_after, traced_growth,
+        db_helper.get_write_metrics(), client.calls[None],
+    )
+
+
+def merge_write_metrics(metrics: List[Dict[str, float]]) -> Dict[str, float]:
+    merged: Dict[str, float] = {}
+    for item in metrics:
+        for key, value in item.items():
+            if key != 'avg_queue_wait_ms':
+                merged[key] = merged.get(key, 0) + value
+    queued = merged.get('queued', 0)
+    merged['avg_queue_wait_ms'] = round(
+        sum(m['avg_queue_wait_ms'] * m['queued'] for m in metrics) / queued, 1) if queued else 0.0
+    return merged
+
+
+def simulate(sessions: int, concurrency: int, iterations: int, timeout: float,
+             seed: int, db_path: str, trace: bool = False) -> Dict:
+    """Seed the local backend and run every session, returning the report"""
+    from local_backend import LocalClient, seed as seed_students
+
+    client = LocalClient(db_path)
+    seed_students(client, sessions, voucher_codes=sessions * iterations * 2,
+                  roll_prefix=ROLL_PREFIX, credits_received=50)
+    client.close()
+
+    # Inherited by the worker processes
+    os.environ["BOOSTLY_BACKEND"] = "local"
+    os.environ["BOOSTLY_LOCAL_DB"] = db_path
+
+    workers = max(1, min(concurrency, sessions))
+    shares = [list(range(sessions))[i::workers] for i in range(workers)]
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        results = pool.starmap(run_worker, [(share, iterations, timeout, seed, trace) for share in shares])
+    wall = time.perf_counter() - start
+
+    samples = [sample for result in results for sample in result.samples]
+    actions: Dict[str, Dict] = {}
+    for action in sorted({s.action for s in samples}):
+        chosen = [s for s in samples if s.action == action]
+        latencies = [s.seconds * 1000 for s in chosen]
+        calls = [s.db_calls for s in chosen]
+        actions[action] = {
+            'reruns': len(chosen),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+            'max_ms': round(max(latencies), 1),
+            'db_calls_mean': round(sum(calls) / len(calls), 2),
+            'db_calls_max': max(calls),
+            'exceptions': sum(s.exceptions for s in chosen),
+        }
+        if trace:
+            actions[action]['peak_kib_mean'] = round(sum(s.peak_bytes for s in chosen) / len(chosen) / 1024, 1)
+
+    state_sizes = [size for result in results for size in result.session_state_bytes]
+    errors = [error for result in results for error in result.errors]
+    memory = {
+        'rss_growth_per_session_kib': round(sum(r.rss_growth_kib for r in results) / sessions, 1) if sessions else 0.0,
+        'rss_per_worker_kib': max(r.rss_after_kib for r in results),
+        'session_state_bytes_mean': round(sum(state_sizes) / len(state_sizes)) if state_sizes else 0,
+        'session_state_bytes_max': max(state_sizes, default=0),
+    }
+    if trace:
+        memory['traced_per_session_kib'] = round(sum(r.traced_growth_bytes for r in results) / sessions / 1024, 1)
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'config': {
+            'sessions': sessions, 'concurrency': workers, 'iterations': iterations, 'seed': seed,
+            'tracemalloc': trace,
+        },
+        'wall_s': round(wall, 2),
+        'reruns': len(samples),
+        'reruns_per_s': round(len(samples) / wall, 1) if wall else 0.0,
+        'session_errors': errors[:10],
+        'failed_sessions': len(errors),
+        'actions': actions,
+        'memory': memory,
+        'write_admission': merge_write_metrics([r.write_metrics for r in results]),
+        'db_calls_outside_sessions': sum(r.db_calls_outside_sessions for r in results),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# =====================================================
+# REPORT
+# =====================================================
+
+def format_report(report: Dict, baseline: Optional[Dict] = None) -> str:
+    """Plain-text table, with changes against a baseline report when given"""
+    config = report['config']
+    lines = [
+        f"{config['sessions']} sessions x {config['iterations']} iterations, {config['concurrency']} worker processes "
+        f"(rev {report['git_revision'] or 'unknown'})",
+        f"{report['reruns']} reruns in {report['wall_s']}s ({report['reruns_per_s']}/s), "
+        f"{report['failed_sessions']} failed sessions",
+        "",
+        f"{'action':<22}{'reruns':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'db calls':>10}{'errors':>8}",
+    ]
+    base_actions = baseline['actions'] if baseline else {}
+    for action, stats in report['actions'].items():
+        line = (f"{action:<22}{stats['reruns']:>8}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+                f"{stats['p99_ms']:>10.1f}{stats['db_calls_mean']:>10.2f}{stats['exceptions']:>8}")
+        base = base_actions.get(action)
+        if base:
+            line += (f"   p95 {stats['p95_ms'] - base['p95_ms']:+.1f} ms, "
+                     f"calls {stats['db_calls_mean'] - base['db_calls_mean']:+.2f}")
+        lines.append(line)
+
+    memory = report['memory']
+    lines += [
+        "",
+        f"Memory: {memory['rss_growth_per_session_kib']} KiB RSS per session, "
+        f"session state {memory['session_state_bytes_mean']} B mean / {memory['session_state_bytes_max']} B max",
+        f"Write admission: {report['write_admission']}",
+    ]
+    if 'traced_per_session_kib' in memory:
+        peaks = ", ".join(f"{action} {stats['peak_kib_mean']}" for action, stats in report['actions'].items())
+        lines.insert(-1, f"Traced: {memory['traced_per_session_kib']} KiB kept per session; rerun peak KiB: {peaks}")
+        if baseline and 'traced_per_session_kib' in baseline['memory']:
+            lines.insert(-1, f"Traced change: {memory['traced_per_session_kib'] - baseline['memory']['traced_per_session_kib']:+.1f} "
+                             f"KiB per session vs rev {baseline.get('git_revision')}")
+    if baseline:
+        base_memory = baseline['memory']
+        lines.append(f"Memory change: {memory['rss_growth_per_session_kib'] - base_memory['rss_growth_per_session_kib']:+.1f} "
+                     f"KiB RSS per session vs {baseline['started_at']} (rev {baseline.get('git_revision')})")
+    for error in report['session_errors']:
+        lines.append(f"Session error: {error}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many concurrent Boostly sessions")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 4,
+                        help="Worker processes running sessions at the same time")
+    parser.add_argument("--iterations", type=int, default=1, help="Send/endorse/redeem rounds per session")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Max seconds for a single rerun")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="SQLite file to use (default: a fresh temporary file)")
+    parser.add_argument("--out", default=os.path.join(HERE, "load_reports"), help="Directory for the JSON report")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Trace Python allocations per session and per rerun (slower)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="boostly-load-"), "boostly.db")
+    report = simulate(args.sessions, args.concurrency, args.iterations, args.timeout, args.seed, db_path,
+                      args.tracemalloc)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {path}")
+
+
+if __name__ == "__main__":
+    main()
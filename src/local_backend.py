@@ -0,0 +1,943 @@
+"""
+Local SQLite backend for Boostly
+A stand-in for the Supabase client that implements the subset of the
+PostgREST query builder and the RPCs db_helper uses, on top of SQLite.
+It lets the app, the load simulator and the scripts run without a Supabase
+project. Select it with BOOSTLY_BACKEND=local (and optionally
+BOOSTLY_LOCAL_DB=<path>, default boostly_local.db).
+
+Every query is counted per caller context (see LocalClient.context), which
+the load simulator uses to report database calls per rerun.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    roll_number TEXT UNIQUE NOT NULL,
+    email TEXT,
+    avatar_url TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_students_updated_at ON students(updated_at, id);
+
+-- Deleted student ids, for incremental sync of the student directory (migration 008)
+CREATE TABLE IF NOT EXISTS student_tombstones (
+    student_id TEXT PRIMARY KEY,
+    deleted_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_student_tombstones_deleted_at ON student_tombstones(deleted_at);
+
+CREATE TABLE IF NOT EXISTS student_credits (
+    id TEXT PRIMARY KEY,
+    student_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    total_credits INTEGER DEFAULT 100 NOT NULL,
+    credits_received INTEGER DEFAULT 0 NOT NULL,
+    credits_sent_this_month INTEGER DEFAULT 0 NOT NULL,
+    monthly_limit INTEGER DEFAULT 100 NOT NULL,
+    month_year TEXT NOT NULL,
+    last_reset_date TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    UNIQUE(student_id, month_year)
+);
+CREATE INDEX IF NOT EXISTS idx_student_credits_month_year ON student_credits(month_year);
+
+CREATE TABLE IF NOT EXISTS credit_transactions (
+    id TEXT PRIMARY KEY,
+    sender_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    receiver_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    amount INTEGER NOT NULL CHECK (amount > 0),
+    message TEXT,
+    transaction_type TEXT DEFAULT 'transfer' CHECK (transaction_type IN ('transfer', 'redemption')),
+    created_at TEXT NOT NULL,
+    CHECK (sender_id != receiver_id)
+);
+CREATE INDEX IF NOT EXISTS idx_credit_transactions_sender_created ON credit_transactions(sender_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_credit_transactions_receiver_created ON credit_transactions(receiver_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_credit_transactions_created_at ON credit_transactions(created_at, id);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    id TEXT PRIMARY KEY,
+    student_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    notification_type TEXT NOT NULL,
+    title TEXT,  -- NULL: rendered from the template on read (migration 011)
+    message TEXT,
+    details TEXT,
+    related_student_id TEXT,
+    related_transaction_id TEXT,
+    is_read INTEGER DEFAULT 0,
+    created_at TEXT NOT NULL,
+    event_count INTEGER DEFAULT 1 NOT NULL,
+    amount INTEGER,
+    related_student_ids TEXT DEFAULT '[]' NOT NULL,
+    related_transaction_ids TEXT DEFAULT '[]' NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_student_created ON notifications(student_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_notifications_student_unread ON notifications(student_id, created_at) WHERE is_read = 0;
+CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON notifications(created_at);
+
+CREATE TABLE IF NOT EXISTS endorsements (
+    id TEXT PRIMARY KEY,
+    endorser_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    endorsee_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    recognition_id TEXT REFERENCES credit_transactions(id) ON DELETE CASCADE,
+    created_at TEXT NOT NULL,
+    CHECK (endorser_id != endorsee_id),
+    UNIQUE(endorser_id, endorsee_id, recognition_id)
+);
+CREATE INDEX IF NOT EXISTS idx_endorsements_endorsee_created ON endorsements(endorsee_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_endorsements_recognition_endorser ON endorsements(recognition_id, endorser_id);
+
+CREATE TABLE IF NOT EXISTS voucher_purchases (
+    id TEXT PRIMARY KEY,
+    student_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    num_vouchers INTEGER NOT NULL CHECK (num_vouchers > 0),
+    credits_per_voucher INTEGER NOT NULL CHECK (credits_per_voucher > 0),
+    total_credits INTEGER NOT NULL CHECK (total_credits > 0),
+    total_value REAL NOT NULL CHECK (total_value > 0),
+    voucher_rate REAL DEFAULT 5.00,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_voucher_purchases_student_created ON voucher_purchases(student_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_voucher_purchases_created_at ON voucher_purchases(created_at, id);
+
+CREATE TABLE IF NOT EXISTS student_redemption_totals (
+    student_id TEXT PRIMARY KEY REFERENCES students(id) ON DELETE CASCADE,
+    credits_redeemed INTEGER DEFAULT 0 NOT NULL,
+    value_redeemed REAL DEFAULT 0 NOT NULL,
+    vouchers_purchased INTEGER DEFAULT 0 NOT NULL,
+    purchases INTEGER DEFAULT 0 NOT NULL,
+    last_purchase_at TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS voucher_codes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    code TEXT UNIQUE NOT NULL,
+    batch_id TEXT NOT NULL,
+    voucher_purchase_id TEXT REFERENCES voucher_purchases(id) ON DELETE SET NULL,
+    student_id TEXT,
+    minted_at TEXT NOT NULL,
+    claimed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_voucher_codes_unclaimed ON voucher_codes(id) WHERE claimed_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_voucher_codes_purchase ON voucher_codes(voucher_purchase_id);
+
+CREATE TABLE IF NOT EXISTS student_monthly_rollups (
+    student_id TEXT NOT NULL,
+    month_year TEXT NOT NULL,
+    credits_sent INTEGER DEFAULT 0 NOT NULL,
+    transfers_sent INTEGER DEFAULT 0 NOT NULL,
+    credits_received INTEGER DEFAULT 0 NOT NULL,
+    transfers_received INTEGER DEFAULT 0 NOT NULL,
+    credits_redeemed INTEGER DEFAULT 0 NOT NULL,
+    value_redeemed REAL DEFAULT 0 NOT NULL,
+    vouchers_purchased INTEGER DEFAULT 0 NOT NULL,
+    endorsements_given INTEGER DEFAULT 0 NOT NULL,
+    endorsements_received INTEGER DEFAULT 0 NOT NULL,
+    PRIMARY KEY (student_id, month_year)
+);
+
+CREATE TABLE IF NOT EXISTS weekly_received_credits (
+    student_id TEXT NOT NULL,
+    week_start TEXT NOT NULL,
+    credits_received INTEGER DEFAULT 0 NOT NULL,
+    PRIMARY KEY (week_start, student_id)
+);
+
+CREATE TABLE IF NOT EXISTS notification_digests (
+    student_id TEXT NOT NULL,
+    month_year TEXT NOT NULL,
+    notification_type TEXT NOT NULL,
+    notifications INTEGER DEFAULT 0 NOT NULL,
+    credits INTEGER DEFAULT 0 NOT NULL,
+    people_count INTEGER DEFAULT 0 NOT NULL,
+    first_at TEXT,
+    last_at TEXT,
+    PRIMARY KEY (student_id, month_year, notification_type)
+);
+
+-- Distinct related students of each digest (a UUID[] column in Postgres)
+CREATE TABLE IF NOT EXISTS notification_digest_people (
+    student_id TEXT NOT NULL,
+    month_year TEXT NOT NULL,
+    notification_type TEXT NOT NULL,
+    person_id TEXT NOT NULL,
+    PRIMARY KEY (student_id, month_year, notification_type, person_id)
+);
+
+-- Rollup triggers (migrations 001 and 004)
+CREATE TRIGGER IF NOT EXISTS rollup_credit_transactions AFTER INSERT ON credit_transactions
+WHEN NEW.transaction_type = 'transfer'
+BEGIN
+    INSERT OR IGNORE INTO student_monthly_rollups (student_id, month_year) VALUES (NEW.sender_id, substr(NEW.created_at, 1, 7));
+    INSERT OR IGNORE INTO student_monthly_rollups (student_id, month_year) VALUES (NEW.receiver_id, substr(NEW.created_at, 1, 7));
+    UPDATE student_monthly_rollups SET credits_sent = credits_sent + NEW.amount, transfers_sent = transfers_sent + 1
+    WHERE student_id = NEW.sender_id AND month_year = substr(NEW.created_at, 1, 7);
+    UPDATE student_monthly_rollups SET credits_received = credits_received + NEW.amount, transfers_received = transfers_received + 1
+    WHERE student_id = NEW.receiver_id AND month_year = substr(NEW.created_at, 1, 7);
+    INSERT OR IGNORE INTO weekly_received_credits (student_id, week_start)
+    VALUES (NEW.receiver_id, date(substr(NEW.created_at, 1, 10), '-6 days', 'weekday 1'));
+    UPDATE weekly_received_credits SET credits_received = credits_received + NEW.amount
+    WHERE student_id = NEW.receiver_id AND week_start = date(substr(NEW.created_at, 1, 10), '-6 days', 'weekday 1');
+END;
+
+CREATE TRIGGER IF NOT EXISTS rollup_voucher_purchases AFTER INSERT ON voucher_purchases
+BEGIN
+    INSERT OR IGNORE INTO student_monthly_rollups (student_id, month_year) VALUES (NEW.student_id, substr(NEW.created_at, 1, 7));
+    UPDATE student_monthly_rollups
+    SET credits_redeemed = credits_redeemed + NEW.total_credits,
+        value_redeemed = value_redeemed + NEW.total_value,
+        vouchers_purchased = vouchers_purchased + NEW.num_vouchers
+    WHERE student_id = NEW.student_id AND month_year = substr(NEW.created_at, 1, 7);
+END;
+
+-- Lifetime redemption totals (migration 010)
+CREATE TRIGGER IF NOT EXISTS add_redemption_totals AFTER INSERT ON voucher_purchases
+BEGIN
+    INSERT OR IGNORE INTO student_redemption_totals (student_id) VALUES (NEW.student_id);
+    UPDATE student_redemption_totals
+    SET credits_redeemed = credits_redeemed + NEW.total_credits,
+        value_redeemed = value_redeemed + NEW.total_value,
+        vouchers_purchased = vouchers_purchased + NEW.num_vouchers,
+        purchases = purchases + 1,
+        last_purchase_at = max(COALESCE(last_purchase_at, ''), NEW.created_at),
+        updated_at = NEW.created_at
+    WHERE student_id = NEW.student_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS rollup_endorsements AFTER INSERT ON endorsements
+BEGIN
+    INSERT OR IGNORE INTO student_monthly_rollups (student_id, month_year) VALUES (NEW.endorser_id, substr(NEW.created_at, 1, 7));
+    INSERT OR IGNORE INTO student_monthly_rollups (student_id, month_year) VALUES (NEW.endorsee_id, substr(NEW.created_at, 1, 7));
+    UPDATE student_monthly_rollups SET endorsements_given = endorsements_given + 1
+    WHERE student_id = NEW.endorser_id AND month_year = substr(NEW.created_at, 1, 7);
+    UPDATE student_monthly_rollups SET endorsements_received = endorsements_received + 1
+    WHERE student_id = NEW.endorsee_id AND month_year = substr(NEW.created_at, 1, 7);
+END;
+
+CREATE TRIGGER IF NOT EXISTS student_tombstone_on_delete AFTER DELETE ON students
+BEGIN
+    INSERT OR REPLACE INTO student_tombstones (student_id, deleted_at)
+    VALUES (OLD.id, strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000+00:00');
+END;
+
+-- Full-text index of transfer messages (migration 012). Each entry also indexes
+-- both students' ids (without dashes) as terms, so a student's matches are one
+-- posting-list intersection. The text is read back through the view (keyed by
+-- the transfer's rowid, which VACUUM may renumber: rebuild the index after one).
+CREATE VIEW IF NOT EXISTS message_search_content AS
+SELECT rowid AS transfer_rowid, message,
+       replace(sender_id, '-', '') || ' ' || replace(receiver_id, '-', '') AS people
+FROM credit_transactions WHERE transaction_type = 'transfer';
+
+CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(
+    message, people, content='message_search_content', content_rowid='transfer_rowid',
+    tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS message_search_insert AFTER INSERT ON credit_transactions
+WHEN NEW.transaction_type = 'transfer'
+BEGIN
+    INSERT INTO message_search (rowid, message, people)
+    VALUES (NEW.rowid, NEW.message, replace(NEW.sender_id, '-', '') || ' ' || replace(NEW.receiver_id, '-', ''));
+END;
+
+CREATE TRIGGER IF NOT EXISTS message_search_delete AFTER DELETE ON credit_transactions
+WHEN OLD.transaction_type = 'transfer'
+BEGIN
+    INSERT INTO message_search (message_search, rowid, message, people)
+    VALUES ('delete', OLD.rowid, OLD.message, replace(OLD.sender_id, '-', '') || ' ' || replace(OLD.receiver_id, '-', ''));
+END;
+"""
+
+# Dropped from searches, as websearch_to_tsquery('english', ...) does in Postgres
+_STOP_WORDS = frozenset(
+    'a about an and are as at be been but by did do for from had has have he her him his how i if in into is it '
+    'its me my no not of on or our she so than that the their them then there they this to too us was we were '
+    'what when where which who whom why will with you your'.split()
+)
+
+# Columns filled in on insert when the caller leaves them out (as Postgres defaults would)
+_UUID_TABLES = {
+    'students', 'student_credits', 'credit_transactions', 'notifications',
+    'endorsements', 'voucher_purchases',
+}
+# updated_at set on insert and update (update_updated_at_column triggers in Postgres)
+_UPDATED_AT_TABLES = {'students', 'student_credits'}
+_BOOLEAN_COLUMNS = {'is_read'}
+_ARRAY_COLUMNS = {'related_student_ids', 'related_transaction_ids'}  # JSON text here, UUID[] in Postgres
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_WORD = re.compile(r'\w+')
+_OPERATORS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+
+class APIError(Exception):
+    """Error raised by a local query, shaped like postgrest's APIError"""
+
+    def __init__(self, message: str, code: str = ''):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class LocalResponse:
+    """Result of execute(): data rows (or a scalar for some RPCs) and an optional count"""
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def now_iso() -> str:
+    """Current UTC time in the ISO format Postgres returns for timestamptz"""
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name):
+        raise APIError(f"Invalid identifier: {name!r}", code='42601')
+    return name
+
+
+def _split_top_level(expr: str) -> List[str]:
+    """Split a PostgREST logic expression on commas outside parentheses and quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in expr:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append(''.join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _parse_logic(expr: str, joiner: str) -> Tuple[str, List[Any]]:
+    """Translate an or=(...) / and(...) PostgREST filter tree into SQL"""
+    clauses, params = [], []
+    for part in _split_top_level(expr):
+        for prefix, inner_joiner in (('and(', ' AND '), ('or(', ' OR ')):
+            if part.startswith(prefix) and part.endswith(')'):
+                sql, inner = _parse_logic(part[len(prefix):-1], inner_joiner)
+                clauses.append(f"({sql})")
+                params.extend(inner)
+                break
+        else:
+            column, op, value = part.split('.', 2)
+            if op not in _OPERATORS:
+                raise APIError(f"Unsupported operator in filter: {op}", code='PGRST100')
+            clauses.append(f"{_identifier(column)} {_OPERATORS[op]} ?")
+            params.append(value[1:-1] if value.startswith('"') and value.endswith('"') else value)
+    return joiner.join(clauses), params
+
+
+def _adapt(value: Any) -> Any:
+    if isinstance(value, bool):
+        return int(value)
+    return json.dumps(value) if isinstance(value, list) else value
+
+
+# =====================================================
+# QUERY BUILDER
+# =====================================================
+
+class LocalQuery:
+    """Chainable query mirroring the postgrest builder methods db_helper uses"""
+
+    def __init__(self, client: "LocalClient", table: str):
+        self._client = client
+        self._table = _identifier(table)
+        self._action = 'select'
+        self._columns = '*'
+        self._count: Optional[str] = None
+        self._payload: Any = None
+        self._where: List[str] = []
+        self._params: List[Any] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+        self._single = False
+
+    # Actions
+    def select(self, columns: str = '*', count: Optional[str] = None) -> "LocalQuery":
+        self._action = 'select'
+        self._columns = ','.join(
+            '*' if c.strip() == '*' else _identifier(c.strip()) for c in columns.split(',')
+        )
+        self._count = count
+        return self
+
+    def insert(self, data: Any) -> "LocalQuery":
+        self._action = 'insert'
+        self._payload = data if isinstance(data, list) else [data]
+        return self
+
+    def update(self, data: Dict[str, Any]) -> "LocalQuery":
+        self._action = 'update'
+        self._payload = data
+        return self
+
+    def delete(self) -> "LocalQuery":
+        self._action = 'delete'
+        return self
+
+    # Filters
+    def _filter(self, column: str, op: str, value: Any) -> "LocalQuery":
+        self._where.append(f"{_identifier(column)} {_OPERATORS[op]} ?")
+        self._params.append(_adapt(value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, 'eq', value)
+
+    def neq(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, 'neq', value)
+
+    def gt(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, 'gt', value)
+
+    def gte(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, 'gte', value)
+
+    def lt(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, 'lt', value)
+
+    def lte(self, column: str, value: Any) -> "LocalQuery":
+        return self._filter(column, 'lte', value)
+
+    def in_(self, column: str, values: Sequence[Any]) -> "LocalQuery":
+        values = list(values)
+        if not values:
+            self._where.append("0")
+            return self
+        self._where.append(f"{_identifier(column)} IN ({','.join('?' * len(values))})")
+        self._params.extend(_adapt(v) for v in values)
+        return self
+
+    def is_(self, column: str, value: Optional[str]) -> "LocalQuery":
+        if value not in (None, 'null'):
+            raise APIError("Only is_(column, 'null') is supported locally", code='PGRST100')
+        self._where.append(f"{_identifier(column)} IS NULL")
+        return self
+
+    def or_(self, filters: str) -> "LocalQuery":
+        sql, params = _parse_logic(filters, ' OR ')
+        self._where.append(f"({sql})")
+        self._params.extend(params)
+        return self
+
+    # Modifiers
+    def order(self, column: str, desc: bool = False) -> "LocalQuery":
+        self._order.append(f"{_identifier(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int) -> "LocalQuery":
+        self._limit = int(size)
+        return self
+
+    def range(self, start: int, end: int) -> "LocalQuery":
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    def single(self) -> "LocalQuery":
+        self._single = True
+        return self
+
+    # Execution
+    def _where_sql(self) -> str:
+        return f" WHERE {' AND '.join(self._where)}" if self._where else ""
+
+    def _build(self) -> Tuple[str, List[Any]]:
+        where = self._where_sql()
+        if self._action == 'select':
+            sql = f"SELECT {self._columns} FROM {self._table}{where}"
+            if self._order:
+                sql += f" ORDER BY {', '.join(self._order)}"
+            if self._limit is not None or self._offset is not None:
+                sql += f" LIMIT {self._limit if self._limit is not None else -1} OFFSET {self._offset or 0}"
+            return sql, list(self._params)
+        if self._action == 'update':
+            if self._table in _UPDATED_AT_TABLES:
+                self._payload = {**self._payload, 'updated_at': now_iso()}
+            assignments = ', '.join(f"{_identifier(c)} = ?" for c in self._payload)
+            values = [_adapt(v) for v in self._payload.values()]
+            return f"UPDATE {self._table} SET {assignments}{where} RETURNING *", values + self._params
+        if self._action == 'delete':
+            return f"DELETE FROM {self._table}{where} RETURNING *", list(self._params)
+        raise APIError(f"Unsupported action: {self._action}")
+
+    def _insert(self, conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        rows = []
+        for record in self._payload:
+            record = dict(record)
+            if self._table in _UUID_TABLES:
+                record.setdefault('id', str(uuid.uuid4()))
+                record.setdefault('created_at', now_iso())
+            if self._table in _UPDATED_AT_TABLES:
+                record.setdefault('updated_at', record['created_at'])
+            names = ', '.join(_identifier(c) for c in record)
+            placeholders = ', '.join('?' * len(record))
+            cursor = conn.execute(
+                f"INSERT INTO {self._table} ({names}) VALUES ({placeholders}) RETURNING *",
+                [_adapt(v) for v in record.values()]
+            )
+            rows.extend(cursor.fetchall())
+        return rows
+
+    def execute(self) -> LocalResponse:
+        def run(conn: sqlite3.Connection) -> LocalResponse:
+            if self._action == 'insert':
+                return LocalResponse(_to_dicts(self._insert(conn)))
+            sql, params = self._build()
+            data = _to_dicts(conn.execute(sql, params).fetchall())
+            count = None
+            if self._count:
+                count = conn.execute(f"SELECT COUNT(*) FROM {self._table}{self._where_sql()}",
+                                     self._params).fetchone()[0]
+            if self._single:
+                if len(data) != 1:
+                    raise APIError("JSON object requested, multiple (or no) rows returned", code='PGRST116')
+                return LocalResponse(data[0], count)
+            return LocalResponse(data, count)
+
+        return self._client.run(run, write=self._action != 'select')
+
+
+class LocalRpc:
+    """Deferred call of a locally implemented database function"""
+
+    def __init__(self, client: "LocalClient", name: str, params: Dict[str, Any]):
+        self._client = client
+        self._name = name
+        self._params = params or {}
+
+    def execute(self) -> LocalResponse:
+        function = RPCS.get(self._name)
+        if function is None:
+            raise APIError(f"Could not find the function {self._name}", code='PGRST202')
+        return self._client.run(lambda conn: LocalResponse(function(conn, **self._params)), write=True)
+
+
+def _to_dicts(rows: List[sqlite3.Row]) -> List[Dict[str, Any]]:
+    if not rows:
+        return []
+    # Every row of a result has the same columns, so decide the conversions once
+    keys = rows[0].keys()
+    booleans = _BOOLEAN_COLUMNS.intersection(keys)
+    arrays = _ARRAY_COLUMNS.intersection(keys)
+    result = [dict(row) for row in rows]
+    if booleans or arrays:
+        for item in result:
+            for column in booleans:
+                item[column] = bool(item[column])
+            for column in arrays:
+                item[column] = json.loads(item[column] or '[]')
+    return result
+
+
+# =====================================================
+# CLIENT
+# =====================================================
+
+class LocalClient:
+    """SQLite-backed replacement for supabase.Client
+
+    One connection is shared by all threads and every statement runs under
+    a lock; writes and RPCs each run in their own transaction.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        search_exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'message_search'").fetchone() is not None
+        self._conn.executescript(SCHEMA)
+        if not search_exists:  # a database created before the index
+            self._conn.execute("INSERT INTO message_search (message_search) VALUES ('rebuild')")
+        self._lock = threading.RLock()
+        # Returns a key (e.g. the Streamlit session) that calls are counted under
+        self.context: Optional[Callable[[], Optional[str]]] = None
+        self.calls: Counter = Counter()
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    def from_(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> LocalRpc:
+        return LocalRpc(self, name, params or {})
+
+    def run(self, func: Callable[[sqlite3.Connection], LocalResponse], write: bool = False) -> LocalResponse:
+        """Run func against the connection, in a transaction when it writes"""
+        key = None
+        if self.context is not None:
+            try:
+                key = self.context()
+            except Exception:
+                key = None
+        with self._lock:
+            self.calls[key] += 1
+            if not write:
+                return func(self._conn)
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self._conn)
+            except sqlite3.IntegrityError as e:
+                self._conn.execute("ROLLBACK")
+                raise APIError(str(e), code='23505' if 'UNIQUE' in str(e) else '23514') from e
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# =====================================================
+# DATABASE FUNCTIONS (RPC)
+# =====================================================
+
+RPCS: Dict[str, Callable[..., Any]] = {}
+
+
+def rpc(name: str):
+    """Register a Python implementation of a database function"""
+    def register(function):
+        RPCS[name] = function
+        return function
+    return register
+
+
+@rpc('mint_voucher_codes')
+def _mint_voucher_codes(conn: sqlite3.Connection, p_count: int) -> int:
+    batch_id, minted_at = str(uuid.uuid4()), now_iso()
+    cursor = conn.executemany(
+        "INSERT OR IGNORE INTO voucher_codes (code, batch_id, minted_at) VALUES (?, ?, ?)",
+        [(f"BST-{uuid.uuid4().hex[:16].upper()}", batch_id, minted_at) for _ in range(int(p_count))]
+    )
+    return cursor.rowcount
+
+
+@rpc('voucher_pool_stats')
+def _voucher_pool_stats(conn: sqlite3.Connection) -> Dict[str, int]:
+    hour_ago = datetime.now(timezone.utc).timestamp() - 3600
+    since = datetime.fromtimestamp(hour_ago, timezone.utc).isoformat(timespec='microseconds')
+    row = conn.execute(
+        "SELECT"
+        " (SELECT COUNT(*) FROM voucher_codes WHERE claimed_at IS NULL),"
+        " (SELECT COUNT(*) FROM voucher_codes WHERE claimed_at > ?),"
+        " (SELECT COUNT(*) FROM voucher_codes WHERE minted_at > ?)",
+        (since, since)
+    ).fetchone()
+    return {'available': row[0], 'claimed_last_hour': row[1], 'minted_last_hour': row[2]}
+
+
+@rpc('redeem_vouchers')
+def _redeem_vouchers(conn: sqlite3.Connection, p_student_id: str, p_num_vouchers: int,
+                     p_credits_per_voucher: int, p_voucher_rate: float = 5.00) -> Dict[str, Any]:
+    total_credits = p_num_vouchers * p_credits_per_voucher
+    credits = conn.execute(
+        "SELECT id, credits_received FROM student_credits WHERE student_id = ? AND month_year = ?",
+        (p_student_id, datetime.now(timezone.utc).strftime('%Y-%m'))
+    ).fetchone()
+    if credits is None or total_credits > credits['credits_received']:
+        raise APIError('Insufficient received credits', code='P0001')
+
+    purchase = _to_dicts(conn.execute(
+        "INSERT INTO voucher_purchases (id, student_id, num_vouchers, credits_per_voucher, total_credits,"
+        " total_value, voucher_rate, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) RETURNING *",
+        (str(uuid.uuid4()), p_student_id, p_num_vouchers, p_credits_per_voucher, total_credits,
+         total_credits * p_voucher_rate, p_voucher_rate, now_iso())
+    ).fetchall())[0]
+    conn.execute(
+        "UPDATE student_credits SET total_credits = total_credits - ?, credits_received = credits_received - ?"
+        " WHERE id = ?", (total_credits, total_credits, credits['id'])
+    )
+    codes = conn.execute(
+        "SELECT id, code FROM voucher_codes WHERE claimed_at IS NULL ORDER BY id LIMIT ?", (p_num_vouchers,)
+    ).fetchall()
+    if len(codes) < p_num_vouchers:
+        raise APIError('Voucher code pool exhausted', code='P0002')
+    conn.executemany(
+        "UPDATE voucher_codes SET claimed_at = ?, voucher_purchase_id = ?, student_id = ? WHERE id = ?",
+        [(now_iso(), purchase['id'], p_student_id, row['id']) for row in codes]
+    )
+    purchase['codes'] = [row['code'] for row in codes]
+    return purchase
+
+
+@rpc('recognition_endorsement_summary')
+def _recognition_endorsement_summary(conn: sqlite3.Connection, p_recognition_ids: List[str],
+                                     p_viewer_id: str) -> List[Dict[str, Any]]:
+    if not p_recognition_ids:
+        return []
+    rows = conn.execute(
+        "SELECT recognition_id, COUNT(*) AS endorsements, MAX(endorser_id = ?) AS endorsed_by_me"
+        f" FROM endorsements WHERE recognition_id IN ({','.join('?' * len(p_recognition_ids))})"
+        " GROUP BY recognition_id",
+        [p_viewer_id, *p_recognition_ids]
+    ).fetchall()
+    return [
+        {'recognition_id': row[0], 'endorsements': row[1], 'endorsed_by_me': bool(row[2])}
+        for row in rows
+    ]
+
+
+@rpc('search_messages')
+def _search_messages(conn: sqlite3.Connection, p_student_id: str, p_query: str,
+                     p_limit: int = 20) -> List[Dict[str, Any]]:
+    terms = [term for term in _WORD.findall(p_query.lower()) if term not in _STOP_WORDS]
+    if not terms:
+        return []
+    match = ' AND '.join([f'message : "{term}"' for term in terms] +
+                         [f'people : "{p_student_id.replace("-", "")}"'])
+    # FTS5's bm25() would read every posting of each term across all students to
+    # weigh it, so the student's matches are scored here instead (BM25 over the
+    # matched terms marked by highlight(); every match contains all the terms)
+    rows = conn.execute(
+        "SELECT t.id, t.sender_id, t.receiver_id, t.amount, t.message, t.created_at,"
+        " highlight(message_search, 0, char(1), '') AS marked"
+        " FROM message_search JOIN credit_transactions t ON t.rowid = message_search.rowid"
+        " WHERE message_search MATCH ?",
+        (match,)
+    ).fetchall()
+    if not rows:
+        return []
+    lengths = [max(1, len(_WORD.findall(row['message']))) for row in rows]
+    average = sum(lengths) / len(lengths)
+    matches = []
+    for row, length in zip(rows, lengths):
+        found = row['marked'].count('\x01')
+        match_row = {key: row[key] for key in ('id', 'sender_id', 'receiver_id', 'amount', 'message', 'created_at')}
+        match_row['rank'] = found * 2.2 / (found + 1.2 * (0.25 + 0.75 * length / average))  # k1 = 1.2, b = 0.75
+        matches.append(match_row)
+    matches.sort(key=lambda item: item['created_at'], reverse=True)
+    matches.sort(key=lambda item: item['rank'], reverse=True)
+    return matches[:int(p_limit)]
+
+
+@rpc('record_notification')  # p_title / p_message are ignored: text is rendered on read (migration 011)
+def _record_notification(conn: sqlite3.Connection, p_student_id: str, p_notification_type: str,
+                         p_title: Optional[str] = None, p_message: Optional[str] = None,
+                         p_details: Optional[str] = None,
+                         p_related_student_id: Optional[str] = None,
+                         p_related_transaction_id: Optional[str] = None,
+                         p_amount: Optional[int] = None, p_window_seconds: int = 300) -> List[Dict[str, Any]]:
+    since = datetime.fromtimestamp(datetime.now(timezone.utc).timestamp() - p_window_seconds,
+                                   timezone.utc).isoformat(timespec='microseconds')
+    existing = conn.execute(
+        "SELECT * FROM notifications WHERE student_id = ? AND notification_type = ? AND is_read = 0"
+        " AND created_at > ? ORDER BY created_at DESC LIMIT 1",
+        (p_student_id, p_notification_type, since)
+    ).fetchone()
+    if existing is None:
+        return _to_dicts(conn.execute(
+            "INSERT INTO notifications (id, student_id, notification_type, details,"
+            " related_student_id, related_transaction_id, is_read, created_at, event_count, amount,"
+            " related_student_ids, related_transaction_ids) VALUES (?, ?, ?, ?, ?, ?, 0, ?, 1, ?, ?, ?)"
+            " RETURNING *",
+            (str(uuid.uuid4()), p_student_id, p_notification_type, p_details,
+             p_related_student_id, p_related_transaction_id, now_iso(), p_amount,
+             json.dumps([p_related_student_id] if p_related_student_id else []),
+             json.dumps([p_related_transaction_id] if p_related_transaction_id else []))
+        ).fetchall())
+
+    people = json.loads(existing['related_student_ids']) or [existing['related_student_id']]
+    people = [person for person in people if person and person != p_related_student_id]
+    if p_related_student_id:
+        people.append(p_related_student_id)
+    transactions = json.loads(existing['related_transaction_ids']) or [existing['related_transaction_id']]
+    transactions = [t for t in transactions + [p_related_transaction_id] if t]
+    amount = None if p_amount is None and existing['amount'] is None else (existing['amount'] or 0) + (p_amount or 0)
+    return _to_dicts(conn.execute(
+        "UPDATE notifications SET event_count = event_count + 1, amount = ?, related_student_ids = ?,"
+        " related_transaction_ids = ?, related_student_id = ?, related_transaction_id = ?,"
+        " details = COALESCE(?, details), title = NULL, message = NULL, created_at = ? WHERE id = ? RETURNING *",
+        (amount, json.dumps(people), json.dumps(transactions), p_related_student_id,
+         p_related_transaction_id, p_details, now_iso(), existing['id'])
+    ).fetchall())
+
+
+@rpc('compact_notifications')
+def _compact_notifications(conn: sqlite3.Connection, p_older_than: str, p_batch_size: int = 1000) -> int:
+    batch = conn.execute(
+        "SELECT n.id, n.student_id, substr(n.created_at, 1, 7) AS month_year, n.notification_type,"
+        " n.related_student_id, n.related_student_ids, n.event_count, n.created_at,"
+        " COALESCE(n.amount, t.amount, 0) AS amount"
+        " FROM notifications n LEFT JOIN credit_transactions t ON t.id = n.related_transaction_id"
+        " WHERE n.created_at < ? ORDER BY n.created_at LIMIT ?",
+        (p_older_than, int(p_batch_size))
+    ).fetchall()
+    for row in batch:
+        key = (row['student_id'], row['month_year'], row['notification_type'])
+        conn.execute(
+            "INSERT OR IGNORE INTO notification_digests (student_id, month_year, notification_type, first_at, last_at)"
+            " VALUES (?, ?, ?, ?, ?)", (*key, row['created_at'], row['created_at'])
+        )
+        people = set(json.loads(row['related_student_ids'] or '[]'))
+        if row['related_student_id']:
+            people.add(row['related_student_id'])
+        conn.executemany("INSERT OR IGNORE INTO notification_digest_people VALUES (?, ?, ?, ?)",
+                         [(*key, person) for person in people])
+        conn.execute(
+            "UPDATE notification_digests SET notifications = notifications + ?, credits = credits + ?,"
+            " people_count = (SELECT COUNT(*) FROM notification_digest_people p WHERE p.student_id = ?"
+            " AND p.month_year = ? AND p.notification_type = ?),"
+            " first_at = MIN(first_at, ?), last_at = MAX(last_at, ?)"
+            " WHERE student_id = ? AND month_year = ? AND notification_type = ?",
+            (row['event_count'], row['amount'], *key, row['created_at'], row['created_at'], *key)
+        )
+    conn.executemany("DELETE FROM notifications WHERE id = ?", [(row['id'],) for row in batch])
+    return len(batch)
+
+
+
+@rpc('send_credits_multi')
+def _send_credits_multi(conn: sqlite3.Connection, p_sender_id: str, p_receiver_ids: List[str],
+                        p_amounts: List[int], p_message: Optional[str] = None,
+                        p_coalesce_seconds: int = 0) -> List[Dict[str, Any]]:
+    receivers = [str(r) for r in p_receiver_ids or []]
+    if not receivers or len(receivers) != len(p_amounts or []):
+        raise APIError('Every recipient needs exactly one amount', code='22023')
+    if str(p_sender_id) in receivers:
+        raise APIError('Cannot send credits to yourself', code='22023')
+    if len(set(receivers)) < len(receivers):
+        raise APIError('Duplicate recipient', code='22023')
+    if any(amount is None or amount <= 0 for amount in p_amounts):
+        raise APIError('Amounts must be positive', code='22023')
+    known = conn.execute(f"SELECT COUNT(*) FROM students WHERE id IN ({','.join('?' * len(receivers))})",
+                         receivers).fetchone()[0]
+    if known < len(receivers):
+        raise APIError('Unknown recipient', code='22023')
+
+    total = sum(p_amounts)
+    month_year = datetime.now(timezone.utc).strftime('%Y-%m')
+    credits = conn.execute(
+        "SELECT id, total_credits, credits_sent_this_month, monthly_limit FROM student_credits"
+        " WHERE student_id = ? AND month_year = ?", (p_sender_id, month_year)
+    ).fetchone()
+    if credits is None:
+        raise APIError('Sender credits not found', code='P0001')
+    if credits['credits_sent_this_month'] + total > credits['monthly_limit']:
+        raise APIError('Monthly sending limit exceeded', code='P0001')
+    if total > credits['total_credits']:
+        raise APIError('Insufficient credits', code='P0001')
+
+    conn.execute(
+        "UPDATE student_credits SET total_credits = total_credits - ?,"
+        " credits_sent_this_month = credits_sent_this_month + ? WHERE id = ?", (total, total, credits['id'])
+    )
+    conn.executemany(
+        "INSERT INTO student_credits (id, student_id, total_credits, credits_received, credits_sent_this_month,"
+        " monthly_limit, month_year, created_at) VALUES (?, ?, 100 + ?, ?, 0, 100, ?, ?)"
+        " ON CONFLICT (student_id, month_year) DO UPDATE SET"
+        " total_credits = total_credits + excluded.credits_received,"
+        " credits_received = credits_received + excluded.credits_received",
+        [(str(uuid.uuid4()), receiver, amount, amount, month_year, now_iso())
+         for receiver, amount in zip(receivers, p_amounts)]
+    )
+    transactions = []
+    for receiver, amount in zip(receivers, p_amounts):
+        transactions.extend(_to_dicts(conn.execute(
+            "INSERT INTO credit_transactions (id, sender_id, receiver_id, amount, message, transaction_type,"
+            " created_at) VALUES (?, ?, ?, ?, ?, 'transfer', ?) RETURNING *",
+            (str(uuid.uuid4()), p_sender_id, receiver, amount, p_message, now_iso())
+        ).fetchall()))
+
+    # One notification per receiver, one summary for the sender (templates, rendered on read)
+    for transaction in transactions:
+        if p_coalesce_seconds > 0:
+            _record_notification(conn, transaction['receiver_id'], 'credits_received', None, None, p_message,
+                                 p_sender_id, transaction['id'], transaction['amount'], p_coalesce_seconds)
+        else:
+            conn.execute(
+                "INSERT INTO notifications (id, student_id, notification_type, details,"
+                " related_student_id, related_transaction_id, is_read, created_at, event_count, amount,"
+                " related_student_ids, related_transaction_ids)"
+                " VALUES (?, ?, 'credits_received', ?, ?, ?, 0, ?, 1, ?, ?, ?)",
+                (str(uuid.uuid4()), transaction['receiver_id'], p_message, p_sender_id,
+                 transaction['id'], now_iso(), transaction['amount'],
+                 json.dumps([p_sender_id]), json.dumps([transaction['id']]))
+            )
+    transaction_ids = [transaction['id'] for transaction in transactions]
+    conn.execute(
+        "INSERT INTO notifications (id, student_id, notification_type, details,"
+        " related_student_id, related_transaction_id, is_read, created_at, event_count, amount,"
+        " related_student_ids, related_transaction_ids)"
+        " VALUES (?, ?, 'credits_sent', ?, ?, ?, 0, ?, ?, ?, ?, ?)",
+        (str(uuid.uuid4()), p_sender_id, p_message, receivers[-1], transaction_ids[-1], now_iso(),
+         len(receivers), total, json.dumps(receivers), json.dumps(transaction_ids))
+    )
+    return transactions
+
+
+# =====================================================
+# SETUP
+# =====================================================
+
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Isha", "Kabir", "Meera", "Arjun", "Diya",
+               "Sarah", "Michael", "Emma", "David", "Lisa", "Alex", "James", "Olivia", "Noah", "Zara"]
+LAST_NAMES = ["Sharma", "Patel", "Gupta", "Singh", "Reddy", "Iyer", "Khan", "Das", "Mehta", "Nair",
+              "Johnson", "Chen", "Wilson", "Martinez", "Anderson", "Thompson", "Brown", "Davis"]
+
+
+def seed(client: LocalClient, num_students: int, voucher_codes: int = 1000,
+         roll_prefix: str = "2K22/LT/", credits_received: int = 0) -> List[Dict[str, Any]]:
+    """Create num_students students with this month's credits and a voucher pool
+
+    Existing students with the same roll numbers are reused, so seeding an
+    existing database file is idempotent. Returns the students.
+    """
+    month_year = datetime.now(timezone.utc).strftime('%Y-%m')
+    students = []
+    for i in range(num_students):
+        roll = f"{roll_prefix}{i:04d}"
+        found = client.table('students').select('*').eq('roll_number', roll).execute().data
+        if found:
+            students.append(found[0])
+            continue
+        name = f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+        student = client.table('students').insert({'name': name, 'roll_number': roll}).execute().data[0]
+        client.table('student_credits').insert({
+            'student_id': student['id'], 'total_credits': 100 + credits_received,
+            'credits_received': credits_received,
+            'credits_sent_this_month': 0, 'monthly_limit': 100, 'month_year': month_year,
+        }).execute()
+        students.append(student)
+    if voucher_codes:
+        client.rpc('mint_voucher_codes', {'p_count': voucher_codes}).execute()
+    return students
+
+
+def create_local_client(path: str = 'boostly_local.db') -> LocalClient:
+    """Open (creating if needed) a local database with the Boostly schema"""
+    return LocalClient(path)
@@ -0,0 +1,217 @@
+-- =====================================================
+-- Migration 001: Monthly per-student rollups
+-- =====================================================
+-- Per-month, per-student totals for sent, received, redeemed and
+-- endorsements, maintained incrementally by triggers on every insert.
+-- refresh_monthly_rollups() rebuilds a month from the raw tables and can be
+-- scheduled (see bottom of file) to repair any drift.
+-- Run after database_schema.sql in the Supabase SQL Editor.
+
+-- =====================================================
+-- 1. ROLLUP TABLE
+-- =====================================================
+CREATE TABLE IF NOT EXISTS student_monthly_rollups (
+    student_id UUID NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    month_year VARCHAR(7) NOT NULL, -- Format: 'YYYY-MM'
+    credits_sent INTEGER DEFAULT 0 NOT NULL,
+    transfers_sent INTEGER DEFAULT 0 NOT NULL,
+    credits_received INTEGER DEFAULT 0 NOT NULL,
+    transfers_received INTEGER DEFAULT 0 NOT NULL,
+    credits_redeemed INTEGER DEFAULT 0 NOT NULL,
+    value_redeemed DECIMAL(12, 2) DEFAULT 0 NOT NULL,
+    vouchers_purchased INTEGER DEFAULT 0 NOT NULL,
+    endorsements_given INTEGER DEFAULT 0 NOT NULL,
+    endorsements_received INTEGER DEFAULT 0 NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (student_id, month_year)
+);
+
+CREATE INDEX IF NOT EXISTS idx_monthly_rollups_month ON student_monthly_rollups(month_year);
+
+ALTER TABLE student_monthly_rollups ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Monthly rollups are viewable by everyone" ON student_monthly_rollups;
+CREATE POLICY "Monthly rollups are viewable by everyone"
+    ON student_monthly_rollups FOR SELECT
+    USING (true);
+
+-- =====================================================
+-- 2. INCREMENTAL MAINTENANCE
+-- =====================================================
+
+-- Add deltas to one student's month, creating the row on first use
+CREATE OR REPLACE FUNCTION bump_monthly_rollup(
+    p_student_id UUID,
+    p_month_year VARCHAR(7),
+    p_credits_sent INTEGER DEFAULT 0,
+    p_transfers_sent INTEGER DEFAULT 0,
+    p_credits_received INTEGER DEFAULT 0,
+    p_transfers_received INTEGER DEFAULT 0,
+    p_credits_redeemed INTEGER DEFAULT 0,
+    p_value_redeemed DECIMAL DEFAULT 0,
+    p_vouchers_purchased INTEGER DEFAULT 0,
+    p_endorsements_given INTEGER DEFAULT 0,
+    p_endorsements_received INTEGER DEFAULT 0
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO student_monthly_rollups AS r (
+        student_id, month_year, credits_sent, transfers_sent, credits_received,
+        transfers_received, credits_redeemed, value_redeemed, vouchers_purchased,
+        endorsements_given, endorsements_received
+    ) VALUES (
+        p_student_id, p_month_year, p_credits_sent, p_transfers_sent, p_credits_received,
+        p_transfers_received, p_credits_redeemed, p_value_redeemed, p_vouchers_purchased,
+        p_endorsements_given, p_endorsements_received
+    )
+    ON CONFLICT (student_id, month_year) DO UPDATE SET
+        credits_sent = r.credits_sent + EXCLUDED.credits_sent,
+        transfers_sent = r.transfers_sent + EXCLUDED.transfers_sent,
+        credits_received = r.credits_received + EXCLUDED.credits_received,
+        transfers_received = r.transfers_received + EXCLUDED.transfers_received,
+        credits_redeemed = r.credits_redeemed + EXCLUDED.credits_redeemed,
+        value_redeemed = r.value_redeemed + EXCLUDED.value_redeemed,
+        vouchers_purchased = r.vouchers_purchased + EXCLUDED.vouchers_purchased,
+        endorsements_given = r.endorsements_given + EXCLUDED.endorsements_given,
+        endorsements_received = r.endorsements_received + EXCLUDED.endorsements_received,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Only the rollup triggers below (SECURITY DEFINER, so they run as the owner)
+-- may add deltas; through the API anyone could inflate any student's rollups
+REVOKE EXECUTE ON FUNCTION bump_monthly_rollup(UUID, VARCHAR, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, DECIMAL, INTEGER, INTEGER, INTEGER) FROM PUBLIC;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN  -- Supabase API roles
+        REVOKE EXECUTE ON FUNCTION bump_monthly_rollup(UUID, VARCHAR, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, DECIMAL, INTEGER, INTEGER, INTEGER) FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION bump_monthly_rollup(UUID, VARCHAR, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, DECIMAL, INTEGER, INTEGER, INTEGER) TO service_role;
+    END IF;
+END $$;
+
+CREATE OR REPLACE FUNCTION rollup_credit_transaction()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_month VARCHAR(7) := TO_CHAR(NEW.created_at, 'YYYY-MM');
+BEGIN
+    IF NEW.transaction_type = 'transfer' THEN
+        PERFORM bump_monthly_rollup(NEW.sender_id, v_month, p_credits_sent => NEW.amount, p_transfers_sent => 1);
+        PERFORM bump_monthly_rollup(NEW.receiver_id, v_month, p_credits_received => NEW.amount, p_transfers_received => 1);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION rollup_voucher_purchase()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM bump_monthly_rollup(
+        NEW.student_id, TO_CHAR(NEW.created_at, 'YYYY-MM'),
+        p_credits_redeemed => NEW.total_credits,
+        p_value_redeemed => NEW.total_value,
+        p_vouchers_purchased => NEW.num_vouchers
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION rollup_endorsement()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_month VARCHAR(7) := TO_CHAR(NEW.created_at, 'YYYY-MM');
+BEGIN
+    PERFORM bump_monthly_rollup(NEW.endorser_id, v_month, p_endorsements_given => 1);
+    PERFORM bump_monthly_rollup(NEW.endorsee_id, v_month, p_endorsements_received => 1);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS rollup_credit_transactions ON credit_transactions;
+CREATE TRIGGER rollup_credit_transactions
+    AFTER INSERT ON credit_transactions
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_credit_transaction();
+
+DROP TRIGGER IF EXISTS rollup_voucher_purchases ON voucher_purchases;
+CREATE TRIGGER rollup_voucher_purchases
+    AFTER INSERT ON voucher_purchases
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_voucher_purchase();
+
+DROP TRIGGER IF EXISTS rollup_endorsements ON endorsements;
+CREATE TRIGGER rollup_endorsements
+    AFTER INSERT ON endorsements
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_endorsement();
+
+-- =====================================================
+-- 3. FULL REFRESH (backfill / scheduled repair)
+-- =====================================================
+
+-- Rebuild rollups for one month ('YYYY-MM'), or for all months when NULL
+CREATE OR REPLACE FUNCTION refresh_monthly_rollups(p_month_year VARCHAR(7) DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    DELETE FROM student_monthly_rollups
+    WHERE p_month_year IS NULL OR month_year = p_month_year;
+
+    INSERT INTO student_monthly_rollups (
+        student_id, month_year, credits_sent, transfers_sent, credits_received,
+        transfers_received, credits_redeemed, value_redeemed, vouchers_purchased,
+        endorsements_given, endorsements_received
+    )
+    SELECT
+        student_id, month_year,
+        SUM(credits_sent), SUM(transfers_sent), SUM(credits_received),
+        SUM(transfers_received), SUM(credits_redeemed), SUM(value_redeemed),
+        SUM(vouchers_purchased), SUM(endorsements_given), SUM(endorsements_received)
+    FROM (
+        SELECT sender_id AS student_id, TO_CHAR(created_at, 'YYYY-MM') AS month_year,
+               amount AS credits_sent, 1 AS transfers_sent, 0 AS credits_received, 0 AS transfers_received,
+               0 AS credits_redeemed, 0::DECIMAL AS value_redeemed, 0 AS vouchers_purchased,
+               0 AS endorsements_given, 0 AS endorsements_received
+        FROM credit_transactions WHERE transaction_type = 'transfer'
+        UNION ALL
+        SELECT receiver_id, TO_CHAR(created_at, 'YYYY-MM'), 0, 0, amount, 1, 0, 0, 0, 0, 0
+        FROM credit_transactions WHERE transaction_type = 'transfer'
+        UNION ALL
+        SELECT student_id, TO_CHAR(created_at, 'YYYY-MM'), 0, 0, 0, 0, total_credits, total_value, num_vouchers, 0, 0
+        FROM voucher_purchases
+        UNION ALL
+        SELECT endorser_id, TO_CHAR(created_at, 'YYYY-MM'), 0, 0, 0, 0, 0, 0, 0, 1, 0
+        FROM endorsements
+        UNION ALL
+        SELECT endorsee_id, TO_CHAR(created_at, 'YYYY-MM'), 0, 0, 0, 0, 0, 0, 0, 0, 1
+        FROM endorsements
+    ) AS events
+    WHERE p_month_year IS NULL OR month_year = p_month_year
+    GROUP BY student_id, month_year;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- It deletes and rebuilds whole months, so only the service role (and pg_cron,
+-- which runs as the owner) may call it
+REVOKE EXECUTE ON FUNCTION refresh_monthly_rollups(VARCHAR) FROM PUBLIC;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN  -- Supabase API roles
+        REVOKE EXECUTE ON FUNCTION refresh_monthly_rollups(VARCHAR) FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION refresh_monthly_rollups(VARCHAR) TO service_role;
+    END IF;
+END $$;
+
+-- Backfill existing history once
+SELECT refresh_monthly_rollups();
+
+-- Optional: nightly repair of the current month with pg_cron
+-- (Database > Extensions > pg_cron in Supabase)
+-- SELECT cron.schedule(
+--     'refresh-monthly-rollups',
+--     '15 3 * * *',
+--     $$SELECT refresh_monthly_rollups(TO_CHAR(NOW(), 'YYYY-MM'))$$
+-- );
@@ -0,0 +1,142 @@
+-- =====================================================
+-- Migration 002: Pre-minted voucher code inventory
+-- =====================================================
+-- Unique redeemable codes are minted ahead of time in batches by a
+-- background job (voucher_inventory.py), so a purchase never generates or
+-- checks codes on the hot path. redeem_vouchers() validates the balance,
+-- records the purchase, deducts credits and claims N codes with
+-- FOR UPDATE SKIP LOCKED in one transaction and one round trip.
+
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+-- =====================================================
+-- 1. CODE POOL
+-- =====================================================
+CREATE TABLE IF NOT EXISTS voucher_codes (
+    id BIGSERIAL PRIMARY KEY,
+    code VARCHAR(32) UNIQUE NOT NULL,
+    batch_id UUID NOT NULL,
+    voucher_purchase_id UUID REFERENCES voucher_purchases(id) ON DELETE SET NULL,
+    student_id UUID REFERENCES students(id) ON DELETE SET NULL,
+    minted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    claimed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Unclaimed codes in mint order: claims read the head of this index
+CREATE INDEX IF NOT EXISTS idx_voucher_codes_unclaimed ON voucher_codes(id) WHERE claimed_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_voucher_codes_purchase ON voucher_codes(voucher_purchase_id);
+
+ALTER TABLE voucher_codes ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own voucher codes" ON voucher_codes;
+-- Apps using the anon key open claimed codes up with fix_rls_quick.sql
+CREATE POLICY "Users can view their own voucher codes"
+    ON voucher_codes FOR SELECT
+    USING (auth.uid()::text = student_id::text);
+
+-- =====================================================
+-- 2. MINTING (background job)
+-- =====================================================
+
+-- Mint up to p_count new unique codes as one batch, returning how many were added
+CREATE OR REPLACE FUNCTION mint_voucher_codes(p_count INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_batch UUID := gen_random_uuid();
+    v_rows INTEGER;
+BEGIN
+    INSERT INTO voucher_codes (code, batch_id)
+    SELECT 'BST-' || UPPER(ENCODE(gen_random_bytes(8), 'hex')), v_batch
+    FROM generate_series(1, p_count)
+    ON CONFLICT (code) DO NOTHING;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Only the service role may mint: run voucher_inventory.py with SUPABASE_KEY
+-- set to the service_role key
+REVOKE EXECUTE ON FUNCTION mint_voucher_codes(INTEGER) FROM PUBLIC;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN  -- Supabase API roles
+        REVOKE EXECUTE ON FUNCTION mint_voucher_codes(INTEGER) FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION mint_voucher_codes(INTEGER) TO service_role;
+    END IF;
+END $$;
+
+-- Pool depth and recent throughput for monitoring and refill decisions
+-- (left executable by the app's key: the admin page shows it, and it only returns counts)
+CREATE OR REPLACE FUNCTION voucher_pool_stats()
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'available', (SELECT COUNT(*) FROM voucher_codes WHERE claimed_at IS NULL),
+        'claimed_last_hour', (SELECT COUNT(*) FROM voucher_codes WHERE claimed_at > NOW() - INTERVAL '1 hour'),
+        'minted_last_hour', (SELECT COUNT(*) FROM voucher_codes WHERE minted_at > NOW() - INTERVAL '1 hour')
+    );
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- =====================================================
+-- 3. ATOMIC REDEMPTION (hot path)
+-- =====================================================
+
+-- Redeem credits for p_num_vouchers vouchers and claim one code per voucher.
+-- Raises (and rolls back everything) on insufficient credits or an empty pool.
+CREATE OR REPLACE FUNCTION redeem_vouchers(
+    p_student_id UUID,
+    p_num_vouchers INTEGER,
+    p_credits_per_voucher INTEGER,
+    p_voucher_rate DECIMAL DEFAULT 5.00
+)
+RETURNS JSONB AS $$
+DECLARE
+    v_total_credits INTEGER := p_num_vouchers * p_credits_per_voucher;
+    v_credits student_credits%ROWTYPE;
+    v_purchase voucher_purchases%ROWTYPE;
+    v_codes TEXT[];
+BEGIN
+    SELECT * INTO v_credits
+    FROM student_credits
+    WHERE student_id = p_student_id AND month_year = TO_CHAR(NOW(), 'YYYY-MM')
+    FOR UPDATE;
+
+    IF NOT FOUND OR v_total_credits > v_credits.credits_received THEN
+        RAISE EXCEPTION 'Insufficient received credits' USING ERRCODE = 'P0001';
+    END IF;
+
+    INSERT INTO voucher_purchases (student_id, num_vouchers, credits_per_voucher, total_credits, total_value, voucher_rate)
+    VALUES (p_student_id, p_num_vouchers, p_credits_per_voucher, v_total_credits,
+            v_total_credits * p_voucher_rate, p_voucher_rate)
+    RETURNING * INTO v_purchase;
+
+    UPDATE student_credits
+    SET total_credits = total_credits - v_total_credits,
+        credits_received = credits_received - v_total_credits
+    WHERE id = v_credits.id;
+
+    WITH picked AS (
+        SELECT id FROM voucher_codes
+        WHERE claimed_at IS NULL
+        ORDER BY id
+        LIMIT p_num_vouchers
+        FOR UPDATE SKIP LOCKED
+    ), claimed AS (
+        UPDATE voucher_codes c
+        SET claimed_at = NOW(), voucher_purchase_id = v_purchase.id, student_id = p_student_id
+        FROM picked
+        WHERE c.id = picked.id
+        RETURNING c.id, c.code
+    )
+    SELECT ARRAY_AGG(code ORDER BY id) INTO v_codes FROM claimed;
+
+    IF COALESCE(ARRAY_LENGTH(v_codes, 1), 0) < p_num_vouchers THEN
+        RAISE EXCEPTION 'Voucher code pool exhausted' USING ERRCODE = 'P0002';
+    END IF;
+
+    RETURN to_jsonb(v_purchase) || jsonb_build_object('codes', to_jsonb(v_codes));
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Seed the pool so purchases work before the job's first run
+SELECT mint_voucher_codes(1000);
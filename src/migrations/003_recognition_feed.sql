@@ -0,0 +1,25 @@
+-- =====================================================
+-- Migration 003: Recognition feed endorsement summary
+-- =====================================================
+-- Endorsement counts and "endorsed by me" flags for a whole page of
+-- recognitions (credit_transactions) in one grouped aggregate, instead of
+-- one query per feed entry.
+
+-- Serves the per-recognition aggregate from the index alone
+CREATE INDEX IF NOT EXISTS idx_endorsements_recognition_endorser
+    ON endorsements(recognition_id, endorser_id)
+    WHERE recognition_id IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION recognition_endorsement_summary(
+    p_recognition_ids UUID[],
+    p_viewer_id UUID
+)
+RETURNS TABLE (recognition_id UUID, endorsements BIGINT, endorsed_by_me BOOLEAN) AS $$
+    SELECT
+        e.recognition_id,
+        COUNT(*) AS endorsements,
+        BOOL_OR(e.endorser_id = p_viewer_id) AS endorsed_by_me
+    FROM endorsements e
+    WHERE e.recognition_id = ANY(p_recognition_ids)
+    GROUP BY e.recognition_id;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,48 @@
+-- =====================================================
+-- Migration 004: Weekly received-credit buckets
+-- =====================================================
+-- Credits received per student per ISO week, kept current by a trigger on
+-- credit_transactions. Together with student_monthly_rollups (migration 001)
+-- these feed the weekly, monthly and term leaderboards, so a leaderboard
+-- load reads one row per active student instead of scanning transactions.
+
+CREATE TABLE IF NOT EXISTS weekly_received_credits (
+    student_id UUID NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    week_start DATE NOT NULL, -- Monday of the ISO week
+    credits_received INTEGER DEFAULT 0 NOT NULL,
+    PRIMARY KEY (week_start, student_id)
+);
+
+ALTER TABLE weekly_received_credits ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Weekly received credits are viewable by everyone" ON weekly_received_credits;
+CREATE POLICY "Weekly received credits are viewable by everyone"
+    ON weekly_received_credits FOR SELECT
+    USING (true);
+
+CREATE OR REPLACE FUNCTION bump_weekly_received_credits()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.transaction_type = 'transfer' THEN
+        INSERT INTO weekly_received_credits AS w (student_id, week_start, credits_received)
+        VALUES (NEW.receiver_id, DATE_TRUNC('week', NEW.created_at)::DATE, NEW.amount)
+        ON CONFLICT (week_start, student_id) DO UPDATE
+        SET credits_received = w.credits_received + EXCLUDED.credits_received;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS weekly_received_credits_on_transfer ON credit_transactions;
+CREATE TRIGGER weekly_received_credits_on_transfer
+    AFTER INSERT ON credit_transactions
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_weekly_received_credits();
+
+-- Backfill existing history once
+INSERT INTO weekly_received_credits (student_id, week_start, credits_received)
+SELECT receiver_id, DATE_TRUNC('week', created_at)::DATE, SUM(amount)
+FROM credit_transactions
+WHERE transaction_type = 'transfer'
+GROUP BY receiver_id, DATE_TRUNC('week', created_at)::DATE
+ON CONFLICT (week_start, student_id) DO NOTHING;
@@ -0,0 +1,80 @@
+-- =====================================================
+-- Migration 005: Composite indexes for the hot queries
+-- =====================================================
+-- The hot reads filter on one column and order by another: a student's
+-- notifications, transfers sent and received, and voucher purchases, all
+-- newest first. Single-column indexes make Postgres fetch every matching row
+-- and sort it; an index on (filter column, created_at DESC, id DESC) returns
+-- the rows already ordered, so a LIMIT stops after the first page and the
+-- (created_at, id) keyset streams in export_history.py need no sort either.
+--
+-- The single-column indexes these replace are dropped: each is a prefix of
+-- a new index (or of a UNIQUE constraint) and only costs write time.
+--
+-- Check the plans with explain_check.py after applying.
+-- On a large live table, run each CREATE INDEX on its own as
+-- CREATE INDEX CONCURRENTLY (outside a transaction) to avoid blocking writes.
+
+-- =====================================================
+-- 1. NOTIFICATIONS
+-- =====================================================
+
+-- get_notifications: WHERE student_id = ? ORDER BY created_at DESC LIMIT ?
+CREATE INDEX IF NOT EXISTS idx_notifications_student_created
+    ON notifications(student_id, created_at DESC, id DESC);
+
+-- count_unread_notifications: only unread rows are indexed, so the index
+-- stays small however much history a student keeps
+CREATE INDEX IF NOT EXISTS idx_notifications_student_unread
+    ON notifications(student_id, created_at DESC)
+    WHERE is_read = FALSE;
+
+DROP INDEX IF EXISTS idx_notifications_student_id;
+DROP INDEX IF EXISTS idx_notifications_is_read; -- a boolean on its own never narrows a scan
+
+-- =====================================================
+-- 2. CREDIT TRANSACTIONS
+-- =====================================================
+
+-- get_credit_transactions / count_credit_transactions, sent and received
+CREATE INDEX IF NOT EXISTS idx_credit_transactions_sender_created
+    ON credit_transactions(sender_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_credit_transactions_receiver_created
+    ON credit_transactions(receiver_id, created_at DESC, id DESC);
+
+-- get_recognition_feed keyset pages: ORDER BY created_at DESC, id DESC
+-- (read backwards by the full-table (created_at, id) export)
+CREATE INDEX IF NOT EXISTS idx_credit_transactions_created_id
+    ON credit_transactions(created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS idx_credit_transactions_sender;
+DROP INDEX IF EXISTS idx_credit_transactions_receiver;
+DROP INDEX IF EXISTS idx_credit_transactions_created_at;
+
+-- =====================================================
+-- 3. ENDORSEMENTS
+-- =====================================================
+
+-- check_endorsement_exists (endorser_id, endorsee_id) is already served by
+-- the UNIQUE (endorser_id, endorsee_id, recognition_id) index, which also
+-- makes the endorser_id index redundant.
+DROP INDEX IF EXISTS idx_endorsements_endorser;
+
+-- get_endorsements_received and a student's (created_at, id) export
+CREATE INDEX IF NOT EXISTS idx_endorsements_endorsee_created
+    ON endorsements(endorsee_id, created_at, id);
+
+DROP INDEX IF EXISTS idx_endorsements_endorsee;
+
+-- =====================================================
+-- 4. VOUCHER PURCHASES AND CREDITS
+-- =====================================================
+
+-- get_voucher_purchases: WHERE student_id = ? ORDER BY created_at DESC LIMIT ?
+CREATE INDEX IF NOT EXISTS idx_voucher_purchases_student_created
+    ON voucher_purchases(student_id, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS idx_voucher_purchases_student;
+
+-- get_student_credits uses the UNIQUE (student_id, month_year) index
+DROP INDEX IF EXISTS idx_student_credits_student_id;
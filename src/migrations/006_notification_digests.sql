@@ -0,0 +1,118 @@
+-- =====================================================
+-- Migration 006: Notification retention and monthly digests
+-- =====================================================
+-- Notifications older than the retention age are folded into one digest row
+-- per student, month and notification type ("You received 42 credits from
+-- 7 people in March") and deleted, so the notifications table only holds
+-- recent history. compact_notifications() handles one bounded batch per
+-- call (one short transaction); notification_retention.py calls it until
+-- nothing older than the cutoff is left.
+
+-- =====================================================
+-- 1. DIGEST TABLE
+-- =====================================================
+CREATE TABLE IF NOT EXISTS notification_digests (
+    student_id UUID NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    month_year VARCHAR(7) NOT NULL, -- Format: 'YYYY-MM'
+    notification_type VARCHAR(50) NOT NULL,
+    notifications INTEGER DEFAULT 0 NOT NULL,  -- originals folded in
+    credits INTEGER DEFAULT 0 NOT NULL,        -- sum of the related transfers
+    people UUID[] DEFAULT '{}' NOT NULL,       -- distinct related students
+    people_count INTEGER DEFAULT 0 NOT NULL,
+    first_at TIMESTAMP WITH TIME ZONE,
+    last_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (student_id, month_year, notification_type)
+);
+
+ALTER TABLE notification_digests ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own notification digests" ON notification_digests;
+-- Apps using the anon key open this up with fix_rls_quick.sql, as for notifications
+CREATE POLICY "Users can view their own notification digests"
+    ON notification_digests FOR SELECT
+    USING (auth.uid()::text = student_id::text);
+
+-- =====================================================
+-- 2. COMPACTION
+-- =====================================================
+
+-- Fold up to p_batch_size of the oldest notifications created before
+-- p_older_than into their digests and delete them, returning how many were
+-- compacted. Rows locked by another writer are skipped until the next call.
+CREATE OR REPLACE FUNCTION compact_notifications(
+    p_older_than TIMESTAMP WITH TIME ZONE,
+    p_batch_size INTEGER DEFAULT 1000
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    WITH batch AS (
+        DELETE FROM notifications
+        WHERE id IN (
+            SELECT id FROM notifications
+            WHERE created_at < p_older_than
+            ORDER BY created_at
+            LIMIT p_batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING student_id, notification_type, related_student_id, related_transaction_id, created_at
+    ),
+    grouped AS (
+        SELECT
+            b.student_id,
+            TO_CHAR(b.created_at, 'YYYY-MM') AS month_year,
+            b.notification_type,
+            COUNT(*) AS notifications,
+            COALESCE(SUM(t.amount), 0) AS credits,
+            COALESCE(ARRAY_AGG(DISTINCT b.related_student_id)
+                     FILTER (WHERE b.related_student_id IS NOT NULL), '{}') AS people,
+            MIN(b.created_at) AS first_at,
+            MAX(b.created_at) AS last_at
+        FROM batch b
+        LEFT JOIN credit_transactions t ON t.id = b.related_transaction_id
+        GROUP BY 1, 2, 3
+    ),
+    merged AS (
+        INSERT INTO notification_digests AS d (
+            student_id, month_year, notification_type, notifications, credits,
+            people, people_count, first_at, last_at
+        )
+        SELECT student_id, month_year, notification_type, notifications, credits,
+               people, CARDINALITY(people), first_at, last_at
+        FROM grouped
+        ON CONFLICT (student_id, month_year, notification_type) DO UPDATE
+        SET notifications = d.notifications + EXCLUDED.notifications,
+            credits = d.credits + EXCLUDED.credits,
+            people = ARRAY(SELECT DISTINCT UNNEST(d.people || EXCLUDED.people)),
+            people_count = CARDINALITY(ARRAY(SELECT DISTINCT UNNEST(d.people || EXCLUDED.people))),
+            first_at = LEAST(d.first_at, EXCLUDED.first_at),
+            last_at = GREATEST(d.last_at, EXCLUDED.last_at),
+            updated_at = NOW()
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO v_count FROM batch;
+
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- It deletes any student's notifications, so only the service role may call it:
+-- run notification_retention.py with SUPABASE_KEY set to the service_role key
+REVOKE EXECUTE ON FUNCTION compact_notifications(TIMESTAMP WITH TIME ZONE, INTEGER) FROM PUBLIC;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN  -- Supabase API roles
+        REVOKE EXECUTE ON FUNCTION compact_notifications(TIMESTAMP WITH TIME ZONE, INTEGER) FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION compact_notifications(TIMESTAMP WITH TIME ZONE, INTEGER) TO service_role;
+    END IF;
+END $$;
+
+-- Optional: scheduled compaction with pg_cron instead of notification_retention.py
+-- (Database > Extensions > pg_cron in Supabase): one batch every five minutes
+-- SELECT cron.schedule(
+--     'compact-notifications',
+--     '*/5 * * * *',
+--     $$SELECT compact_notifications(NOW() - INTERVAL '90 days', 1000)$$
+-- );
@@ -0,0 +1,211 @@
+-- =====================================================
+-- Migration 007: Write-time coalescing of notification bursts
+-- =====================================================
+-- A popular student can receive many recognitions in a few minutes, and
+-- each one used to add its own "Credits Received" row. record_notification()
+-- instead merges a notification into the recipient's newest unread one of
+-- the same type when its latest event is within the coalescing window: the
+-- amounts are summed, the people and transactions are appended, the message
+-- is rewritten ("You received 12 credits from Priya and 3 others") and
+-- created_at moves to the new event, so the burst stays on top of the feed.
+-- Every transaction id is kept, so nothing is lost; the individual messages
+-- stay on credit_transactions.
+-- db_helper uses it when NOTIFICATION_COALESCE_SECONDS is set.
+
+-- =====================================================
+-- 1. AGGREGATE COLUMNS
+-- =====================================================
+ALTER TABLE notifications
+    ADD COLUMN IF NOT EXISTS event_count INTEGER DEFAULT 1 NOT NULL,
+    ADD COLUMN IF NOT EXISTS amount INTEGER,  -- total credits of the merged events
+    ADD COLUMN IF NOT EXISTS related_student_ids UUID[] DEFAULT '{}' NOT NULL,
+    ADD COLUMN IF NOT EXISTS related_transaction_ids UUID[] DEFAULT '{}' NOT NULL;
+
+-- =====================================================
+-- 2. COALESCING WRITE
+-- =====================================================
+
+-- "Priya", "Priya and Rohan" or "Priya and 3 others" for the people of a
+-- notification, newest (last in the array) first
+CREATE OR REPLACE FUNCTION notification_people_text(p_people UUID[])
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN CARDINALITY(p_people) = 0 THEN 'someone'
+        WHEN CARDINALITY(p_people) = 1 THEN newest_name
+        WHEN CARDINALITY(p_people) = 2 THEN newest_name || ' and ' || COALESCE(
+            (SELECT name FROM students WHERE id = p_people[1]), 'someone')
+        ELSE newest_name || ' and ' || (CARDINALITY(p_people) - 1) || ' others'
+    END
+    FROM (SELECT COALESCE((SELECT name FROM students WHERE id = p_people[CARDINALITY(p_people)]),
+                          'someone') AS newest_name) AS newest;
+$$ LANGUAGE sql STABLE;
+
+-- Record a notification, merging it into the student's newest unread notification
+-- of the same type if its latest event is less than p_window_seconds old.
+-- Returns the inserted or updated row.
+CREATE OR REPLACE FUNCTION record_notification(
+    p_student_id UUID,
+    p_notification_type VARCHAR(50),
+    p_title VARCHAR(255),
+    p_message TEXT,
+    p_details TEXT DEFAULT NULL,
+    p_related_student_id UUID DEFAULT NULL,
+    p_related_transaction_id UUID DEFAULT NULL,
+    p_amount INTEGER DEFAULT NULL,
+    p_window_seconds INTEGER DEFAULT 300
+)
+RETURNS SETOF notifications AS $$
+DECLARE
+    v_existing notifications%ROWTYPE;
+    v_people UUID[];
+    v_amount INTEGER;
+BEGIN
+    -- One writer per student and type at a time, so a burst can't race into two rows
+    PERFORM pg_advisory_xact_lock(hashtext(p_student_id::text || p_notification_type));
+
+    SELECT * INTO v_existing
+    FROM notifications
+    WHERE student_id = p_student_id
+      AND notification_type = p_notification_type
+      AND is_read = FALSE
+      AND created_at > NOW() - MAKE_INTERVAL(secs => p_window_seconds)
+    ORDER BY created_at DESC
+    LIMIT 1
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN QUERY
+        INSERT INTO notifications (
+            student_id, notification_type, title, message, details,
+            related_student_id, related_transaction_id, is_read,
+            event_count, amount, related_student_ids, related_transaction_ids
+        )
+        VALUES (
+            p_student_id, p_notification_type, p_title, p_message, p_details,
+            p_related_student_id, p_related_transaction_id, FALSE,
+            1, p_amount,
+            ARRAY_REMOVE(ARRAY[p_related_student_id], NULL),
+            ARRAY_REMOVE(ARRAY[p_related_transaction_id], NULL)
+        )
+        RETURNING *;
+        RETURN;
+    END IF;
+
+    -- People in order of their latest event, newest last; rows written before
+    -- this migration only have the single related_student_id
+    v_people := ARRAY_REMOVE(
+        ARRAY_REMOVE(
+            CASE WHEN CARDINALITY(v_existing.related_student_ids) > 0 THEN v_existing.related_student_ids
+                 ELSE ARRAY_REMOVE(ARRAY[v_existing.related_student_id], NULL) END,
+            p_related_student_id
+        ) || p_related_student_id,
+        NULL
+    );
+    v_amount := COALESCE(v_existing.amount, 0) + COALESCE(p_amount, 0);
+
+    RETURN QUERY
+    UPDATE notifications SET
+        event_count = v_existing.event_count + 1,
+        amount = CASE WHEN p_amount IS NULL AND v_existing.amount IS NULL THEN NULL ELSE v_amount END,
+        related_student_ids = v_people,
+        related_transaction_ids = ARRAY_REMOVE(
+            CASE WHEN CARDINALITY(v_existing.related_transaction_ids) > 0 THEN v_existing.related_transaction_ids
+                 ELSE ARRAY_REMOVE(ARRAY[v_existing.related_transaction_id], NULL) END
+            || p_related_transaction_id, NULL),
+        related_student_id = p_related_student_id,
+        related_transaction_id = p_related_transaction_id,
+        details = COALESCE(p_details, v_existing.details),
+        message = CASE p_notification_type
+            WHEN 'credits_received' THEN 'You received ' || v_amount || ' credits from ' || notification_people_text(v_people)
+            WHEN 'credits_sent' THEN 'You sent ' || v_amount || ' credits to ' || notification_people_text(v_people)
+            WHEN 'endorsement_received' THEN 'You were endorsed by ' || notification_people_text(v_people)
+            ELSE 'You endorsed ' || notification_people_text(v_people)
+        END,
+        created_at = NOW()
+    WHERE id = v_existing.id
+    RETURNING *;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- =====================================================
+-- 3. DIGESTS OF COALESCED ROWS
+-- =====================================================
+
+-- As in migration 006, but a coalesced row counts all of its events,
+-- credits and people
+CREATE OR REPLACE FUNCTION compact_notifications(
+    p_older_than TIMESTAMP WITH TIME ZONE,
+    p_batch_size INTEGER DEFAULT 1000
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    WITH batch AS (
+        DELETE FROM notifications
+        WHERE id IN (
+            SELECT id FROM notifications
+            WHERE created_at < p_older_than
+            ORDER BY created_at
+            LIMIT p_batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING student_id, notification_type, related_student_id, related_transaction_id,
+                  event_count, amount, related_student_ids, created_at
+    ),
+    grouped AS (
+        SELECT
+            b.student_id,
+            TO_CHAR(b.created_at, 'YYYY-MM') AS month_year,
+            b.notification_type,
+            SUM(b.event_count) AS notifications,
+            COALESCE(SUM(COALESCE(b.amount, t.amount)), 0) AS credits,
+            MIN(b.created_at) AS first_at,
+            MAX(b.created_at) AS last_at
+        FROM batch b
+        LEFT JOIN credit_transactions t ON t.id = b.related_transaction_id AND b.amount IS NULL
+        GROUP BY 1, 2, 3
+    ),
+    people AS (
+        SELECT b.student_id, TO_CHAR(b.created_at, 'YYYY-MM') AS month_year, b.notification_type,
+               ARRAY_AGG(DISTINCT p.person) AS people
+        FROM batch b
+        CROSS JOIN LATERAL UNNEST(b.related_student_ids || b.related_student_id) AS p(person)
+        WHERE p.person IS NOT NULL
+        GROUP BY 1, 2, 3
+    ),
+    merged AS (
+        INSERT INTO notification_digests AS d (
+            student_id, month_year, notification_type, notifications, credits,
+            people, people_count, first_at, last_at
+        )
+        SELECT g.student_id, g.month_year, g.notification_type, g.notifications, g.credits,
+               COALESCE(p.people, '{}'), CARDINALITY(COALESCE(p.people, '{}')), g.first_at, g.last_at
+        FROM grouped g
+        LEFT JOIN people p USING (student_id, month_year, notification_type)
+        ON CONFLICT (student_id, month_year, notification_type) DO UPDATE
+        SET notifications = d.notifications + EXCLUDED.notifications,
+            credits = d.credits + EXCLUDED.credits,
+            people = ARRAY(SELECT DISTINCT UNNEST(d.people || EXCLUDED.people)),
+            people_count = CARDINALITY(ARRAY(SELECT DISTINCT UNNEST(d.people || EXCLUDED.people))),
+            first_at = LEAST(d.first_at, EXCLUDED.first_at),
+            last_at = GREATEST(d.last_at, EXCLUDED.last_at),
+            updated_at = NOW()
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO v_count FROM batch;
+
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Only the service role may compact (see migration 006). CREATE OR REPLACE
+-- keeps those grants; they are restated so this file is safe on its own
+REVOKE EXECUTE ON FUNCTION compact_notifications(TIMESTAMP WITH TIME ZONE, INTEGER) FROM PUBLIC;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN  -- Supabase API roles
+        REVOKE EXECUTE ON FUNCTION compact_notifications(TIMESTAMP WITH TIME ZONE, INTEGER) FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION compact_notifications(TIMESTAMP WITH TIME ZONE, INTEGER) TO service_role;
+    END IF;
+END $$;
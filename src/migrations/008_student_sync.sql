@@ -0,0 +1,50 @@
+-- =====================================================
+-- Migration 008: Incremental sync of the students table
+-- =====================================================
+-- The in-process student directory (student_directory.py) keeps a copy of
+-- the students table and, instead of refetching all of it when something
+-- changes, asks for the rows whose updated_at is past its high-water mark
+-- and for the ids deleted since then. updated_at is already maintained by
+-- update_students_updated_at; deletions leave a tombstone here.
+
+-- Rows changed since a high-water mark, in order
+CREATE INDEX IF NOT EXISTS idx_students_updated_at ON students(updated_at, id);
+
+-- =====================================================
+-- 1. TOMBSTONES
+-- =====================================================
+CREATE TABLE IF NOT EXISTS student_tombstones (
+    student_id UUID PRIMARY KEY,
+    deleted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_student_tombstones_deleted_at ON student_tombstones(deleted_at);
+
+ALTER TABLE student_tombstones ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Student tombstones are viewable by everyone" ON student_tombstones;
+CREATE POLICY "Student tombstones are viewable by everyone"
+    ON student_tombstones FOR SELECT
+    USING (true);
+
+CREATE OR REPLACE FUNCTION record_student_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO student_tombstones (student_id) VALUES (OLD.id)
+    ON CONFLICT (student_id) DO UPDATE SET deleted_at = NOW();
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS student_tombstone_on_delete ON students;
+CREATE TRIGGER student_tombstone_on_delete
+    AFTER DELETE ON students
+    FOR EACH ROW
+    EXECUTE FUNCTION record_student_tombstone();
+
+-- Optional: tombstones only need to outlive the directory's sync interval
+-- SELECT cron.schedule(
+--     'prune-student-tombstones',
+--     '0 4 * * *',
+--     $$DELETE FROM student_tombstones WHERE deleted_at < NOW() - INTERVAL '7 days'$$
+-- );
@@ -0,0 +1,141 @@
+-- =====================================================
+-- Migration 009: Atomic multi-recipient transfers
+-- =====================================================
+-- Recognizing a whole team used to mean one send_credits call sequence per
+-- teammate, each re-checking the sender's monthly limit on its own.
+-- send_credits_multi() validates the total once against the sender's locked
+-- balance and monthly limit, then writes every ledger row, both sides'
+-- balances and the notifications in one transaction and one round trip:
+-- either every teammate is credited or none is.
+
+-- =====================================================
+-- 1. MULTI-RECIPIENT TRANSFER
+-- =====================================================
+
+-- Send p_amounts[i] credits to p_receiver_ids[i] for every i. The sender gets
+-- a single "credits_sent" notification for the whole team; each receiver gets
+-- their own, coalesced as in migration 007 when p_coalesce_seconds > 0.
+-- Returns the ledger rows in recipient order. Raises (and rolls back
+-- everything) on invalid input, an exceeded monthly limit or a low balance.
+CREATE OR REPLACE FUNCTION send_credits_multi(
+    p_sender_id UUID,
+    p_receiver_ids UUID[],
+    p_amounts INTEGER[],
+    p_message TEXT DEFAULT NULL,
+    p_coalesce_seconds INTEGER DEFAULT 0
+)
+RETURNS SETOF credit_transactions AS $$
+DECLARE
+    v_month VARCHAR(7) := TO_CHAR(NOW(), 'YYYY-MM');
+    v_credits student_credits%ROWTYPE;
+    v_total INTEGER;
+    v_sender_name TEXT;
+    v_transaction_ids UUID[];
+    v_transfer RECORD;
+BEGIN
+    IF COALESCE(CARDINALITY(p_receiver_ids), 0) = 0
+       OR CARDINALITY(p_receiver_ids) <> COALESCE(CARDINALITY(p_amounts), 0) THEN
+        RAISE EXCEPTION 'Every recipient needs exactly one amount' USING ERRCODE = '22023';
+    END IF;
+    IF p_sender_id = ANY(p_receiver_ids) THEN
+        RAISE EXCEPTION 'Cannot send credits to yourself' USING ERRCODE = '22023';
+    END IF;
+    IF (SELECT COUNT(DISTINCT r) FROM UNNEST(p_receiver_ids) AS r) < CARDINALITY(p_receiver_ids) THEN
+        RAISE EXCEPTION 'Duplicate recipient' USING ERRCODE = '22023';
+    END IF;
+    IF EXISTS (SELECT 1 FROM UNNEST(p_amounts) AS a WHERE a IS NULL OR a <= 0) THEN
+        RAISE EXCEPTION 'Amounts must be positive' USING ERRCODE = '22023';
+    END IF;
+    IF (SELECT COUNT(*) FROM students WHERE id = ANY(p_receiver_ids)) < CARDINALITY(p_receiver_ids) THEN
+        RAISE EXCEPTION 'Unknown recipient' USING ERRCODE = '22023';
+    END IF;
+
+    v_total := (SELECT SUM(a) FROM UNNEST(p_amounts) AS a);
+
+    SELECT * INTO v_credits
+    FROM student_credits
+    WHERE student_id = p_sender_id AND month_year = v_month
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Sender credits not found' USING ERRCODE = 'P0001';
+    END IF;
+    IF v_credits.credits_sent_this_month + v_total > v_credits.monthly_limit THEN
+        RAISE EXCEPTION 'Monthly sending limit exceeded' USING ERRCODE = 'P0001';
+    END IF;
+    IF v_total > v_credits.total_credits THEN
+        RAISE EXCEPTION 'Insufficient credits' USING ERRCODE = 'P0001';
+    END IF;
+
+    UPDATE student_credits
+    SET total_credits = total_credits - v_total,
+        credits_sent_this_month = credits_sent_this_month + v_total
+    WHERE id = v_credits.id;
+
+    -- Receivers in id order, so concurrent team transfers lock rows in the same order
+    INSERT INTO student_credits (student_id, total_credits, credits_received, credits_sent_this_month,
+                                 monthly_limit, month_year)
+    SELECT r.receiver_id, 100 + r.amount, r.amount, 0, 100, v_month
+    FROM UNNEST(p_receiver_ids, p_amounts) AS r(receiver_id, amount)
+    ORDER BY r.receiver_id
+    ON CONFLICT (student_id, month_year) DO UPDATE
+    SET total_credits = student_credits.total_credits + EXCLUDED.credits_received,
+        credits_received = student_credits.credits_received + EXCLUDED.credits_received;
+
+    WITH inserted AS (
+        INSERT INTO credit_transactions (sender_id, receiver_id, amount, message, transaction_type)
+        SELECT p_sender_id, r.receiver_id, r.amount, p_message, 'transfer'
+        FROM UNNEST(p_receiver_ids, p_amounts) WITH ORDINALITY AS r(receiver_id, amount, position)
+        ORDER BY r.position
+        RETURNING id, receiver_id
+    )
+    SELECT ARRAY_AGG(i.id ORDER BY ARRAY_POSITION(p_receiver_ids, i.receiver_id))
+    INTO v_transaction_ids
+    FROM inserted i;
+
+    -- One notification per receiver, one summary for the sender
+    v_sender_name := COALESCE((SELECT name FROM students WHERE id = p_sender_id), 'someone');
+
+    IF p_coalesce_seconds > 0 THEN
+        FOR v_transfer IN
+            SELECT t.id, t.receiver_id, t.amount FROM credit_transactions t
+            WHERE t.id = ANY(v_transaction_ids)
+        LOOP
+            PERFORM record_notification(
+                v_transfer.receiver_id, 'credits_received', 'Credits Received',
+                'You received ' || v_transfer.amount || ' credits from ' || v_sender_name,
+                p_message, p_sender_id, v_transfer.id, v_transfer.amount, p_coalesce_seconds
+            );
+        END LOOP;
+    ELSE
+        INSERT INTO notifications (
+            student_id, notification_type, title, message, details,
+            related_student_id, related_transaction_id, is_read,
+            event_count, amount, related_student_ids, related_transaction_ids
+        )
+        SELECT t.receiver_id, 'credits_received', 'Credits Received',
+               'You received ' || t.amount || ' credits from ' || v_sender_name,
+               p_message, p_sender_id, t.id, FALSE, 1, t.amount, ARRAY[p_sender_id], ARRAY[t.id]
+        FROM credit_transactions t
+        WHERE t.id = ANY(v_transaction_ids);
+    END IF;
+
+    INSERT INTO notifications (
+        student_id, notification_type, title, message, details,
+        related_student_id, related_transaction_id, is_read,
+        event_count, amount, related_student_ids, related_transaction_ids
+    )
+    VALUES (
+        p_sender_id, 'credits_sent', 'Credits Sent',
+        'You sent ' || v_total || ' credits to ' || notification_people_text(p_receiver_ids),
+        p_message, p_receiver_ids[CARDINALITY(p_receiver_ids)],
+        v_transaction_ids[CARDINALITY(v_transaction_ids)], FALSE,
+        CARDINALITY(p_receiver_ids), v_total, p_receiver_ids, v_transaction_ids
+    );
+
+    RETURN QUERY
+    SELECT t.* FROM credit_transactions t
+    WHERE t.id = ANY(v_transaction_ids)
+    ORDER BY ARRAY_POSITION(v_transaction_ids, t.id);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
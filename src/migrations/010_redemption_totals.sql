@@ -0,0 +1,103 @@
+-- =====================================================
+-- Migration 010: Lifetime redemption totals
+-- =====================================================
+-- One row per student with running sums of everything they ever redeemed
+-- (credits, rupee value, vouchers, purchases), maintained by a trigger on
+-- voucher_purchases in the same transaction as the purchase itself. The
+-- redeem page reads its lifetime header from this one primary-key row
+-- instead of summing every purchase on each rerun, so the cost does not
+-- grow with purchase count. refresh_redemption_totals() rebuilds the rows
+-- from voucher_purchases (backfill below, or to repair drift).
+
+-- =====================================================
+-- 1. TOTALS TABLE
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS student_redemption_totals (
+    student_id UUID PRIMARY KEY REFERENCES students(id) ON DELETE CASCADE,
+    credits_redeemed BIGINT DEFAULT 0 NOT NULL,
+    value_redeemed DECIMAL(14, 2) DEFAULT 0 NOT NULL,
+    vouchers_purchased INTEGER DEFAULT 0 NOT NULL,
+    purchases INTEGER DEFAULT 0 NOT NULL,
+    last_purchase_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE student_redemption_totals ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own redemption totals" ON student_redemption_totals;
+-- Apps using the anon key open this up with fix_rls_quick.sql, as for voucher_purchases
+CREATE POLICY "Users can view their own redemption totals"
+    ON student_redemption_totals FOR SELECT
+    USING (auth.uid()::text = student_id::text);
+
+-- =====================================================
+-- 2. INCREMENTAL MAINTENANCE
+-- =====================================================
+
+-- Add a purchase to its student's totals, creating the row on first use.
+-- Runs inside redeem_vouchers' transaction, so the totals and the purchase
+-- commit (or roll back) together.
+CREATE OR REPLACE FUNCTION add_redemption_total()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO student_redemption_totals AS t (
+        student_id, credits_redeemed, value_redeemed, vouchers_purchased, purchases, last_purchase_at
+    ) VALUES (
+        NEW.student_id, NEW.total_credits, NEW.total_value, NEW.num_vouchers, 1, NEW.created_at
+    )
+    ON CONFLICT (student_id) DO UPDATE SET
+        credits_redeemed = t.credits_redeemed + EXCLUDED.credits_redeemed,
+        value_redeemed = t.value_redeemed + EXCLUDED.value_redeemed,
+        vouchers_purchased = t.vouchers_purchased + EXCLUDED.vouchers_purchased,
+        purchases = t.purchases + 1,
+        last_purchase_at = GREATEST(t.last_purchase_at, EXCLUDED.last_purchase_at),
+        updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS add_redemption_totals ON voucher_purchases;
+CREATE TRIGGER add_redemption_totals
+    AFTER INSERT ON voucher_purchases
+    FOR EACH ROW
+    EXECUTE FUNCTION add_redemption_total();
+
+-- =====================================================
+-- 3. FULL REFRESH (backfill / repair)
+-- =====================================================
+
+-- Rebuild the totals of one student, or of everyone when NULL
+CREATE OR REPLACE FUNCTION refresh_redemption_totals(p_student_id UUID DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    DELETE FROM student_redemption_totals
+    WHERE p_student_id IS NULL OR student_id = p_student_id;
+
+    INSERT INTO student_redemption_totals (
+        student_id, credits_redeemed, value_redeemed, vouchers_purchased, purchases, last_purchase_at
+    )
+    SELECT student_id, SUM(total_credits), SUM(total_value), SUM(num_vouchers), COUNT(*), MAX(created_at)
+    FROM voucher_purchases
+    WHERE p_student_id IS NULL OR student_id = p_student_id
+    GROUP BY student_id;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- It deletes and rebuilds totals, so only the service role may call it
+REVOKE EXECUTE ON FUNCTION refresh_redemption_totals(UUID) FROM PUBLIC;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN  -- Supabase API roles
+        REVOKE EXECUTE ON FUNCTION refresh_redemption_totals(UUID) FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION refresh_redemption_totals(UUID) TO service_role;
+    END IF;
+END $$;
+
+-- Backfill the purchases made before this migration
+SELECT refresh_redemption_totals();
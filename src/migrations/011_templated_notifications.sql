@@ -0,0 +1,69 @@
+-- =====================================================
+-- Migration 011: Templated notifications
+-- =====================================================
+-- Every notification used to carry its rendered title and message ("You
+-- received 25 credits from Sarah Johnson"). That copied student names into
+-- the table, kept showing old names after a rename, and added text that
+-- the row's own columns already determine. Since migration 007 each row
+-- also has its parameters: amount and related_student_ids (newest last).
+-- With notification_type naming the template, they are all a row needs.
+--
+-- title and message are now always NULL. notification_templates.py
+-- renders them at read time with names from the student directory, and
+-- get_notifications no longer selects them. The columns stay, so writers
+-- that still pass text (record_notification, send_credits_multi, older
+-- clients) keep working; a trigger discards the text.
+--
+-- The backfill rewrites every notification, so run it off-peak on a large
+-- table. Then VACUUM FULL notifications (or use pg_repack) to give the space
+-- back instead of leaving it for new rows to reuse.
+
+-- =====================================================
+-- 1. TEXT BECOMES OPTIONAL
+-- =====================================================
+ALTER TABLE notifications
+    ALTER COLUMN title DROP NOT NULL,
+    ALTER COLUMN message DROP NOT NULL;
+
+-- =====================================================
+-- 2. DISCARD TEXT ON WRITE
+-- =====================================================
+CREATE OR REPLACE FUNCTION strip_notification_text()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.title := NULL;
+    NEW.message := NULL;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS strip_notification_text ON notifications;
+CREATE TRIGGER strip_notification_text
+    BEFORE INSERT OR UPDATE OF title, message ON notifications
+    FOR EACH ROW
+    WHEN (NEW.title IS NOT NULL OR NEW.message IS NOT NULL)
+    EXECUTE FUNCTION strip_notification_text();
+
+-- =====================================================
+-- 3. BACKFILL
+-- =====================================================
+
+-- Rows written before migration 007 only have the single related ids and
+-- no amount; recover the amount from the transfer they point at (rows whose
+-- transfer is gone render as "You received credits from ...")
+UPDATE notifications n
+SET amount = t.amount
+FROM credit_transactions t
+WHERE n.amount IS NULL
+  AND n.notification_type IN ('credits_sent', 'credits_received')
+  AND t.id = n.related_transaction_id;
+
+UPDATE notifications
+SET related_student_ids = ARRAY[related_student_id],
+    related_transaction_ids = ARRAY_REMOVE(ARRAY[related_transaction_id], NULL)
+WHERE CARDINALITY(related_student_ids) = 0
+  AND related_student_id IS NOT NULL;
+
+UPDATE notifications
+SET title = NULL, message = NULL
+WHERE title IS NOT NULL OR message IS NOT NULL;
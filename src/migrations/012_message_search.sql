@@ -0,0 +1,53 @@
+-- =====================================================
+-- Migration 012: Full-text search over recognition messages
+-- =====================================================
+-- Lets a student search their own history ("who thanked me for the
+-- hackathon?"). The only free text a student writes is the message of a
+-- transfer. Notifications copy it into details, and their titles and
+-- messages are rendered from templates since migration 011. So the
+-- transfers are searched, which also covers history whose notifications
+-- were compacted into digests.
+--
+-- A GIN index on the message's tsvector is kept up to date by every
+-- insert. It is an expression index, so the table is not rewritten. On a
+-- large live table, run the CREATE INDEX on its own as CREATE INDEX
+-- CONCURRENTLY (outside a transaction) to avoid blocking writes.
+--
+-- Check the plans with explain_check.py after applying.
+
+-- =====================================================
+-- 1. INDEX
+-- =====================================================
+
+-- The expression must match search_messages' WHERE clause exactly
+CREATE INDEX IF NOT EXISTS idx_credit_transactions_message_search
+    ON credit_transactions USING GIN (to_tsvector('english', COALESCE(message, '')));
+
+-- =====================================================
+-- 2. SEARCH
+-- =====================================================
+
+-- A student's transfers (sent or received) whose message matches p_query,
+-- best match first. p_query is plain user input: terms are ANDed,
+-- "quoted phrases", "or" and -exclusions work, and stop words are ignored.
+-- Postgres picks the GIN index for rare terms and the student's sender /
+-- receiver indexes for common ones.
+CREATE OR REPLACE FUNCTION search_messages(
+    p_student_id UUID,
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    id UUID, sender_id UUID, receiver_id UUID, amount INTEGER,
+    message TEXT, created_at TIMESTAMP WITH TIME ZONE, rank REAL
+) AS $$
+    SELECT
+        t.id, t.sender_id, t.receiver_id, t.amount, t.message, t.created_at,
+        ts_rank(to_tsvector('english', COALESCE(t.message, '')), q) AS rank
+    FROM credit_transactions t, websearch_to_tsquery('english', p_query) q
+    WHERE to_tsvector('english', COALESCE(t.message, '')) @@ q
+      AND (t.sender_id = p_student_id OR t.receiver_id = p_student_id)
+      AND t.transaction_type = 'transfer'
+    ORDER BY rank DESC, t.created_at DESC
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
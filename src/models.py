@@ -0,0 +1,280 @@
+"""
+Row types for Boostly database reads
+Each row type is a NamedTuple whose fields are exactly the columns selected,
+so a call site declares what it needs by choosing (or defining) a row type.
+"""
+
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Type, TypeVar
+
+R = TypeVar("R", bound=tuple)
+
+
+# =====================================================
+# STUDENTS
+# =====================================================
+
+class Student(NamedTuple):
+    """Full students row"""
+    id: str
+    name: str
+    roll_number: str
+    email: Optional[str]
+    avatar_url: Optional[str]
+    created_at: str
+    updated_at: str
+
+
+class StudentRef(NamedTuple):
+    """Student directory entry (id, name, roll)"""
+    id: str
+    name: str
+    roll_number: str
+
+
+class StudentChange(NamedTuple):
+    """Student directory entry with its updated_at, for incremental sync"""
+    id: str
+    name: str
+    roll_number: str
+    updated_at: str
+
+
+# =====================================================
+# CREDITS
+# =====================================================
+
+class StudentCredits(NamedTuple):
+    """Full student_credits row"""
+    id: str
+    student_id: str
+    total_credits: int
+    credits_received: int
+    credits_sent_this_month: int
+    monthly_limit: int
+    month_year: str
+    last_reset_date: Optional[str]
+    created_at: str
+    updated_at: str
+
+
+class CreditBalance(NamedTuple):
+    """Balance fields needed to validate and apply a transfer or redemption"""
+    id: str
+    total_credits: int
+    credits_received: int
+    credits_sent_this_month: int
+    monthly_limit: int
+
+
+class LedgerBalance(NamedTuple):
+    """Balance fields checked against the ledger by ledger_reconciliation.py"""
+    id: str
+    student_id: str
+    total_credits: int
+    credits_received: int
+    credits_sent_this_month: int
+    created_at: str
+
+
+class CreditTransaction(NamedTuple):
+    """Full credit_transactions row"""
+    id: str
+    sender_id: str
+    receiver_id: str
+    amount: int
+    message: Optional[str]
+    transaction_type: str
+    created_at: str
+
+
+class LedgerTransfer(NamedTuple):
+    """A transfer as summed by the ledger audit and the recognition graph"""
+    id: str
+    sender_id: str
+    receiver_id: str
+    amount: int
+    created_at: str
+
+
+class Recognition(NamedTuple):
+    """A transfer as shown in the recognition feed"""
+    id: str
+    sender_id: str
+    receiver_id: str
+    amount: int
+    message: Optional[str]
+    created_at: str
+
+
+class FeedEntry(NamedTuple):
+    """Recognition with its endorsement summary for the viewing student"""
+    id: str
+    sender_id: str
+    receiver_id: str
+    amount: int
+    message: Optional[str]
+    created_at: str
+    endorsements: int
+    endorsed_by_me: bool
+
+
+class MessageMatch(NamedTuple):
+    """A student's transfer whose message matched a search (higher rank is better)"""
+    id: str
+    sender_id: str
+    receiver_id: str
+    amount: int
+    message: Optional[str]
+    created_at: str
+    rank: float
+
+
+# =====================================================
+# NOTIFICATIONS
+# =====================================================
+
+class Notification(NamedTuple):
+    """Full notifications row (title and message are NULL since migration 011, see notification_templates.py)"""
+    id: str
+    student_id: str
+    notification_type: str
+    title: Optional[str]
+    message: Optional[str]
+    details: Optional[str]
+    related_student_id: Optional[str]
+    related_transaction_id: Optional[str]
+    is_read: bool
+    created_at: str
+    event_count: int
+    amount: Optional[int]
+    related_student_ids: List[str]
+    related_transaction_ids: List[str]
+
+
+class NotificationParams(NamedTuple):
+    """A notification as stored: its template (notification_type) and parameters"""
+    notification_type: str
+    amount: Optional[int]
+    related_student_ids: List[str]
+    details: Optional[str]
+    created_at: str
+
+
+class NotificationItem(NamedTuple):
+    """Fields rendered by a notification card"""
+    notification_type: str
+    title: str
+    message: str
+    details: Optional[str]
+    created_at: str
+
+
+class NotificationDigest(NamedTuple):
+    """notification_digests row: one month of compacted notifications of one type"""
+    month_year: str
+    notification_type: str
+    notifications: int
+    credits: int
+    people_count: int
+
+
+# =====================================================
+# ENDORSEMENTS
+# =====================================================
+
+class Endorsement(NamedTuple):
+    """Full endorsements row"""
+    id: str
+    endorser_id: str
+    endorsee_id: str
+    recognition_id: Optional[str]
+    created_at: str
+
+
+# =====================================================
+# VOUCHER PURCHASES
+# =====================================================
+
+class VoucherPurchase(NamedTuple):
+    """Full voucher_purchases row"""
+    id: str
+    student_id: str
+    num_vouchers: int
+    credits_per_voucher: int
+    total_credits: int
+    total_value: float
+    voucher_rate: float
+    created_at: str
+
+
+class LedgerPurchase(NamedTuple):
+    """A purchase as summed by the ledger audit"""
+    id: str
+    student_id: str
+    total_credits: int
+    created_at: str
+
+
+class RedemptionTotals(NamedTuple):
+    """student_redemption_totals row: lifetime running sums of a student's purchases"""
+    student_id: str
+    credits_redeemed: int
+    value_redeemed: float
+    vouchers_purchased: int
+    purchases: int
+    last_purchase_at: Optional[str]
+
+
+# =====================================================
+# ANALYTICS
+# =====================================================
+
+class MonthlyRollup(NamedTuple):
+    """student_monthly_rollups row"""
+    student_id: str
+    month_year: str
+    credits_sent: int
+    transfers_sent: int
+    credits_received: int
+    transfers_received: int
+    credits_redeemed: int
+    value_redeemed: float
+    vouchers_purchased: int
+    endorsements_given: int
+    endorsements_received: int
+
+
+class ReceivedCredits(NamedTuple):
+    """Credits received by a student in one bucket (week or month)"""
+    student_id: str
+    credits_received: int
+
+
+# =====================================================
+# HELPERS
+# =====================================================
+
+def columns(row_type: Type[R]) -> str:
+    """PostgREST select list for a row type"""
+    return ",".join(row_type._fields)
+
+
+def to_row(row_type: Type[R], data: Dict[str, Any]) -> R:
+    """Build a row from a response dict, ignoring any extra keys"""
+    return row_type._make([data.get(field) for field in row_type._fields])
+
+
+def to_rows(row_type: Type[R], data: Optional[Iterable[Dict[str, Any]]]) -> List[R]:
+    """Build rows from a list of response dicts"""
+    if not data:
+        return []
+    fields = row_type._fields
+    make = row_type._make
+    data = data if isinstance(data, list) else list(data)
+    first = data[0]
+    if len(fields) > 1 and all(field in first for field in fields):
+        # The rows of one response share their keys, so pick them in C
+        pick = itemgetter(*fields)
+        return [make(pick(item)) for item in data]
+    return [make([item.get(field) for field in fields]) for item in data]
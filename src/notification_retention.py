@@ -0,0 +1,91 @@
+"""
+Notification retention job for Boostly
+Folds notifications older than the retention age into per-student monthly
+digests (migrations/006_notification_digests.sql) and deletes them, one
+bounded batch per database call with a short pause in between, so the hot
+notifications table stays small without long-running deletes.
+
+compact_notifications is only executable by the service role, so run the
+job with SUPABASE_KEY set to the service_role key (never the app's anon key).
+
+Usage:
+    python notification_retention.py                 # run forever, compacting every hour
+    python notification_retention.py --once          # single pass (for cron)
+    python notification_retention.py --once --days 30
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from db_helper import compact_notifications
+
+RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+BATCH_SIZE = int(os.getenv("NOTIFICATION_COMPACT_BATCH", "1000"))
+BATCH_PAUSE = float(os.getenv("NOTIFICATION_COMPACT_PAUSE", "0.2"))
+
+
+class RetentionMetrics:
+    """Counters reported after every pass"""
+
+    def __init__(self):
+        self.passes = 0
+        self.batches = 0
+        self.compacted = 0
+        self.last_pass_compacted = 0
+        self.last_pass_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(vars(self))
+
+
+def compact_once(metrics: RetentionMetrics, retention_days: int = RETENTION_DAYS,
+                 batch_size: int = BATCH_SIZE, pause: float = BATCH_PAUSE,
+                 max_batches: int = 0) -> Dict[str, float]:
+    """Compact batches until nothing older than the cutoff is left (or max_batches, if set)"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).isoformat()
+    start = time.perf_counter()
+    metrics.passes += 1
+    metrics.last_pass_compacted = 0
+
+    batches = 0
+    while not max_batches or batches < max_batches:
+        compacted = compact_notifications(cutoff, batch_size)
+        if compacted < 0:
+            print("❌ Compaction failed, will retry on the next pass")
+            break
+        batches += 1
+        metrics.batches += 1
+        metrics.compacted += compacted
+        metrics.last_pass_compacted += compacted
+        if compacted < batch_size:
+            break
+        time.sleep(pause)  # let other writers at the table between batches
+
+    metrics.last_pass_seconds = round(time.perf_counter() - start, 3)
+    print(f"🗜️  Compacted {metrics.last_pass_compacted} notifications older than {retention_days} days "
+          f"in {batches} batches ({metrics.last_pass_seconds}s), {metrics.compacted} in total")
+    return metrics.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact old notifications into monthly digests")
+    parser.add_argument("--once", action="store_true", help="Compact once and exit")
+    parser.add_argument("--interval", type=float, default=3600.0, help="Seconds between passes")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="Keep notifications this many days")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Notifications per batch")
+    parser.add_argument("--max-batches", type=int, default=0, help="Stop a pass after this many batches (0 = no limit)")
+    args = parser.parse_args()
+
+    metrics = RetentionMetrics()
+    while True:
+        compact_once(metrics, args.days, args.batch_size, max_batches=args.max_batches)
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Notification templates for Boostly
+Notifications are stored as a template (notification_type) and its
+parameters: amount, and related_student_ids with the newest person last
+(migration 011). Title and message are rendered here at read time, with
+names taken from the shared student directory, so a renamed student shows
+up under the new name and rows carry no copies of names or boilerplate.
+"""
+
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from models import NotificationItem
+
+NameOf = Callable[[str, str], str]
+
+
+class NotificationTemplate(NamedTuple):
+    """Title and message format of one notification type"""
+    title: str
+    message: str  # str.format with {credits} and {people}
+
+
+TEMPLATES: Dict[str, NotificationTemplate] = {
+    'credits_received': NotificationTemplate("Credits Received", "You received {credits} from {people}"),
+    'credits_sent': NotificationTemplate("Credits Sent", "You sent {credits} to {people}"),
+    'endorsement_received': NotificationTemplate("Endorsement Received", "You were endorsed by {people}"),
+    'endorsement_given': NotificationTemplate("Endorsement Given", "You endorsed {people}"),
+}
+
+
+def people_text(people: Sequence[str], name_of: NameOf) -> str:
+    """'Priya', 'Priya and Rohan' or 'Priya and 3 others', newest (last) first"""
+    if not people:
+        return 'someone'
+    if len(people) == 1:
+        return name_of(people[-1], 'someone')
+    if len(people) == 2:
+        return f"{name_of(people[-1], 'someone')} and {name_of(people[0], 'someone')}"
+    return f"{name_of(people[-1], 'someone')} and {len(people) - 1} others"
+
+
+def notification_text(row, name_of: NameOf) -> Dict[str, str]:
+    """Title and message of a row with notification_type, amount and related_student_ids
+
+    Returned as a dict, so a full row can take it with row._replace(**text).
+    """
+    template = TEMPLATES.get(row.notification_type)
+    if template is None:
+        return {'title': row.notification_type.replace('_', ' ').title(), 'message': ''}
+    amount: Optional[int] = row.amount
+    return {
+        'title': template.title,
+        'message': template.message.format(
+            credits='credits' if amount is None else f"{amount} credits",
+            people=people_text(row.related_student_ids or (), name_of)
+        ),
+    }
+
+
+def render_notifications(rows: Iterable) -> List[NotificationItem]:
+    """Notification cards for stored rows, with names from the student directory"""
+    from student_directory import get_directory
+    name_of = get_directory().name_of
+    return [
+        NotificationItem(row.notification_type, details=row.details, created_at=row.created_at,
+                         **notification_text(row, name_of))
+        for row in rows
+    ]
@@ -0,0 +1,222 @@
+"""
+Admission control for Boostly write operations
+A per-student token bucket limits how fast one student can write, and a
+global concurrency cap with a bounded wait queue protects the database when
+many sessions write at once. Rejections are fast and counted in metrics.
+
+Buckets live in process memory by default; set REDIS_URL (and install
+redis) to share them between replicas.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class AdmissionRejected(Exception):
+    """Raised when a write is shed instead of being executed"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason  # 'rate_limited', 'overloaded' or 'timeout'
+
+
+# =====================================================
+# TOKEN BUCKETS
+# =====================================================
+
+class LocalBucketStore:
+    """In-process token buckets keyed by student"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, list] = {}  # key -> [tokens, last_refill]
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str, cost: float = 1.0) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            allowed = tokens >= cost
+            bucket[0] = tokens - cost if allowed else tokens
+            bucket[1] = now
+            return allowed
+
+    def refund(self, key: str, cost: float = 1.0):
+        """Give back tokens taken by a write that was shed afterwards"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + cost)
+
+
+class RedisBucketStore:
+    """Token buckets shared between replicas, refilled atomically in Redis"""
+
+    SCRIPT = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or ARGV[2])
+    local last = tonumber(redis.call('HGET', KEYS[1], 'ts') or ARGV[3])
+    tokens = math.min(tonumber(ARGV[2]), tokens + (tonumber(ARGV[3]) - last) * tonumber(ARGV[1]))
+    local allowed = 0
+    if tokens >= tonumber(ARGV[4]) then
+        tokens = tokens - tonumber(ARGV[4])
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', ARGV[3])
+    redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2]) / tonumber(ARGV[1])) + 1)
+    return allowed
+    """
+
+    REFUND_SCRIPT = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+    if tokens then
+        redis.call('HSET', KEYS[1], 'tokens', math.min(tonumber(ARGV[1]), tokens + tonumber(ARGV[2])))
+    end
+    return 0
+    """
+
+    def __init__(self, client, rate: float, burst: float, prefix: str = "boostly:bucket:"):
+        from redis import RedisError
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+        self._refund_script = client.register_script(self.REFUND_SCRIPT)
+        self._errors = RedisError
+        # Used while Redis is unreachable, so writes keep working with per-replica limits
+        self._fallback = LocalBucketStore(rate, burst)
+        self._degraded = False
+
+    def _failed(self, e: Exception):
+        if not self._degraded:
+            self._degraded = True
+            print(f"Warning: Redis rate limits unavailable, using in-process buckets: {e}")
+
+    def try_acquire(self, key: str, cost: float = 1.0) -> bool:
+        try:
+            allowed = bool(self._script(keys=[self.prefix + key], args=[self.rate, self.burst, time.time(), cost]))
+        except self._errors as e:
+            self._failed(e)
+            return self._fallback.try_acquire(key, cost)
+        if self._degraded:
+            self._degraded = False
+            print("Redis rate limits available again")
+        return allowed
+
+    def refund(self, key: str, cost: float = 1.0):
+        """Give back tokens taken by a write that was shed afterwards"""
+        if self._degraded:
+            self._fallback.refund(key, cost)
+            return
+        try:
+            self._refund_script(keys=[self.prefix + key], args=[self.burst, cost])
+        except self._errors as e:
+            self._failed(e)
+
+
+# =====================================================
+# ADMISSION CONTROLLER
+# =====================================================
+
+class AdmissionController:
+    """Per-student rate limit plus a global cap on concurrent writes"""
+
+    def __init__(self, buckets, max_concurrent: int, max_queue: int, max_wait: float):
+        self.buckets = buckets
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._counters = {
+            'admitted': 0, 'queued': 0, 'shed_rate_limited': 0,
+            'shed_overloaded': 0, 'shed_timeout': 0,
+        }
+        self._queue_wait_total = 0.0
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    @contextmanager
+    def admit(self, student_id: str, operation: str = "write") -> Iterator[None]:
+        """Hold a write slot for the duration of the block, or raise AdmissionRejected
+
+        A write shed for load gets its rate-limit token back, so only
+        admitted writes count against the student.
+        """
+        key = str(student_id)
+        if not self.buckets.try_acquire(key):
+            self._count('shed_rate_limited')
+            raise AdmissionRejected('rate_limited', f"Too many {operation} requests, please slow down")
+
+        # Fast path: a free slot, no queueing
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                overloaded = self._waiting >= self.max_queue
+                if overloaded:
+                    self._counters['shed_overloaded'] += 1
+                else:
+                    self._waiting += 1
+                    self._counters['queued'] += 1
+            if overloaded:
+                self.buckets.refund(key)
+                raise AdmissionRejected('overloaded', "Server is busy, please try again")
+            start = time.monotonic()
+            acquired = self._slots.acquire(timeout=self.max_wait)
+            with self._lock:
+                self._waiting -= 1
+                self._queue_wait_total += time.monotonic() - start
+            if not acquired:
+                self._count('shed_timeout')
+                self.buckets.refund(key)
+                raise AdmissionRejected('timeout', "Server is busy, please try again")
+
+        with self._lock:
+            self._in_flight += 1
+            self._counters['admitted'] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def metrics(self) -> Dict[str, float]:
+        """Snapshot of counters and current load"""
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot['in_flight'] = self._in_flight
+            snapshot['waiting'] = self._waiting
+            snapshot['avg_queue_wait_ms'] = (
+                self._queue_wait_total / self._counters['queued'] * 1000 if self._counters['queued'] else 0.0
+            )
+        return snapshot
+
+
+def create_controller() -> AdmissionController:
+    """Build the controller from environment settings"""
+    rate = float(os.getenv("BOOSTLY_WRITE_RATE", "0.5"))        # writes per second per student
+    burst = float(os.getenv("BOOSTLY_WRITE_BURST", "5"))         # back-to-back writes allowed
+    max_concurrent = int(os.getenv("BOOSTLY_MAX_CONCURRENT_WRITES", "8"))
+    max_queue = int(os.getenv("BOOSTLY_WRITE_QUEUE", "32"))
+    max_wait = float(os.getenv("BOOSTLY_WRITE_MAX_WAIT", "2.0"))  # seconds
+
+    buckets = None
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        try:
+            import redis
+            buckets = RedisBucketStore(redis.Redis.from_url(redis_url), rate, burst)
+        except Exception as e:
+            print(f"Warning: Could not use Redis for rate limits, falling back to in-process: {e}")
+    if buckets is None:
+        buckets = LocalBucketStore(rate, burst)
+    return AdmissionController(buckets, max_concurrent, max_queue, max_wait)
@@ -7,6 +7,8 @@ This shows how to implement real-time database updates in your Streamlit app.
 import streamlit as st
 from dotenv import load_dotenv
 from db_helper import *
+from models import NotificationParams, to_row
+from notification_templates import render_notifications
 import time
 
 load_dotenv()
@@ -63,15 +65,17 @@ with col2:
         st.rerun()
 
 # Display data
-notifications = get_notifications(CURRENT_STUDENT_ID, limit=10)
+# Notifications are stored as template parameters (migration 011) and
+# rendered here, with names from the student directory
+notifications = render_notifications(get_notifications(CURRENT_STUDENT_ID, limit=10, row_type=NotificationParams))
 stats = get_student_stats(CURRENT_STUDENT_ID)
 
 st.subheader("Recent Notifications")
 for notif in notifications:
-    with st.expander(f"{notif['title']} - {notif['created_at']}"):
-        st.write(notif['message'])
-        if notif.get('details'):
-            st.caption(notif['details'])
+    with st.expander(f"{notif.title} - {notif.created_at}"):
+        st.write(notif.message)
+        if notif.details:
+            st.caption(notif.details)
 
 # =====================================================
 # Method 3: Real-Time Subscriptions (Advanced)
@@ -107,8 +111,9 @@ if st.session_state.get('realtime_enabled'):
     
     # Show notification if new one arrived
     if 'new_notification' in st.session_state:
-        notif = st.session_state['new_notification']
-        st.success(f"🔔 New: {notif['title']} - {notif['message']}")
+        # The inserted row carries no text either; render it like the list above
+        notif = render_notifications([to_row(NotificationParams, st.session_state['new_notification'])])[0]
+        st.success(f"🔔 New: {notif.title} - {notif.message}")
         del st.session_state['new_notification']
     
     if 'credit_updated' in st.session_state:
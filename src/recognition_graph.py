@@ -0,0 +1,276 @@
+"""
+Recognition graph analytics for Boostly
+Loads credit_transactions as a sparse sender -> receiver matrix (CSR) in one
+streaming pass and looks for credit trading: reciprocal pairs, short
+(3-node) cycles and dense groups of students who all trade with each other.
+
+Usage:
+    python recognition_graph.py                          # analyse the database
+    python recognition_graph.py --synthetic 1000000      # benchmark on generated edges
+"""
+
+import argparse
+import time
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from models import LedgerTransfer
+
+
+class RecognitionGraph(NamedTuple):
+    """Transfer graph over integer-coded students"""
+    student_ids: List[str]     # index -> student id
+    credits: sparse.csr_matrix  # credits[i, j] = total credits i sent to j
+    transfers: sparse.csr_matrix  # transfers[i, j] = number of transfers i -> j
+
+
+class ReciprocalPair(NamedTuple):
+    student_a: str
+    student_b: str
+    credits_a_to_b: int
+    credits_b_to_a: int
+    exchanged: int  # credits that flowed both ways (min of the two directions)
+
+
+class DenseGroup(NamedTuple):
+    members: List[str]
+    mutual_pairs: int
+    density: float  # mutual pairs / possible pairs
+    credits_inside: int
+
+
+class SuspicionScore(NamedTuple):
+    student_id: str
+    score: float
+    credits_received: int
+    reciprocal_received: int
+    cycles: int
+    group_size: int
+
+
+# =====================================================
+# LOADING
+# =====================================================
+
+def build_graph(senders: np.ndarray, receivers: np.ndarray, amounts: np.ndarray,
+                student_ids: List[str]) -> RecognitionGraph:
+    """Build the CSR matrices from integer-coded edge arrays (duplicates are summed)"""
+    n = len(student_ids)
+    credits = sparse.csr_matrix((amounts.astype(np.int64), (senders, receivers)), shape=(n, n))
+    transfers = sparse.csr_matrix((np.ones(len(senders), dtype=np.int32), (senders, receivers)), shape=(n, n))
+    credits.sum_duplicates()
+    transfers.sum_duplicates()
+    return RecognitionGraph(student_ids, credits, transfers)
+
+
+def load_graph(edges: Iterable[Tuple[str, str, int]]) -> RecognitionGraph:
+    """Build the graph from (sender_id, receiver_id, amount) tuples in a single pass
+
+    IDs are integer-coded as they arrive and edges are kept in compact typed
+    arrays, so memory is a few bytes per edge rather than a Python object.
+    """
+    codes: Dict[str, int] = {}
+    senders, receivers, amounts = array('i'), array('i'), array('q')
+    for sender_id, receiver_id, amount in edges:
+        senders.append(codes.setdefault(sender_id, len(codes)))
+        receivers.append(codes.setdefault(receiver_id, len(codes)))
+        amounts.append(amount)
+    return build_graph(
+        np.frombuffer(senders, dtype=np.int32), np.frombuffer(receivers, dtype=np.int32),
+        np.frombuffer(amounts, dtype=np.int64), list(codes)
+    )
+
+
+def stream_transfer_edges(page_size: int = 5000) -> Iterable[Tuple[str, str, int]]:
+    """Stream transfer edges from credit_transactions"""
+    from db_helper import iter_table_rows
+
+    for row in iter_table_rows('credit_transactions', LedgerTransfer, page_size, transaction_type='transfer'):
+        yield row.sender_id, row.receiver_id, row.amount
+
+
+def synthetic_graph(num_edges: int, num_students: int = 10000, num_rings: int = 20,
+                    ring_size: int = 4, seed: int = 42) -> RecognitionGraph:
+    """Random transfer graph with planted trading rings (for benchmarks)"""
+    rng = np.random.default_rng(seed)
+    ring_edges = num_rings * ring_size * (ring_size - 1) * 5  # every ordered pair trades 5 times
+    background = max(num_edges - ring_edges, 0)
+    senders = rng.integers(0, num_students, background)
+    receivers = (senders + rng.integers(1, num_students, background)) % num_students
+
+    ring_senders, ring_receivers = [], []
+    members = rng.choice(num_students, num_rings * ring_size, replace=False).reshape(num_rings, ring_size)
+    for ring in members:
+        for a in ring:
+            for b in ring:
+                if a != b:
+                    ring_senders += [a] * 5
+                    ring_receivers += [b] * 5
+    senders = np.concatenate([senders, ring_senders]).astype(np.int32)
+    receivers = np.concatenate([receivers, ring_receivers]).astype(np.int32)
+    amounts = rng.integers(1, 51, len(senders))
+    ids = [f"student-{i:06d}" for i in range(num_students)]
+    return build_graph(senders, receivers, amounts, ids)
+
+
+# =====================================================
+# DETECTION
+# =====================================================
+
+def reciprocal_pairs(graph: RecognitionGraph, min_exchanged: int = 10) -> List[ReciprocalPair]:
+    """Pairs who sent each other credits, ranked by credits exchanged both ways"""
+    credits = graph.credits
+    exchanged = sparse.triu(credits.minimum(credits.T), k=1).tocoo()
+    keep = exchanged.data >= min_exchanged
+    rows, cols, both = exchanged.row[keep], exchanged.col[keep], exchanged.data[keep]
+    forward = np.asarray(credits[rows, cols]).ravel()
+    backward = np.asarray(credits[cols, rows]).ravel()
+    order = np.argsort(-both, kind='stable')
+    ids = graph.student_ids
+    return [
+        ReciprocalPair(ids[rows[i]], ids[cols[i]], int(forward[i]), int(backward[i]), int(both[i]))
+        for i in order
+    ]
+
+
+def repeat_adjacency(graph: RecognitionGraph, min_transfers: int = 2) -> sparse.csr_matrix:
+    """Binary adjacency of relationships with at least min_transfers transfers
+
+    Inflating balances takes repeated transfers, and dropping one-off edges
+    keeps the matrix products below sparse even at millions of edges.
+    """
+    adjacency = (graph.transfers >= min_transfers).astype(np.int64)
+    adjacency.eliminate_zeros()
+    return adjacency
+
+
+def cycle_counts(adjacency: sparse.csr_matrix) -> np.ndarray:
+    """Number of directed 3-cycles (a -> b -> c -> a) through each student"""
+    two_step = adjacency @ adjacency
+    return np.asarray(two_step.multiply(adjacency.T).sum(axis=1)).ravel()
+
+
+def dense_groups(graph: RecognitionGraph, adjacency: sparse.csr_matrix,
+                 min_size: int = 3, min_density: float = 0.5) -> Tuple[List[DenseGroup], np.ndarray]:
+    """Groups connected by mutual repeat relationships, kept when densely connected
+
+    Returns the groups (densest first) and each student's group size (0 if none).
+    """
+    mutual = adjacency.multiply(adjacency.T)
+    mutual.eliminate_zeros()
+    _, labels = connected_components(mutual, directed=False)
+
+    n = len(graph.student_ids)
+    sizes = np.bincount(labels, minlength=n)
+    upper = sparse.triu(mutual, k=1).tocoo()
+    pair_counts = np.bincount(labels[upper.row], minlength=n)
+    internal = graph.credits.tocoo()
+    same = labels[internal.row] == labels[internal.col]
+    credits_inside = np.bincount(labels[internal.row[same]], weights=internal.data[same], minlength=n)
+
+    possible = sizes * (sizes - 1) / 2
+    density = np.divide(pair_counts, possible, out=np.zeros(n), where=possible > 0)
+    candidates = np.flatnonzero((sizes >= min_size) & (density >= min_density))
+
+    member_lists: Dict[int, List[str]] = {int(label): [] for label in candidates}
+    group_size = np.zeros(n, dtype=np.int64)
+    for index in np.flatnonzero(np.isin(labels, candidates)):
+        member_lists[int(labels[index])].append(graph.student_ids[index])
+        group_size[index] = sizes[labels[index]]
+
+    groups = [
+        DenseGroup(member_lists[int(label)], int(pair_counts[label]), float(density[label]), int(credits_inside[label]))
+        for label in candidates
+    ]
+    groups.sort(key=lambda group: (-group.density, -group.credits_inside))
+    return groups, group_size
+
+
+def rank_students(graph: RecognitionGraph, cycles: np.ndarray, group_size: np.ndarray,
+                  top: int = 25) -> List[SuspicionScore]:
+    """Rank students by how much of what they received came back from their own recipients"""
+    credits = graph.credits
+    received = np.asarray(credits.sum(axis=0)).ravel()
+    reciprocal = np.asarray(credits.minimum(credits.T).sum(axis=0)).ravel()
+    share = np.divide(reciprocal, received, out=np.zeros(len(received)), where=received > 0)
+    score = share * np.log1p(reciprocal) + np.log1p(cycles) + (group_size > 0) * 2.0
+
+    order = np.argsort(-score, kind='stable')[:top]
+    return [
+        SuspicionScore(graph.student_ids[i], round(float(score[i]), 3), int(received[i]),
+                       int(reciprocal[i]), int(cycles[i]), int(group_size[i]))
+        for i in order if score[i] > 0
+    ]
+
+
+# =====================================================
+# REPORT
+# =====================================================
+
+def analyse(graph: RecognitionGraph, min_transfers: int = 2, min_exchanged: int = 10, top: int = 25) -> Dict:
+    """Run every detector and return the ranked findings"""
+    adjacency = repeat_adjacency(graph, min_transfers)
+    cycles = cycle_counts(adjacency)
+    groups, group_size = dense_groups(graph, adjacency)
+    return {
+        'pairs': reciprocal_pairs(graph, min_exchanged)[:top],
+        'groups': groups[:top],
+        'students': rank_students(graph, cycles, group_size, top),
+    }
+
+
+def format_report(graph: RecognitionGraph, findings: Dict, names: Optional[Dict[str, str]] = None) -> str:
+    """Plain-text ranked report"""
+    label = (lambda sid: names.get(sid, sid)) if names else (lambda sid: sid)
+    lines = [
+        f"Recognition graph: {len(graph.student_ids):,} students, "
+        f"{graph.transfers.nnz:,} relationships, {int(graph.transfers.sum()):,} transfers",
+        "",
+        "Top reciprocal pairs (credits exchanged both ways)",
+    ]
+    for pair in findings['pairs']:
+        lines.append(f"  {label(pair.student_a)} <-> {label(pair.student_b)}: "
+                     f"{pair.credits_a_to_b} / {pair.credits_b_to_a} (exchanged {pair.exchanged})")
+    lines += ["", "Dense trading groups"]
+    for group in findings['groups']:
+        lines.append(f"  {len(group.members)} students, density {group.density:.0%}, "
+                     f"{group.credits_inside} credits inside: {', '.join(label(m) for m in group.members)}")
+    lines += ["", "Students ranked by suspicion score"]
+    for student in findings['students']:
+        lines.append(f"  {student.score:>7.2f}  {label(student.student_id)}  received {student.credits_received}, "
+                     f"reciprocal {student.reciprocal_received}, cycles {student.cycles}, group {student.group_size}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect reciprocal credit trading")
+    parser.add_argument("--synthetic", type=int, default=0, help="Analyse N generated edges instead of the database")
+    parser.add_argument("--students", type=int, default=10000, help="Students in the synthetic graph")
+    parser.add_argument("--min-transfers", type=int, default=2, help="Transfers needed for a repeat relationship")
+    parser.add_argument("--min-exchanged", type=int, default=10, help="Credits exchanged both ways to report a pair")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    names = None
+    if args.synthetic:
+        graph = synthetic_graph(args.synthetic, args.students)
+    else:
+        from db_helper import get_all_students
+        from models import StudentRef
+        graph = load_graph(stream_transfer_edges())
+        names = {s.id: f"{s.name} ({s.roll_number})" for s in get_all_students(StudentRef)}
+    loaded = time.perf_counter()
+    findings = analyse(graph, args.min_transfers, args.min_exchanged, args.top)
+    done = time.perf_counter()
+
+    print(format_report(graph, findings, names))
+    print(f"\nLoaded in {loaded - start:.2f}s, analysed in {done - loaded:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Payload report for Boostly pages
+Estimates the JSON bytes transferred and decode time per page render, before
+(select('*') everywhere) and after explicit column projection, using synthetic
+rows shaped like the real tables.
+
+Usage:
+    python report_payload.py --students 200 --transactions 40
+"""
+
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Type
+
+from models import (
+    Student, StudentRef, StudentCredits, CreditBalance, CreditTransaction,
+    Notification, NotificationParams, VoucherPurchase
+)
+
+MESSAGES = [
+    "Thanks for helping with the group project",
+    "For your excellent presentation skills",
+    "Great mentoring in data structures this week",
+    "Recognition for organizing the study group",
+]
+
+
+class IdOnly(NamedTuple):
+    """Row shape of count/existence queries (select('id'))"""
+    id: str
+
+
+def _ts(rng: random.Random) -> str:
+    moment = datetime(2024, 1, 1) + timedelta(seconds=rng.randint(0, 30 * 24 * 3600))
+    return moment.isoformat() + "+00:00"
+
+
+def synthetic_row(row_type: Type, rng: random.Random) -> Dict:
+    """Build a realistic full row for the table behind row_type"""
+    uid = lambda: str(uuid.UUID(int=rng.getrandbits(128)))
+    values = {
+        "id": uid(), "student_id": uid(), "sender_id": uid(), "receiver_id": uid(),
+        "related_student_id": uid(), "related_transaction_id": uid(),
+        "name": rng.choice(["Sarah Johnson", "Michael Chen", "Emma Wilson", "David Martinez"]),
+        "roll_number": f"2K22/EC/{rng.randint(1, 99):02d}",
+        "email": "student@example.com", "avatar_url": None,
+        "created_at": _ts(rng), "updated_at": _ts(rng),
+        "total_credits": 150, "credits_received": 85, "credits_sent_this_month": 55,
+        "monthly_limit": 100, "month_year": "2024-01", "last_reset_date": "2024-01-01",
+        "amount": rng.randint(1, 50), "message": rng.choice(MESSAGES), "transaction_type": "transfer",
+        "notification_type": "credits_received", "title": "Credits Received",
+        "details": rng.choice(MESSAGES), "is_read": False, "event_count": 1,
+        "num_vouchers": 2, "credits_per_voucher": 10, "total_value": 100.0, "voucher_rate": 5.0,
+    }
+    values["related_student_ids"] = [values["related_student_id"]]
+    values["related_transaction_ids"] = [values["related_transaction_id"]]
+    if row_type is Notification:
+        # Text is rendered from the template on read since migration 011
+        values["title"] = values["message"] = None
+    return {field: values[field] for field in row_type._fields}
+
+
+class Query(NamedTuple):
+    """One read issued while rendering a page"""
+    label: str
+    before_type: Type
+    before_rows: int
+    after_type: Optional[Type]
+    after_rows: int
+
+
+def page_queries(students: int, transactions: int, notifications: int) -> Dict[str, List[Query]]:
+    """Reads issued by each page (the sidebar stats render on every page)"""
+    sidebar = [
+        Query("get_student_credits", StudentCredits, 1, CreditBalance, 1),
+        Query("transactions sent (count)", CreditTransaction, transactions, IdOnly, 1),
+        Query("transactions received (count)", CreditTransaction, transactions, IdOnly, 1),
+        Query("get_endorsements_received", IdOnly, 0, IdOnly, 0),
+    ]
+    directory = Query("get_all_students", Student, students, StudentRef, students)
+    return {
+        "sidebar": sidebar,
+        "notifications": [Query("get_notifications", Notification, notifications, NotificationParams, notifications)],
+        "send_credits": [directory],
+        "endorse": [directory] + [Query("check_endorsement_exists", IdOnly, 1, IdOnly, 1)] * (students - 1),
+        "redeem": [Query("get_voucher_purchases", VoucherPurchase, 10, VoucherPurchase, 10)],
+    }
+
+
+def measure(row_type: Type, count: int, rng: random.Random, repeat: int = 20):
+    """JSON bytes and mean decode seconds of a response with count rows"""
+    payload = json.dumps([synthetic_row(row_type, rng) for _ in range(count)]).encode()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        json.loads(payload)
+    return len(payload), (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report bytes transferred per page")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--transactions", type=int, default=40, help="Transactions per student per direction")
+    parser.add_argument("--notifications", type=int, default=50)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    print(f"{'page':<15}{'bytes before':>14}{'bytes after':>13}{'saved':>8}{'decode before':>16}{'decode after':>14}")
+    for page, queries in page_queries(args.students, args.transactions, args.notifications).items():
+        before_bytes = after_bytes = 0
+        before_decode = after_decode = 0.0
+        for query in queries:
+            size, decode = measure(query.before_type, query.before_rows, rng)
+            before_bytes, before_decode = before_bytes + size, before_decode + decode
+            size, decode = measure(query.after_type, query.after_rows, rng)
+            after_bytes, after_decode = after_bytes + size, after_decode + decode
+        saved = 1 - after_bytes / before_bytes if before_bytes else 0.0
+        print(f"{page:<15}{before_bytes:>14,}{after_bytes:>13,}{saved:>8.0%}"
+              f"{before_decode * 1000:>14.2f}ms{after_decode * 1000:>12.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
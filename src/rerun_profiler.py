@@ -0,0 +1,191 @@
+"""
+Rerun profiler for Boostly
+Samples the stack of one thread (a session's script thread) at a fixed
+interval while a rerun executes, then attributes the rerun's wall time to
+page functions, db_helper calls, Streamlit and other code, and builds a
+top-down flame summary.
+
+Only the profiled thread is sampled, so other sessions run unaffected, and
+nothing is imported or started unless a session opts in. Profiles are saved
+as folded stacks (one "frame;frame;frame count" line per stack), which
+flamegraph.pl and speedscope read directly, plus a JSON summary.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Profiles kept on disk across all sessions; older ones are deleted on each
+# save, so ?profile=1 on a public deployment cannot fill the disk
+MAX_SAVED_PROFILES = int(os.getenv("BOOSTLY_PROFILE_KEEP", "200"))
+
+Stack = Tuple[str, ...]  # frame labels, outermost first
+
+
+class RerunProfile(NamedTuple):
+    """Where one rerun spent its time"""
+    wall_ms: float
+    samples: int
+    breakdown: Dict[str, float]       # category -> ms
+    pages: List[Tuple[str, float]]    # app function -> ms, slowest first
+    db_calls: List[Tuple[str, float]]  # db_helper function -> ms, slowest first
+    flame: str
+
+
+def _label(frame) -> Tuple[str, bool]:
+    """'module.function' for a frame, and whether it is the app's own code"""
+    filename = frame.f_code.co_filename
+    if os.path.dirname(os.path.abspath(filename)) == HERE:
+        return f"{os.path.splitext(os.path.basename(filename))[0]}.{frame.f_code.co_name}", True
+    package = (frame.f_globals.get('__name__') or '?').split('.')[0]
+    return f"{package}.{frame.f_code.co_name}", False
+
+
+class RerunProfiler:
+    """Sampling profiler for the calling thread, used as a context manager"""
+
+    def __init__(self, root: Callable, interval: float = 0.002):
+        self.root = root.__code__
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.wall = 0.0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._start = 0.0
+
+    def __enter__(self) -> "RerunProfiler":
+        self._start = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name="rerun-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        self.wall = time.perf_counter() - self._start
+        return False
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack: List[Tuple[str, bool]] = []
+            while frame is not None:
+                stack.append(_label(frame))
+                if frame.f_code is self.root:
+                    break
+                frame = frame.f_back
+            else:
+                continue  # outside the profiled call
+            # Collapse runs of library frames into the outermost one (e.g. streamlit.markdown)
+            collapsed: List[str] = []
+            library = None
+            for label, own in reversed(stack):
+                package = label.split('.')[0]
+                if (not own and package == library) or (own and label.endswith('.wrapper')):
+                    continue  # decorator wrappers add nothing to the picture
+                library = None if own else package
+                collapsed.append(label)
+            self.stacks[tuple(collapsed)] += 1
+
+    # =====================================================
+    # SUMMARY
+    # =====================================================
+
+    def summary(self, max_depth: int = 6, min_share: float = 0.01) -> RerunProfile:
+        """Attribute the sampled time to categories, app functions and db_helper calls"""
+        total = sum(self.stacks.values())
+        per_sample = self.wall * 1000 / total if total else 0.0
+        breakdown: Counter = Counter()
+        pages: Counter = Counter()
+        db_calls: Counter = Counter()
+
+        for stack, count in self.stacks.items():
+            ms = count * per_sample
+            db_call = next((f for f in stack if f.startswith('db_helper.') and not f.startswith('db_helper._')), None)
+            leaf_package = stack[-1].split('.')[0]
+            if db_call:
+                breakdown['db_helper'] += ms
+                db_calls[db_call] += ms
+            elif leaf_package == 'app':
+                breakdown['page code'] += ms
+            elif leaf_package == 'streamlit':
+                breakdown['streamlit'] += ms
+            else:
+                breakdown['other'] += ms
+            for function in set(f for f in stack if f.startswith('app.')):
+                pages[function] += ms
+
+        return RerunProfile(
+            round(self.wall * 1000, 1), total,
+            {category: round(ms, 1) for category, ms in breakdown.most_common()},
+            [(name, round(ms, 1)) for name, ms in pages.most_common()],
+            [(name, round(ms, 1)) for name, ms in db_calls.most_common()],
+            self.flame(per_sample, total, max_depth, min_share),
+        )
+
+    def flame(self, per_sample: float, total: int, max_depth: int, min_share: float) -> str:
+        """Indented top-down call tree of the heaviest paths"""
+        tree: Dict[Stack, int] = Counter()
+        for stack, count in self.stacks.items():
+            for depth in range(1, min(len(stack), max_depth) + 1):
+                tree[stack[:depth]] += count
+
+        lines: List[str] = []
+
+        def walk(prefix: Stack):
+            children = sorted(
+                (path for path in tree if len(path) == len(prefix) + 1 and path[:-1] == prefix),
+                key=lambda path: -tree[path]
+            )
+            for path in children:
+                if tree[path] < total * min_share:
+                    continue
+                share = tree[path] / total
+                bar = '█' * max(1, round(share * 20))
+                lines.append(f"{tree[path] * per_sample:8.1f} ms {share:6.1%} {'  ' * (len(path) - 1)}{path[-1]}  {bar}")
+                walk(path)
+
+        walk(())
+        return "\n".join(lines)
+
+    def dump(self, directory: str, name: str, keep: int = MAX_SAVED_PROFILES) -> str:
+        """Write folded stacks and a JSON summary, returning the folded file path
+
+        Only the newest keep profiles in directory are kept.
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"rerun_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+        with open(base + ".folded", "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+        with open(base + ".json", "w") as f:
+            json.dump(self.summary()._asdict(), f, indent=2)
+        prune_profiles(directory, keep)
+        return base + ".folded"
+
+
+def prune_profiles(directory: str, keep: int):
+    """Delete all but the newest keep saved profiles (folded file and JSON summary) in directory"""
+    saved = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith("rerun_") and entry.name.endswith(".folded"):
+                try:
+                    saved.append((entry.stat().st_mtime, entry.path[:-len(".folded")]))
+                except FileNotFoundError:
+                    pass  # pruned by another session meanwhile
+    saved.sort(reverse=True)
+    for _, base in saved[keep:]:
+        for suffix in (".folded", ".json"):
+            try:
+                os.remove(base + suffix)
+            except FileNotFoundError:
+                pass
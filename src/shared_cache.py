@@ -0,0 +1,246 @@
+"""
+Shared read cache for Boostly
+Caches db_helper reads for BOOSTLY_CACHE_TTL seconds. Every entry is tagged
+(e.g. "student:<id>") and writes invalidate their tags, so a send, an
+endorsement or a voucher purchase is visible immediately instead of after
+the TTL.
+
+Invalidation bumps a generation counter per tag instead of deleting keys:
+the generations of an entry's tags are part of its key, so a bump makes
+every older entry unreachable at once, and a read that raced with a write
+can only store its result under the old generation, where nobody looks.
+
+Entries live in process memory by default. With REDIS_URL set (and redis
+installed) they live in Redis and are shared by every replica, each of which
+keeps a short-lived near cache in front of it (BOOSTLY_NEAR_CACHE_TTL). An
+invalidation is published on a pub/sub channel so all replicas drop their
+near copies right away; if a replica misses the message, its near copy
+still expires within the near TTL. Values are pickled, so the Redis
+instance must be trusted, as it already is for rate limits.
+"""
+
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# (found, value, key to store a freshly loaded value under)
+Lookup = Tuple[bool, Any, Optional[tuple]]
+
+
+# =====================================================
+# STORES
+# =====================================================
+
+class LocalCacheStore:
+    """In-process entries with TTLs and per-tag generations (a stand-in for Redis)"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def generations(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def bump(self, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisCacheStore:
+    """Entries and tag generations in Redis, shared between replicas"""
+
+    # Generations outlive any entry by far, so one that expires and restarts
+    # at 0 cannot bring an old entry back
+    GENERATION_TTL = 86400
+
+    def __init__(self, client, prefix: str = "boostly:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def generations(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        tags = list(tags)
+        if not tags:
+            return ()
+        values = self.client.mget([f"{self.prefix}gen:{tag}" for tag in tags])
+        return tuple(int(value or 0) for value in values)
+
+    def bump(self, tags: Iterable[str]):
+        pipeline = self.client.pipeline(transaction=False)
+        for tag in tags:
+            pipeline.incr(f"{self.prefix}gen:{tag}")
+            pipeline.expire(f"{self.prefix}gen:{tag}", self.GENERATION_TTL)
+        pipeline.execute()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        data = self.client.get(self.prefix + key)
+        if data is None:
+            return False, None
+        return True, pickle.loads(data)
+
+    def set(self, key: str, value: Any, ttl: float):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def publish(self, channel: str, message: str):
+        self.client.publish(self.prefix + channel, message)
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]):
+        """Call handler with every message on channel, from a background thread"""
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.prefix + channel: lambda message: handler(_text(message['data']))})
+        pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+
+def _text(data) -> str:
+    return data.decode() if isinstance(data, bytes) else str(data)
+
+
+# =====================================================
+# CACHE
+# =====================================================
+
+class SharedCache:
+    """Tagged read cache: near entries in process, optionally backed by a shared store"""
+
+    CHANNEL = "invalidate"
+
+    def __init__(self, ttl: float, shared: Optional[RedisCacheStore] = None,
+                 near_ttl: float = 5.0, max_entries: int = 4096):
+        self.ttl = ttl
+        self.near_ttl = min(near_ttl, ttl) if shared else ttl
+        self.near = LocalCacheStore(max_entries)
+        self.shared = shared
+        self._listeners: List[Callable[[Tuple[str, ...]], None]] = []
+        self._lock = threading.Lock()
+        self._counters = {
+            'near_hits': 0, 'shared_hits': 0, 'misses': 0, 'errors': 0,
+            'invalidations_sent': 0, 'invalidations_received': 0,
+        }
+        if shared:
+            try:
+                shared.subscribe(self.CHANNEL, self._on_message)
+            except Exception as e:
+                print(f"Warning: Could not subscribe to cache invalidations, caching in-process only: {e}")
+                self.shared = None
+                self.near_ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def lookup(self, key: str, tags: Tuple[str, ...]) -> Lookup:
+        """Find key; on a miss, also return the stamp to store() the loaded value with"""
+        near_key = f"{key}@{self.near.generations(tags)}"
+        found, value = self.near.get(near_key)
+        if found:
+            self._count('near_hits')
+            return True, value, None
+        if not self.shared:
+            self._count('misses')
+            return False, None, (near_key, None)
+
+        try:
+            shared_key = f"{key}@{self.shared.generations(tags)}"
+            found, value = self.shared.get(shared_key)
+        except Exception as e:
+            # Redis trouble must never fail a read; load from the database
+            self._count('errors')
+            print(f"Warning: shared cache read failed: {e}")
+            return False, None, (near_key, None)
+        if found:
+            self._count('shared_hits')
+            self.near.set(near_key, value, self.near_ttl)
+            return True, value, None
+        self._count('misses')
+        return False, None, (near_key, shared_key)
+
+    def store(self, stamp: tuple, value: Any):
+        near_key, shared_key = stamp
+        self.near.set(near_key, value, self.near_ttl)
+        if shared_key:
+            try:
+                self.shared.set(shared_key, value, self.ttl)
+            except Exception as e:
+                self._count('errors')
+                print(f"Warning: shared cache write failed: {e}")
+
+    def invalidate(self, *tags: str):
+        """Drop every entry with any of these tags, in this process and all replicas"""
+        self.near.bump(tags)
+        self._count('invalidations_sent')
+        if self.shared:
+            try:
+                self.shared.bump(tags)
+                self.shared.publish(self.CHANNEL, ' '.join(tags))
+            except Exception as e:
+                self._count('errors')
+                print(f"Warning: shared cache invalidation failed: {e}")
+        self._notify(tags)
+
+    def _on_message(self, message: str):
+        tags = tuple(message.split())
+        self.near.bump(tags)  # our own messages too: bumping twice is harmless
+        self._count('invalidations_received')
+        self._notify(tags)
+
+    def on_invalidate(self, callback: Callable[[Tuple[str, ...]], None]):
+        """Call callback with the tags of every invalidation, local or from another replica"""
+        self._listeners.append(callback)
+
+    def _notify(self, tags: Tuple[str, ...]):
+        for listener in self._listeners:
+            try:
+                listener(tags)
+            except Exception as e:
+                print(f"Error in cache invalidation listener: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._counters)
+        snapshot['backend'] = 'redis' if self.shared else 'local'
+        return snapshot
+
+
+def create_cache() -> SharedCache:
+    """Build the cache from environment settings"""
+    ttl = float(os.getenv("BOOSTLY_CACHE_TTL", "30"))  # 0 turns caching off
+    near_ttl = float(os.getenv("BOOSTLY_NEAR_CACHE_TTL", "5"))
+    max_entries = int(os.getenv("BOOSTLY_CACHE_SIZE", "4096"))
+
+    shared = None
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url and ttl > 0:
+        try:
+            import redis
+            shared = RedisCacheStore(redis.Redis.from_url(redis_url))
+        except Exception as e:
+            print(f"Warning: Could not use Redis for the read cache, falling back to in-process: {e}")
+    return SharedCache(ttl, shared, near_ttl, max_entries)
@@ -0,0 +1,273 @@
+"""
+Student directory for Boostly
+One in-process copy of the students table shared by every session, indexed
+by id, roll number and name, so resolving a name or an id is a dictionary
+lookup instead of a query.
+
+The directory is loaded once and then kept current incrementally. At most
+every max_age seconds a one-row probe reads the table's version (newest
+updated_at and row count). When it changed, only the rows updated since the
+directory's high-water mark and the ids deleted since then (tombstones,
+migration 008) are fetched and merged into the sorted copy. The row count
+doubles as a checksum: if the merged copy does not match it, the directory
+falls back to a full reload. A replica that adds a student announces it
+through the read cache's invalidations, which makes every directory check
+on its next lookup; a lookup that misses anyway forces an early check, rate
+limited so unknown ids cannot turn into a query per lookup.
+"""
+
+import bisect
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import StudentChange, StudentRef
+
+Version = Tuple[str, int]  # (newest updated_at, number of students)
+
+# Changes are re-read this far behind the high-water mark, so a row committed
+# late with a slightly older updated_at is still picked up
+SYNC_OVERLAP_SECONDS = float(os.getenv("BOOSTLY_DIRECTORY_SYNC_OVERLAP", "5"))
+
+
+def _sort_key(student: StudentRef) -> Tuple[str, str]:
+    return (student.name, student.roll_number)
+
+
+def _shift(timestamp: str, seconds: float) -> str:
+    """Move an ISO timestamp by seconds (unchanged if it cannot be parsed)"""
+    try:
+        return (datetime.fromisoformat(timestamp) + timedelta(seconds=seconds)).isoformat()
+    except ValueError:
+        return timestamp
+
+
+class DirectorySnapshot:
+    """Immutable indexes over one version of the students table"""
+
+    def __init__(self, students: Tuple[StudentRef, ...], keys: List[Tuple[str, str]],
+                 by_id: Dict[str, StudentRef], by_roll: Dict[str, StudentRef],
+                 by_name: Dict[str, Tuple[StudentRef, ...]], names: Dict[str, str],
+                 version: Optional[Version], high_water: str):
+        self.students = students  # sorted by (name, roll_number)
+        self._keys = keys         # sort keys of students, for bisect
+        self.by_id = by_id
+        self.by_roll = by_roll
+        self.by_name = by_name    # students of each name, in sorted order
+        self.names = names        # id -> name
+        self.version = version
+        self.high_water = high_water  # newest updated_at merged so far
+
+    @classmethod
+    def build(cls, students: Iterable[StudentRef], version: Optional[Version] = None,
+              high_water: str = '') -> "DirectorySnapshot":
+        ordered = tuple(sorted(students, key=_sort_key))
+        by_name: Dict[str, List[StudentRef]] = {}
+        for student in ordered:
+            by_name.setdefault(student.name, []).append(student)
+        return cls(ordered, [_sort_key(s) for s in ordered], {str(s.id): s for s in ordered},
+                   {s.roll_number: s for s in ordered},
+                   {name: tuple(group) for name, group in by_name.items()},
+                   {str(s.id): s.name for s in ordered}, version, high_water)
+
+    def __len__(self) -> int:
+        return len(self.students)
+
+    def merged(self, changed: Iterable[StudentChange], deleted: Iterable[str],
+               version: Optional[Version]) -> "DirectorySnapshot":
+        """A new snapshot with changes applied, without re-sorting or re-indexing
+
+        Each changed or deleted student is moved in the sorted order by
+        binary search and patched into the indexes under its own keys, so the
+        Python work is O(k log N) for k changes. The snapshot stays immutable
+        for lock-free readers, so the sorted list and the index dicts are
+        still copied first. That is an O(N) pointer copy done in C (about
+        30 ms for 100k students), not a rebuild of N entries.
+        """
+        students = list(self.students)
+        keys = list(self._keys)
+        by_id = self.by_id.copy()
+        by_roll = self.by_roll.copy()
+        by_name = self.by_name.copy()
+        names = self.names.copy()
+        high_water = self.high_water
+
+        def remove(student_id: str):
+            old = by_id.pop(student_id, None)
+            if old is None:
+                return
+            position = bisect.bisect_left(keys, _sort_key(old))
+            while students[position].id != old.id:
+                position += 1  # same name and roll: step to the right one
+            del students[position], keys[position]
+            names.pop(student_id, None)
+            if by_roll.get(old.roll_number) is old:
+                del by_roll[old.roll_number]
+            namesakes = tuple(s for s in by_name[old.name] if s.id != old.id)
+            if namesakes:
+                by_name[old.name] = namesakes
+            else:
+                del by_name[old.name]
+
+        for change in changed:
+            student = StudentRef(str(change.id), change.name, change.roll_number)
+            remove(student.id)
+            key = _sort_key(student)
+            position = bisect.bisect_right(keys, key)
+            students.insert(position, student)
+            keys.insert(position, key)
+            by_id[student.id] = student
+            by_roll[student.roll_number] = student
+            by_name[student.name] = tuple(sorted(by_name.get(student.name, ()) + (student,), key=_sort_key))
+            names[student.id] = student.name
+            high_water = max(high_water, change.updated_at or '')
+        for student_id in deleted:
+            remove(str(student_id))
+
+        return DirectorySnapshot(tuple(students), keys, by_id, by_roll, by_name, names, version, high_water)
+
+
+class StudentDirectory:
+    """Students by id, roll number and name, shared by every session in the process"""
+
+    def __init__(self, max_age: float = 60.0, miss_interval: float = 5.0):
+        self.max_age = max_age
+        self.miss_interval = miss_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._snapshot = DirectorySnapshot.build([])
+        self._loaded = False
+        self._checked_at: Optional[float] = None
+        self._forced_at = 0.0
+        self.metrics = {'full_loads': 0, 'delta_syncs': 0, 'rows_merged': 0, 'checksum_mismatches': 0}
+
+    # =====================================================
+    # SYNC
+    # =====================================================
+
+    def _full_load(self, version: Optional[Version]):
+        from db_helper import get_all_students
+
+        students = get_all_students(StudentChange)
+        if students or version == ('', 0):
+            snapshot = DirectorySnapshot.build(
+                (StudentRef(str(s.id), s.name, s.roll_number) for s in students), version,
+                max((s.updated_at or '' for s in students), default='')
+            )
+            with self._lock:
+                self._snapshot = snapshot
+            self._loaded = True
+            self.metrics['full_loads'] += 1
+
+    def _delta_sync(self, version: Version) -> bool:
+        """Merge rows changed and deleted since the high-water mark; False if a full load is needed"""
+        from db_helper import get_student_tombstones, get_students_changed_since
+
+        current = self._snapshot
+        since = _shift(current.high_water, -SYNC_OVERLAP_SECONDS) if current.high_water else ''
+        changed = get_students_changed_since(since) if since else None
+        if changed is None:
+            return False
+        # Without tombstones (migration 008 not applied) deletions show up as a count mismatch
+        deleted = get_student_tombstones(since) or []
+        snapshot = current.merged(changed, (student_id for student_id, _ in deleted), version)
+        if len(snapshot) != version[1]:
+            self.metrics['checksum_mismatches'] += 1
+            return False
+        with self._lock:
+            self._snapshot = snapshot
+        self.metrics['delta_syncs'] += 1
+        self.metrics['rows_merged'] += len(changed) + len(deleted)
+        return True
+
+    def refresh(self, force: bool = False):
+        """Bring the directory up to date if the students table changed (checked every max_age seconds)"""
+        from db_helper import get_students_version
+
+        if not force and self._checked_at is not None and time.monotonic() - self._checked_at < self.max_age:
+            return
+        with self._refresh_lock:  # one probe per process, however many sessions ask
+            if not force and self._checked_at is not None and time.monotonic() - self._checked_at < self.max_age:
+                return
+            version = get_students_version()
+            if not self._loaded or version is None:
+                self._full_load(version)
+            elif version != self._snapshot.version and not self._delta_sync(version):
+                self._full_load(version)
+            self._checked_at = time.monotonic()
+
+    def expire(self):
+        """Check the table again on the next lookup"""
+        self._checked_at = None
+
+    def snapshot(self) -> DirectorySnapshot:
+        """Current indexes (refreshed first if due); safe to read without locking"""
+        self.refresh()
+        with self._lock:
+            return self._snapshot
+
+    def _on_miss(self) -> DirectorySnapshot:
+        """Re-check the table after a miss, at most once per miss_interval"""
+        now = time.monotonic()
+        if now - self._forced_at >= self.miss_interval:
+            self._forced_at = now
+            self.refresh(force=True)
+        with self._lock:
+            return self._snapshot
+
+    def add(self, student: StudentRef):
+        """Add or replace a student this process just wrote"""
+        with self._lock:
+            change = StudentChange(str(student.id), student.name, student.roll_number, '')
+            self._snapshot = self._snapshot.merged([change], (), self._snapshot.version)
+
+    # =====================================================
+    # LOOKUPS
+    # =====================================================
+
+    def all(self) -> Tuple[StudentRef, ...]:
+        """Every student, sorted by name"""
+        return self.snapshot().students
+
+    def names(self) -> Dict[str, str]:
+        """Map of student id to name (shared; do not modify)"""
+        return self.snapshot().names
+
+    def by_id(self, student_id: str) -> Optional[StudentRef]:
+        student = self.snapshot().by_id.get(str(student_id))
+        if student is None:
+            student = self._on_miss().by_id.get(str(student_id))
+        return student
+
+    def by_roll(self, roll_number: str) -> Optional[StudentRef]:
+        student = self.snapshot().by_roll.get(roll_number)
+        if student is None:
+            student = self._on_miss().by_roll.get(roll_number)
+        return student
+
+    def by_name(self, name: str) -> Tuple[StudentRef, ...]:
+        """Students with exactly this name (names are not unique)"""
+        return self.snapshot().by_name.get(name, ())
+
+    def name_of(self, student_id: str, default: str = 'Unknown') -> str:
+        student = self.by_id(student_id)
+        return student.name if student else default
+
+
+_directory: Optional[StudentDirectory] = None
+_directory_lock = threading.Lock()
+
+
+def get_directory() -> StudentDirectory:
+    """Process-wide student directory"""
+    global _directory
+    with _directory_lock:
+        if _directory is None:
+            from db_helper import STUDENTS_TAG, on_cache_invalidation
+
+            directory = StudentDirectory(float(os.getenv("BOOSTLY_DIRECTORY_MAX_AGE", "60")))
+            on_cache_invalidation(lambda tags: directory.expire() if STUDENTS_TAG in tags else None)
+            _directory = directory
+        return _directory
@@ -0,0 +1,62 @@
+"""
+Tests for db_helper on the local SQLite backend
+
+Run from src/ with: python -m pytest -q
+"""
+
+import pytest
+
+import db_helper
+import local_backend
+from models import CreditBalance
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A fresh local database behind db_helper, with empty read caches"""
+    local = local_backend.create_local_client(str(tmp_path / "boostly.db"))
+    monkeypatch.setattr(db_helper, '_supabase', local)
+    monkeypatch.setattr(db_helper, '_client_initialized', True)
+    monkeypatch.setattr(db_helper, '_stale_results', type(db_helper._stale_results)())
+    db_helper._cache.invalidate(db_helper.STUDENTS_TAG)
+    yield local
+    local.close()
+
+
+def fail_next_balance_read(monkeypatch):
+    """Make the next student_credits select fail as if the database were down"""
+    execute = db_helper._execute
+    pending = [True]
+
+    def failing(query):
+        if pending and getattr(query, '_table', None) == 'student_credits' and query._action == 'select':
+            pending.pop()
+            db_helper._call_state.failed = True
+            raise local_backend.APIError("connection refused", code='08006')
+        return execute(query)
+    monkeypatch.setattr(db_helper, '_execute', failing)
+
+
+def test_send_credits_never_writes_back_a_stale_balance(client, monkeypatch):
+    sender, receiver = (student['id'] for student in local_backend.seed(client, 2, credits_received=50))
+    month_year = db_helper.datetime.now().strftime('%Y-%m')
+    assert db_helper.get_student_credits(sender, month_year, CreditBalance).total_credits == 150
+
+    assert db_helper.purchase_vouchers(sender, 2, 10)
+    assert db_helper.get_student_credits.uncached(sender, month_year, CreditBalance).total_credits == 130
+
+    fail_next_balance_read(monkeypatch)
+    db_helper.send_credits(sender, receiver, 7)
+
+    # The failed read must not fall back to the 150 served before the purchase
+    assert db_helper.get_student_credits.uncached(sender, month_year, CreditBalance).total_credits == 130
+
+
+@pytest.mark.parametrize('code, failure', [
+    ('08006', True), ('57014', True),
+    ('PGRST000', True), ('PGRST001', True), ('PGRST002', True), ('PGRST003', True),
+    ('502', True), ('503', True), ('504', True),
+    ('PGRST116', False), ('23505', False), ('P0001', False), ('404', False),
+])
+def test_breaker_counts_unreachable_database_as_failure(code, failure):
+    assert db_helper._is_backend_failure(local_backend.APIError("error", code=code)) is failure
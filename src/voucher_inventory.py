@@ -0,0 +1,85 @@
+"""
+Voucher code inventory job for Boostly
+Keeps the pool of pre-minted voucher codes (migrations/002_voucher_inventory.sql)
+above a low-water mark so purchases only ever claim existing codes.
+
+mint_voucher_codes is only executable by the service role, so run the job
+with SUPABASE_KEY set to the service_role key (never the app's anon key).
+
+Usage:
+    python voucher_inventory.py                 # run forever, checking every 30s
+    python voucher_inventory.py --once          # single check (for cron)
+"""
+
+import argparse
+import os
+import time
+from typing import Dict
+
+from db_helper import get_voucher_pool_stats, mint_voucher_codes
+
+LOW_WATER = int(os.getenv("VOUCHER_POOL_LOW_WATER", "500"))
+TARGET = int(os.getenv("VOUCHER_POOL_TARGET", "2000"))
+BATCH_SIZE = int(os.getenv("VOUCHER_MINT_BATCH", "500"))
+
+
+class InventoryMetrics:
+    """Counters reported after every check"""
+
+    def __init__(self):
+        self.checks = 0
+        self.refills = 0
+        self.minted = 0
+        self.pool_depth = 0
+        self.last_refill_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(vars(self))
+
+
+def refill_once(metrics: InventoryMetrics, low_water: int = LOW_WATER,
+                target: int = TARGET, batch_size: int = BATCH_SIZE) -> Dict[str, float]:
+    """Check pool depth and mint batches up to target when below low_water"""
+    stats = get_voucher_pool_stats()
+    metrics.checks += 1
+    if not stats:
+        print("⚠️  Could not read voucher pool stats")
+        return metrics.as_dict()
+
+    available = int(stats.get('available', 0))
+    metrics.pool_depth = available
+    if available < low_water:
+        start = time.perf_counter()
+        while available < target:
+            minted = mint_voucher_codes(min(batch_size, target - available))
+            if minted <= 0:
+                print("❌ Minting failed, will retry on the next check")
+                break
+            available += minted
+            metrics.minted += minted
+        metrics.refills += 1
+        metrics.pool_depth = available
+        metrics.last_refill_seconds = round(time.perf_counter() - start, 3)
+        print(f"➕ Refilled voucher pool to {available} codes in {metrics.last_refill_seconds}s")
+
+    print(f"📊 Pool depth {metrics.pool_depth}, claimed last hour {stats.get('claimed_last_hour', 0)}, "
+          f"refills {metrics.refills}, minted {metrics.minted}")
+    return metrics.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the voucher code pool topped up")
+    parser.add_argument("--once", action="store_true", help="Check once and exit")
+    parser.add_argument("--interval", type=float, default=30.0, help="Seconds between checks")
+    args = parser.parse_args()
+
+    metrics = InventoryMetrics()
+    while True:
+        refill_once(metrics)
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()